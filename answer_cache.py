@@ -0,0 +1,156 @@
+import os
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import Iterable, List, Optional, Tuple
+import numpy as np
+
+DEFAULT_DB_PATH = os.getenv("DOCUCHAT_ANSWER_CACHE_PATH", "answer_cache.sqlite3")
+DEFAULT_MAX_ENTRIES = 5000
+DEFAULT_TTL_SECONDS = 7 * 24 * 3600
+
+
+def normalize_question(question: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace"""
+    question = re.sub(r"[^\w\s]", " ", question.lower())
+    return " ".join(question.split())
+
+
+def corpus_cache_key(file_hashes: Iterable[str]) -> str:
+    """Stable key for a document set, independent of upload order"""
+    return hashlib.sha256("|".join(sorted(file_hashes)).encode("utf-8")).hexdigest()
+
+
+class AnswerCache:
+    """
+    SQLite-backed cache of LLM answers.
+
+    Exact entries are keyed by (corpus key, normalized question, retrieved chunk IDs).
+    With a similarity_threshold, a miss falls back to the most similar cached question
+    for the same corpus and the same retrieved chunks, compared with the query embedding
+    retrieval already computed.
+    Entries expire after ttl_seconds and the least recently used are evicted past max_entries.
+    """
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH, max_entries: int = DEFAULT_MAX_ENTRIES,
+                 ttl_seconds: float = DEFAULT_TTL_SECONDS, similarity_threshold: Optional[float] = None):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS answers (
+                key TEXT PRIMARY KEY,
+                corpus TEXT NOT NULL,
+                question TEXT NOT NULL,
+                answer TEXT NOT NULL,
+                sources TEXT NOT NULL,
+                embedding BLOB,
+                chunks TEXT,
+                created_at REAL NOT NULL,
+                last_used REAL NOT NULL
+            )
+        """)
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(answers)")]
+        if "chunks" not in columns:
+            # Caches from before semantic hits were scoped to the retrieved chunks
+            self._conn.execute("ALTER TABLE answers ADD COLUMN chunks TEXT")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS answers_corpus ON answers (corpus)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS answers_last_used ON answers (last_used)")
+        self._conn.commit()
+
+    def _chunks_key(self, chunk_ids: List[str]) -> str:
+        return hashlib.sha256(",".join(sorted(chunk_ids)).encode("utf-8")).hexdigest()
+
+    def _key(self, corpus: str, question: str, chunk_ids: List[str]) -> str:
+        raw = "\0".join([corpus, normalize_question(question), ",".join(sorted(chunk_ids))])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, corpus: str, question: str, chunk_ids: List[str],
+            query_vector: Optional[List[float]] = None) -> Optional[Tuple[str, List[str]]]:
+        """Return (answer, sources) for an exact or, if enabled, a paraphrased question"""
+        now = time.time()
+        cutoff = now - self.ttl_seconds
+        with self._lock:
+            key = self._key(corpus, question, chunk_ids)
+            row = self._conn.execute(
+                "SELECT answer, sources FROM answers WHERE key = ? AND created_at >= ?", (key, cutoff)
+            ).fetchone()
+
+            if row is None and self.similarity_threshold is not None and query_vector is not None:
+                key, row = self._most_similar(corpus, chunk_ids, query_vector, cutoff)
+                if row is not None:
+                    self.semantic_hits += 1
+
+            if row is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self._conn.execute("UPDATE answers SET last_used = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            return row[0], json.loads(row[1])
+
+    def _most_similar(self, corpus: str, chunk_ids: List[str], query_vector: List[float], cutoff: float):
+        # Only answers generated from the same chunks (hence the same file filter) qualify
+        rows = self._conn.execute(
+            "SELECT key, embedding, answer, sources FROM answers "
+            "WHERE corpus = ? AND chunks = ? AND created_at >= ? AND embedding IS NOT NULL",
+            (corpus, self._chunks_key(chunk_ids), cutoff)
+        ).fetchall()
+        if not rows:
+            return None, None
+        # Embeddings are normalized, so a dot product is the cosine similarity
+        matrix = np.stack([np.frombuffer(r[1], dtype=np.float32) for r in rows])
+        scores = matrix @ np.asarray(query_vector, dtype=np.float32)
+        best = int(np.argmax(scores))
+        if scores[best] < self.similarity_threshold:
+            return None, None
+        return rows[best][0], (rows[best][2], rows[best][3])
+
+    def put(self, corpus: str, question: str, chunk_ids: List[str], answer: str, sources: List[str],
+            query_vector: Optional[List[float]] = None):
+        """Store an answer and evict the least recently used entries past max_entries"""
+        now = time.time()
+        embedding = np.asarray(query_vector, dtype=np.float32).tobytes() if query_vector is not None else None
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO answers (key, corpus, question, answer, sources, embedding, chunks, "
+                "created_at, last_used) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (self._key(corpus, question, chunk_ids), corpus, question, answer,
+                 json.dumps(sources), embedding, self._chunks_key(chunk_ids), now, now)
+            )
+            self._conn.execute("DELETE FROM answers WHERE created_at < ?", (now - self.ttl_seconds,))
+            self._conn.execute(
+                "DELETE FROM answers WHERE key IN "
+                "(SELECT key FROM answers ORDER BY last_used DESC LIMIT -1 OFFSET ?)", (self.max_entries,)
+            )
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM answers")
+            self._conn.commit()
+            self.hits = self.semantic_hits = self.misses = 0
+
+    def get_stats(self) -> dict:
+        """Hit-rate metrics"""
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            'entries': entries,
+            'hits': self.hits,
+            'semantic_hits': self.semantic_hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0
+        }
@@ -0,0 +1,609 @@
+"""
+Headless async HTTP API for DocuChat (aiohttp), independent of the Streamlit UI.
+
+    POST   /sessions                                 create a session ({"session_id"} optional) -> {session_id}
+    GET    /sessions/{session_id}                    file filter and recent conversation
+    DELETE /sessions/{session_id}                    drop the session, its documents and jobs
+    POST   /sessions/{session_id}/documents          upload: multipart "file" parts, or a raw body with
+                                                     ?file_name= -> 202 {jobs: [...]}
+    GET    /sessions/{session_id}/documents          files, pages and chunks of the session's corpus
+    DELETE /sessions/{session_id}/documents/{name}   remove one file
+    GET    /sessions/{session_id}/jobs[/{job_id}]    ingestion status and progress
+    DELETE /sessions/{session_id}/jobs/{job_id}      cancel an ingestion job
+    POST   /sessions/{session_id}/ask                {"question", "stream": false, "files": [...]} ->
+                                                     {answer, sources, cached}; with stream, a
+                                                     text/event-stream of "token" events and a final "done"
+    GET    /health, GET /metrics                     liveness; Prometheus text of this worker
+
+Each session owns one corpus (the chat's collection). Sessions, job status and indexes live
+in the persist directory, so any worker process can serve any request: --workers N starts N
+processes on one port (SO_REUSEPORT), each with its own ingestion pool. Use the numpy vector
+backend with several workers (Chroma's local store is single-process).
+
+    python api.py --port 8000 --workers 4 --backend numpy
+    python api.py --fake-llm --fake-embeddings --backend numpy   # offline, e.g. for load tests
+"""
+import os
+import re
+import json
+import time
+import shutil
+import asyncio
+import logging
+import argparse
+import tempfile
+import weakref
+import contextlib
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional
+from aiohttp import web, BodyPartReader
+from chatbot_engine import ChatbotEngine
+from context_packer import ContextPacker
+from conversation_memory import ConversationMemory
+from answer_cache import corpus_cache_key
+from collection_registry import DEFAULT_PERSIST_DIR, DEFAULT_TTL_SECONDS
+from document_processor import processor_from_env
+from engine_pool import EnginePool
+from file_lock import FileLock
+from ingestion_jobs import IngestionJob, get_ingestion_queue, ACTIVE_STATES, FINISHED_JOB_TTL_SECONDS
+from metrics import get_metrics
+
+DEFAULT_HOST = os.getenv("DOCUCHAT_API_HOST", "127.0.0.1")
+DEFAULT_PORT = int(os.getenv("DOCUCHAT_API_PORT", "8000"))
+DEFAULT_WORKERS = int(os.getenv("DOCUCHAT_API_WORKERS", "1"))
+MAX_UPLOAD_MB = float(os.getenv("DOCUCHAT_API_MAX_UPLOAD_MB", "200"))
+SUPPORTED_EXTENSIONS = (".pdf", ".txt", ".docx")
+# Session and job IDs; session IDs double as corpus IDs (the Streamlit chat ID format)
+HEX_ID = re.compile(r"[0-9a-f]{32}")
+# Threads per worker for blocking work: retrieval, and LLM streams waiting on the model server
+DEFAULT_THREADS = int(os.getenv("DOCUCHAT_API_THREADS", "32"))
+UPLOAD_BLOCK = 1024 * 1024
+SESSION_GC_INTERVAL = 600
+
+
+def _fail(error_class, message: str):
+    raise error_class(text=json.dumps({'error': message}), content_type="application/json")
+
+
+def _write_json(path: str, data: dict):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+@contextlib.asynccontextmanager
+async def _holding(lock: FileLock):
+    """Hold a blocking lock without stalling the event loop; a request cancelled while waiting releases it"""
+    acquiring = asyncio.ensure_future(asyncio.to_thread(lock.acquire))
+    try:
+        await asyncio.shield(acquiring)
+    except asyncio.CancelledError:
+        acquiring.add_done_callback(lambda done: done.cancelled() or done.exception() or lock.release())
+        raise
+    try:
+        yield
+    finally:
+        lock.release()
+
+
+def _read_json(path: str) -> Optional[dict]:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logging.error(f"Could not read {path}: {e}")
+        return None
+
+
+class SessionStore:
+    """One small JSON file per session (conversation memory and file filter), readable by every worker"""
+
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def path(self, session_id: str) -> str:
+        return os.path.join(self.root, f"{session_id}.json")
+
+    def get(self, session_id: str) -> Optional[dict]:
+        return _read_json(self.path(session_id))
+
+    def lock(self, session_id: str) -> FileLock:
+        """Held by whichever worker is answering a turn, so turns from two workers are not lost"""
+        return FileLock(os.path.join(self.root, f"{session_id}.lock"))
+
+    def create(self, session_id: str) -> dict:
+        now = time.time()
+        session = {'session_id': session_id, 'created_at': now, 'last_used': now, 'file_filter': [],
+                   'memory': {'messages': [], 'summary': "", 'summary_tokens': 0}}
+        _write_json(self.path(session_id), session)
+        return session
+
+    def save(self, session: dict):
+        session['last_used'] = time.time()
+        _write_json(self.path(session['session_id']), session)
+
+    def delete(self, session_id: str):
+        for path in (self.path(session_id), os.path.join(self.root, f"{session_id}.lock")):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def expired(self, ttl_seconds: float) -> List[str]:
+        cutoff = time.time() - ttl_seconds
+        expired = []
+        for name in os.listdir(self.root):
+            if name.endswith(".json"):
+                try:
+                    if os.path.getmtime(os.path.join(self.root, name)) < cutoff:
+                        expired.append(name[:-len(".json")])
+                except FileNotFoundError:
+                    continue
+        return expired
+
+
+class JobStore:
+    """
+    Status files of ingestion jobs, one directory per session. The worker running a job
+    rewrites its file on every change; a cancel request from another worker is a marker file.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, session_id: str, job_id: str, suffix: str = ".json") -> str:
+        return os.path.join(self.root, session_id, f"{job_id}{suffix}")
+
+    def create_session(self, session_id: str):
+        os.makedirs(os.path.join(self.root, session_id), exist_ok=True)
+
+    def write(self, job: IngestionJob):
+        status = {**job.to_dict(), 'created_at': job.created_at, 'finished_at': job.finished_at,
+                  'worker': os.getpid()}
+        try:
+            _write_json(self._path(job.corpus_id, job.job_id), status)
+        except FileNotFoundError:
+            pass  # the session was deleted while the job ran
+
+    def get(self, session_id: str, job_id: str) -> Optional[dict]:
+        return _read_json(self._path(session_id, job_id))
+
+    def list(self, session_id: str) -> List[dict]:
+        """Jobs of a session, oldest first; finished jobs expire after FINISHED_JOB_TTL_SECONDS"""
+        directory = os.path.join(self.root, session_id)
+        try:
+            names = os.listdir(directory)
+        except FileNotFoundError:
+            return []
+        cutoff = time.time() - FINISHED_JOB_TTL_SECONDS
+        jobs = []
+        for name in names:
+            if not name.endswith(".json"):
+                continue
+            status = _read_json(os.path.join(directory, name))
+            if status is None:
+                continue
+            if status['finished_at'] is not None and status['finished_at'] < cutoff:
+                self._remove(session_id, status['job_id'])
+                continue
+            jobs.append(status)
+        return sorted(jobs, key=lambda status: status['created_at'])
+
+    def request_cancel(self, session_id: str, job_id: str):
+        open(self._path(session_id, job_id, ".cancel"), "w").close()
+
+    def cancel_requested(self, session_id: str, job_id: str) -> bool:
+        return os.path.exists(self._path(session_id, job_id, ".cancel"))
+
+    def _remove(self, session_id: str, job_id: str):
+        for suffix in (".json", ".cancel"):
+            try:
+                os.remove(self._path(session_id, job_id, suffix))
+            except FileNotFoundError:
+                pass
+
+    def delete_session(self, session_id: str):
+        shutil.rmtree(os.path.join(self.root, session_id), ignore_errors=True)
+
+
+def _sse(event: str, data: dict) -> bytes:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n".encode("utf-8")
+
+
+class DocuChatAPI:
+    """
+    Request handlers over a DocumentProcessor and per-request ChatbotEngine views.
+
+    Each corpus has one shared engine in an EnginePool (vector store, lexical index, LLM client,
+    answer cache); a request only restores the session's conversation memory into a view of it.
+    """
+
+    def __init__(self, persist_dir: str = DEFAULT_PERSIST_DIR, processor=None, llm=None, answer_cache=None,
+                 count_tokens: Optional[Callable[[str], int]] = None, query_batcher=None, top_k: int = 10,
+                 session_ttl_seconds: float = DEFAULT_TTL_SECONDS):
+        self.processor = processor or processor_from_env(persist_dir=persist_dir)
+        self.llm = llm
+        self.answer_cache = answer_cache
+        self.count_tokens = count_tokens
+        self.query_batcher = query_batcher
+        self.top_k = top_k
+        self.session_ttl_seconds = session_ttl_seconds
+        api_dir = os.path.join(self.processor.collections.persist_dir, "api")
+        self.sessions = SessionStore(os.path.join(api_dir, "sessions"))
+        self.jobs = JobStore(os.path.join(api_dir, "jobs"))
+        self.upload_dir = os.path.join(api_dir, "uploads")
+        os.makedirs(self.upload_dir, exist_ok=True)
+        self.queue = get_ingestion_queue()
+        self.engines = EnginePool(self._build_engine, release=self.processor.release_corpus)
+        # Turns of one session are answered in order within a worker
+        self._session_locks = weakref.WeakValueDictionary()
+
+    # Sessions
+
+    def _session(self, request: web.Request) -> dict:
+        session_id = request.match_info['session_id']
+        session = self.sessions.get(session_id) if HEX_ID.fullmatch(session_id) else None
+        if session is None:
+            _fail(web.HTTPNotFound, f"Unknown session {session_id}")
+        return session
+
+    def _session_lock(self, session_id: str) -> asyncio.Lock:
+        lock = self._session_locks.get(session_id)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._session_locks[session_id] = lock
+        return lock
+
+    async def create_session(self, request: web.Request) -> web.Response:
+        try:
+            body = await request.json() if request.can_read_body else {}
+        except ValueError:
+            _fail(web.HTTPBadRequest, "Expected a JSON body")
+        session_id = body.get('session_id') or os.urandom(16).hex()
+        if not HEX_ID.fullmatch(session_id):
+            _fail(web.HTTPBadRequest, "session_id must be 32 lowercase hex characters")
+        if self.sessions.get(session_id) is not None:
+            return web.json_response({'session_id': session_id})
+        self.sessions.create(session_id)
+        self.jobs.create_session(session_id)
+        return web.json_response({'session_id': session_id}, status=201)
+
+    async def get_session(self, request: web.Request) -> web.Response:
+        session = self._session(request)
+        return web.json_response({
+            'session_id': session['session_id'],
+            'created_at': session['created_at'],
+            'last_used': session['last_used'],
+            'file_filter': session['file_filter'],
+            'history': [{'role': m['role'], 'content': m['content']} for m in session['memory']['messages']],
+            'summary': session['memory']['summary'],
+        })
+
+    async def delete_session(self, request: web.Request) -> web.Response:
+        session = self._session(request)
+        session_id = session['session_id']
+        self._cancel_jobs(session_id)
+        await asyncio.to_thread(self._delete_corpus, session_id)
+        self.sessions.delete(session_id)
+        self.jobs.delete_session(session_id)
+        return web.json_response({'deleted': session_id})
+
+    def _cancel_jobs(self, session_id: str):
+        for status in self.jobs.list(session_id):
+            if status['status'] in ACTIVE_STATES and not self.queue.cancel(status['job_id']):
+                self.jobs.request_cancel(session_id, status['job_id'])
+
+    def _delete_corpus(self, session_id: str):
+        collection_name = f"corpus_{session_id}"
+        collections = self.processor.collections
+        # Waits for a running ingestion (cancelled above) to stop at its next batch
+        with collections.build_lock(collection_name):
+            self.engines.drop_corpus(session_id)
+            collections.delete(collection_name)
+
+    def collect_expired_sessions(self) -> List[str]:
+        """Forget sessions idle for longer than the TTL (their corpora expire with the collection GC)"""
+        expired = self.sessions.expired(self.session_ttl_seconds)
+        for session_id in expired:
+            # Uploads still running would keep writing into the corpus
+            self._cancel_jobs(session_id)
+            self.engines.drop_corpus(session_id)
+            self.sessions.delete(session_id)
+            self.jobs.delete_session(session_id)
+        return expired
+
+    # Documents and ingestion
+
+    async def list_documents(self, request: web.Request) -> web.Response:
+        session = self._session(request)
+        info = self.processor.get_corpus_info(session['session_id'])
+        info['indexing'] = any(status['status'] in ACTIVE_STATES for status in self.jobs.list(session['session_id']))
+        return web.json_response(info)
+
+    async def delete_document(self, request: web.Request) -> web.Response:
+        session = self._session(request)
+        file_name = request.match_info['file_name']
+        if file_name not in self.processor.get_corpus_info(session['session_id'])['files']:
+            _fail(web.HTTPNotFound, f"No document named {file_name}")
+        info = await asyncio.to_thread(self.processor.remove_file, session['session_id'], file_name)
+        return web.json_response(info)
+
+    async def upload(self, request: web.Request) -> web.Response:
+        session = self._session(request)
+        received = []
+        try:
+            if request.content_type.startswith("multipart/"):
+                reader = await request.multipart()
+                async for part in reader:
+                    if isinstance(part, BodyPartReader) and part.filename:
+                        received.append(await self._receive(part.read_chunk, part.filename))
+            elif request.query.get('file_name'):
+                received.append(await self._receive(request.content.read, request.query['file_name']))
+            else:
+                _fail(web.HTTPBadRequest, "Send multipart file parts, or the file as the body with ?file_name=")
+            if not received:
+                _fail(web.HTTPBadRequest, "No files in the request")
+        except BaseException:
+            for path, _ in received:
+                os.unlink(path)
+            raise
+
+        jobs = []
+        for index, (path, file_name) in enumerate(received):
+            try:
+                job = await asyncio.to_thread(self.queue.submit, self.processor, session['session_id'], path,
+                                              file_name, True, self._on_job_update)
+            except Exception:
+                for unsubmitted, _ in received[index:]:
+                    os.unlink(unsubmitted)
+                raise
+            jobs.append(self.jobs.get(session['session_id'], job.job_id) or job.to_dict())
+        return web.json_response({'jobs': jobs}, status=202)
+
+    async def _receive(self, read, file_name: str):
+        """Stream one upload to a temporary file; returns (path, file_name)"""
+        file_name = os.path.basename(file_name)
+        extension = os.path.splitext(file_name)[1].lower()
+        if extension not in SUPPORTED_EXTENSIONS:
+            _fail(web.HTTPUnsupportedMediaType, f"{file_name}: supported formats are {', '.join(SUPPORTED_EXTENSIONS)}")
+        limit = int(MAX_UPLOAD_MB * 1024 * 1024)
+        fd, path = tempfile.mkstemp(suffix=extension, dir=self.upload_dir)
+        size = 0
+        try:
+            with os.fdopen(fd, "wb") as f:
+                while block := await read(UPLOAD_BLOCK):
+                    size += len(block)
+                    if size > limit:
+                        _fail(web.HTTPRequestEntityTooLarge, f"{file_name} is larger than {MAX_UPLOAD_MB:g} MB")
+                    f.write(block)
+        except BaseException:
+            os.unlink(path)
+            raise
+        return path, file_name
+
+    def _on_job_update(self, job: IngestionJob):
+        self.jobs.write(job)
+        # A deleted or expired session (possibly by another worker, which also removes cancel markers)
+        if job.active and (self.jobs.cancel_requested(job.corpus_id, job.job_id)
+                           or not os.path.exists(self.sessions.path(job.corpus_id))):
+            job.cancel()
+
+    async def list_jobs(self, request: web.Request) -> web.Response:
+        session = self._session(request)
+        return web.json_response({'jobs': self.jobs.list(session['session_id'])})
+
+    def _job(self, session: dict, job_id: str) -> dict:
+        status = self.jobs.get(session['session_id'], job_id) if HEX_ID.fullmatch(job_id) else None
+        if status is None:
+            _fail(web.HTTPNotFound, f"Unknown job {job_id}")
+        return status
+
+    async def get_job(self, request: web.Request) -> web.Response:
+        session = self._session(request)
+        return web.json_response(self._job(session, request.match_info['job_id']))
+
+    async def cancel_job(self, request: web.Request) -> web.Response:
+        session = self._session(request)
+        job_id = request.match_info['job_id']
+        status = self._job(session, job_id)
+        # The job stops at its next batch, in whichever worker runs it
+        if status['status'] in ACTIVE_STATES and not self.queue.cancel(job_id):
+            self.jobs.request_cancel(session['session_id'], job_id)
+        return web.json_response(self.jobs.get(session['session_id'], job_id), status=202)
+
+    # Questions
+
+    def _build_engine(self, session_id: str) -> ChatbotEngine:
+        return ChatbotEngine(
+            self.processor.open_corpus(session_id), top_k=self.top_k, llm=self.llm,
+            answer_cache=self.answer_cache, memory=ConversationMemory(count_tokens=self.count_tokens),
+            context_packer=ContextPacker(token_budget=1500, count_tokens=self.count_tokens),
+            lexical_index=self.processor.get_lexical_index(f"corpus_{session_id}"),
+            query_batcher=self.query_batcher
+        )
+
+    def _engine(self, session: dict) -> ChatbotEngine:
+        session_id = session['session_id']
+        memory = ConversationMemory(count_tokens=self.count_tokens)
+        memory.restore(session['memory'])
+        engine = self.engines.shared(session_id).for_session(memory)
+        engine.set_file_filter(session['file_filter'])
+        info = self.processor.get_corpus_info(session_id)
+        # Answers from a partly indexed corpus are not cached
+        if not any(status['status'] in ACTIVE_STATES for status in self.jobs.list(session_id)):
+            engine.corpus_key = corpus_cache_key(f['hash'] for f in info['files'].values())
+        self.processor.collections.touch(info['storage'])
+        return engine
+
+    async def ask(self, request: web.Request) -> web.StreamResponse:
+        session_id = self._session(request)['session_id']
+        try:
+            body = await request.json()
+        except ValueError:
+            _fail(web.HTTPBadRequest, "Expected a JSON body")
+        question = str(body.get('question') or "").strip()
+        if not question:
+            _fail(web.HTTPBadRequest, "question is required")
+
+        # The asyncio lock orders turns within this worker, the file lock across workers
+        async with self._session_lock(session_id), _holding(self.sessions.lock(session_id)):
+            # Re-read under the lock: another request may have just added a turn
+            session = self.sessions.get(session_id)
+            if session is None:
+                _fail(web.HTTPNotFound, f"Unknown session {session_id}")
+            if body.get('files') is not None:
+                session['file_filter'] = list(body['files'])
+            engine = await asyncio.to_thread(self._engine, session)
+
+            if not body.get('stream'):
+                answer, sources = await asyncio.to_thread(engine.get_response, question)
+                self._save_turn(session, engine)
+                return web.json_response({'answer': answer, 'sources': sources, 'cached': engine.last_cache_hit})
+
+            response = web.StreamResponse(headers={'Content-Type': "text/event-stream", 'Cache-Control': "no-cache"})
+            await response.prepare(request)
+            async for token in engine.astream_response(question):
+                await response.write(_sse("token", {'text': token}))
+            self._save_turn(session, engine)
+            await response.write(_sse("done", {'sources': engine.last_sources, 'cached': engine.last_cache_hit}))
+            await response.write_eof()
+            return response
+
+    def _save_turn(self, session: dict, engine: ChatbotEngine):
+        session['memory'] = engine.memory.state()
+        session['file_filter'] = engine.file_filter
+        if self.sessions.get(session['session_id']) is not None:  # not deleted meanwhile
+            self.sessions.save(session)
+
+    # Operations
+
+    async def health(self, request: web.Request) -> web.Response:
+        return web.json_response({'status': "ok", 'pid': os.getpid()})
+
+    async def metrics(self, request: web.Request) -> web.Response:
+        return web.Response(text=get_metrics().render_prometheus(), content_type="text/plain")
+
+    def routes(self) -> List[web.RouteDef]:
+        return [
+            web.get("/health", self.health),
+            web.get("/metrics", self.metrics),
+            web.post("/sessions", self.create_session),
+            web.get("/sessions/{session_id}", self.get_session),
+            web.delete("/sessions/{session_id}", self.delete_session),
+            web.post("/sessions/{session_id}/documents", self.upload),
+            web.get("/sessions/{session_id}/documents", self.list_documents),
+            web.delete("/sessions/{session_id}/documents/{file_name}", self.delete_document),
+            web.get("/sessions/{session_id}/jobs", self.list_jobs),
+            web.get("/sessions/{session_id}/jobs/{job_id}", self.get_job),
+            web.delete("/sessions/{session_id}/jobs/{job_id}", self.cancel_job),
+            web.post("/sessions/{session_id}/ask", self.ask),
+        ]
+
+
+API_KEY = web.AppKey("docuchat", DocuChatAPI)
+
+
+def create_app(service: Optional[DocuChatAPI] = None, threads: int = DEFAULT_THREADS, **kwargs) -> web.Application:
+    """aiohttp application around a DocuChatAPI (built from kwargs if not given)"""
+    service = service or DocuChatAPI(**kwargs)
+    app = web.Application()
+    app[API_KEY] = service
+    app.add_routes(service.routes())
+
+    async def background(app):
+        # The default executor (CPU count + 4 threads) would cap concurrent answers
+        asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(threads, thread_name_prefix="api"))
+        service.processor.collections.start_gc()
+
+        async def collect_sessions():
+            while True:
+                await asyncio.sleep(SESSION_GC_INTERVAL)
+                try:
+                    await asyncio.to_thread(service.collect_expired_sessions)
+                except Exception as e:
+                    logging.error(f"Session garbage collector failed: {e}")
+
+        task = asyncio.create_task(collect_sessions())
+        yield
+        task.cancel()
+
+    app.cleanup_ctx.append(background)
+    return app
+
+
+def build_service(args) -> DocuChatAPI:
+    """DocuChatAPI from command-line options"""
+    from answer_cache import AnswerCache
+    os.makedirs(args.persist_dir, exist_ok=True)
+    processor_options = {'persist_dir': args.persist_dir, 'vector_backend': args.backend}
+    if args.fake_embeddings:
+        from langchain_core.embeddings import DeterministicFakeEmbedding
+        processor_options['embeddings'] = DeterministicFakeEmbedding(size=384)
+    llm, count_tokens = None, None
+    if args.fake_llm:
+        from fake_llm import FakeStreamingChatModel
+        from conversation_memory import _approximate_token_count
+        llm = FakeStreamingChatModel(first_token_delay=args.fake_llm_ttft, token_delay=args.fake_llm_token_delay)
+        count_tokens = _approximate_token_count
+    query_batcher = None
+    if os.getenv("DOCUCHAT_QUERY_BATCHING", "0") == "1":
+        from query_batcher import get_query_batcher
+        query_batcher = get_query_batcher()
+    answer_cache = None
+    if not args.no_answer_cache:
+        # Kept with the indexes it answers from (shared by all workers) unless DOCUCHAT_ANSWER_CACHE_PATH is set
+        threshold = os.getenv("DOCUCHAT_ANSWER_CACHE_SIMILARITY")
+        answer_cache = AnswerCache(os.getenv("DOCUCHAT_ANSWER_CACHE_PATH") or
+                                   os.path.join(args.persist_dir, "answer_cache.sqlite3"),
+                                   similarity_threshold=float(threshold) if threshold else None)
+    return DocuChatAPI(processor=processor_from_env(**processor_options), llm=llm, count_tokens=count_tokens,
+                       answer_cache=answer_cache, query_batcher=query_batcher)
+
+
+def run_worker(args):
+    logging.basicConfig(level=logging.INFO, format=f"%(asctime)s [worker {os.getpid()}] %(levelname)s %(message)s")
+    web.run_app(create_app(build_service(args)), host=args.host, port=args.port, reuse_port=args.workers > 1,
+                access_log=None, print=lambda message: logging.info(message))
+
+
+def main(argv=None):
+    from vector_backends import DEFAULT_BACKEND
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="worker processes sharing the port")
+    parser.add_argument("--persist-dir", default=DEFAULT_PERSIST_DIR)
+    parser.add_argument("--backend", default=DEFAULT_BACKEND, choices=["chroma", "numpy"])
+    parser.add_argument("--fake-llm", action="store_true", help="answer with the local fake model")
+    parser.add_argument("--fake-llm-ttft", type=float, default=0.2, help="fake model time to first token (s)")
+    parser.add_argument("--fake-llm-token-delay", type=float, default=0.01, help="fake model delay per token (s)")
+    parser.add_argument("--fake-embeddings", action="store_true", help="hash-based embeddings, no model download")
+    parser.add_argument("--no-answer-cache", action="store_true", help="always run retrieval and the LLM")
+    args = parser.parse_args(argv)
+    if args.workers > 1 and args.backend == "chroma":
+        parser.error("the chroma backend cannot be shared by several worker processes; use --backend numpy")
+
+    if args.workers == 1:
+        run_worker(args)
+        return
+    context = multiprocessing.get_context("spawn")
+    workers = [context.Process(target=run_worker, args=(args,), name=f"docuchat-api-{i}")
+               for i in range(args.workers)]
+    for worker in workers:
+        worker.start()
+    try:
+        for worker in workers:
+            worker.join()
+    except KeyboardInterrupt:
+        for worker in workers:
+            worker.terminate()
+
+
+if __name__ == "__main__":
+    main()
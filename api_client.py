@@ -0,0 +1,133 @@
+"""
+Client for the DocuChat HTTP API (api.py).
+
+The Streamlit UI uses it when DOCUCHAT_API_URL is set: RemoteJob and RemoteEngine stand in
+for IngestionJob and ChatbotEngine, so the page works the same against a local or remote backend.
+"""
+import json
+from urllib.parse import quote
+from typing import Iterator, List, Optional, Tuple
+import httpx
+
+UPLOAD_BLOCK = 1024 * 1024
+
+
+class RemoteJob:
+    """An ingestion job as last reported by the API"""
+
+    def __init__(self, client: "DocuChatClient", session_id: str, status: dict):
+        self.client = client
+        self.session_id = session_id
+        self.job_id = status['job_id']
+        self.file_name = status['file_name']
+        self.status = status['status']
+        self.progress = status['progress']
+        self.pages_done = status['pages_done']
+        self.total_pages = status['total_pages']
+        self.chunks_done = status['chunks_done']
+        self.error = status['error']
+
+    @property
+    def active(self) -> bool:
+        return self.status in ("queued", "running")
+
+    def cancel(self):
+        self.client.cancel(self.session_id, self.job_id)
+
+
+class RemoteEngine:
+    """ChatbotEngine stand-in for one API session; the conversation is kept by the API"""
+
+    def __init__(self, client: "DocuChatClient", session_id: str):
+        self.client = client
+        self.session_id = session_id
+        self.file_filter: List[str] = []
+        self.last_sources: List[str] = []
+        self.last_cache_hit = False
+        # Set by the UI for local engines; the API derives it from the session's files
+        self.corpus_key = None
+
+    def set_file_filter(self, file_names=None):
+        self.file_filter = list(file_names or [])
+
+    @property
+    def history(self) -> List[dict]:
+        return self.client.get_session(self.session_id)['history']
+
+    def get_response(self, question: str):
+        result = self.client.ask(self.session_id, question, self.file_filter)
+        self.last_sources, self.last_cache_hit = result['sources'], result['cached']
+        return result['answer'], result['sources']
+
+    def stream_response(self, question: str) -> Iterator[str]:
+        for event, data in self.client.stream_ask(self.session_id, question, self.file_filter):
+            if event == "token":
+                yield data['text']
+            elif event == "done":
+                self.last_sources, self.last_cache_hit = data['sources'], data['cached']
+
+
+class DocuChatClient:
+    """Thin synchronous wrapper over the API endpoints (one pooled HTTP client)"""
+
+    def __init__(self, base_url: str, timeout: float = 30.0, answer_timeout: float = 300.0):
+        self.http = httpx.Client(base_url=base_url.rstrip("/"), timeout=timeout)
+        self.answer_timeout = answer_timeout
+
+    def _json(self, response: httpx.Response):
+        if response.is_error:
+            try:
+                message = response.json()['error']
+            except (ValueError, KeyError, TypeError):
+                message = response.text
+            raise RuntimeError(f"DocuChat API error {response.status_code}: {message}")
+        return response.json()
+
+    def create_session(self, session_id: Optional[str] = None) -> str:
+        """Create a session (or reuse an existing one with this ID)"""
+        return self._json(self.http.post("/sessions", json={'session_id': session_id} if session_id else None))['session_id']
+
+    def get_session(self, session_id: str) -> dict:
+        return self._json(self.http.get(f"/sessions/{session_id}"))
+
+    def delete_session(self, session_id: str):
+        self._json(self.http.delete(f"/sessions/{session_id}"))
+
+    def submit(self, session_id: str, upload, file_name: str) -> RemoteJob:
+        """Upload bytes or a file-like object (streamed in blocks) for indexing"""
+        content = upload if isinstance(upload, (bytes, bytearray)) else iter(lambda: upload.read(UPLOAD_BLOCK), b"")
+        result = self._json(self.http.post(f"/sessions/{session_id}/documents", params={'file_name': file_name},
+                                           content=content, timeout=self.answer_timeout))
+        return RemoteJob(self, session_id, result['jobs'][0])
+
+    def jobs_for(self, session_id: str) -> List[RemoteJob]:
+        return [RemoteJob(self, session_id, status)
+                for status in self._json(self.http.get(f"/sessions/{session_id}/jobs"))['jobs']]
+
+    def cancel(self, session_id: str, job_id: str):
+        self._json(self.http.delete(f"/sessions/{session_id}/jobs/{job_id}"))
+
+    def get_corpus_info(self, session_id: str) -> dict:
+        return self._json(self.http.get(f"/sessions/{session_id}/documents"))
+
+    def remove_file(self, session_id: str, file_name: str) -> dict:
+        return self._json(self.http.delete(f"/sessions/{session_id}/documents/{quote(file_name, safe='')}"))
+
+    def ask(self, session_id: str, question: str, files: Optional[List[str]] = None) -> dict:
+        return self._json(self.http.post(f"/sessions/{session_id}/ask", json={'question': question, 'files': files},
+                                         timeout=self.answer_timeout))
+
+    def stream_ask(self, session_id: str, question: str,
+                   files: Optional[List[str]] = None) -> Iterator[Tuple[str, dict]]:
+        """(event, data) pairs of the answer's server-sent events: "token" events, then "done\""""
+        with self.http.stream("POST", f"/sessions/{session_id}/ask", timeout=self.answer_timeout,
+                              json={'question': question, 'files': files, 'stream': True}) as response:
+            if response.is_error:
+                response.read()
+                self._json(response)
+            event = None
+            for line in response.iter_lines():
+                if line.startswith("event: "):
+                    event = line[len("event: "):]
+                elif line.startswith("data: "):
+                    yield event, json.loads(line[len("data: "):])
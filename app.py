@@ -1,9 +1,18 @@
 import streamlit as st
-import tempfile
 import os
-from document_processor import DocumentProcessor
+import threading
+from document_processor import processor_from_env
 from chatbot_engine import ChatbotEngine
-from utils import initialize_session_state
+from embedding_registry import warm_up
+from collection_registry import get_collection_registry
+from answer_cache import AnswerCache, corpus_cache_key
+from context_packer import ContextPacker
+from ingestion_jobs import get_ingestion_queue, DONE, FAILED, CANCELLED
+from engine_pool import get_engine_pool
+from query_batcher import get_query_batcher
+from metrics import get_metrics, start_exporters_from_env
+from api_client import DocuChatClient, RemoteEngine
+from utils import initialize_session_state, display_chat_history
 
 # Page configuration
 st.set_page_config(
@@ -194,6 +203,79 @@ st.markdown("""
 # Initialize session state
 initialize_session_state()
 
+# Optionally load the shared embedding model once per process at startup,
+# in the background so the upload page renders without waiting for torch
+@st.cache_resource(show_spinner=False)
+def warm_embedding_model():
+    thread = threading.Thread(target=warm_up, name="warm-embeddings", daemon=True)
+    thread.start()
+    return thread
+
+if os.getenv("DOCUCHAT_WARM_EMBEDDINGS", "0") == "1":
+    warm_embedding_model()
+
+# With DOCUCHAT_API_URL the page is a client of the DocuChat API (api.py), which keeps the
+# documents, ingestion jobs and conversation; otherwise everything runs in this process
+API_URL = os.getenv("DOCUCHAT_API_URL")
+
+@st.cache_resource(show_spinner=False)
+def get_api_client():
+    return DocuChatClient(API_URL)
+
+# One background garbage collector per process removes collections unused within the TTL
+@st.cache_resource(show_spinner=False)
+def start_collection_gc():
+    registry = get_collection_registry()
+    registry.start_gc()
+    return registry
+
+if not API_URL:
+    start_collection_gc()
+
+# Prometheus endpoint / JSON dump when DOCUCHAT_METRICS=1 (see metrics.py)
+@st.cache_resource(show_spinner=False)
+def start_metrics_exporters():
+    start_exporters_from_env()
+    return get_metrics()
+
+start_metrics_exporters()
+
+def show_admin_panel():
+    """Stage latencies, counters and pool statistics for this process (?admin=1 or DOCUCHAT_ADMIN=1)"""
+    from llm_client import get_llm_stats
+    from embedding_registry import get_registry_stats
+    metrics = get_metrics()
+    with st.sidebar.expander("📈 Admin: performance", expanded=False):
+        if not metrics.enabled:
+            st.caption("Stage metrics are off; set DOCUCHAT_METRICS=1 to record them.")
+        snapshot = metrics.snapshot()
+        if snapshot['stages']:
+            st.markdown("**Stage latency (ms)**")
+            st.table({stage: {'count': values['count'], 'p50': values['p50_ms'], 'p95': values['p95_ms'],
+                              'p99': values['p99_ms']} for stage, values in snapshot['stages'].items()})
+        if snapshot['counters']:
+            st.markdown("**Counters**")
+            st.json(snapshot['counters'])
+        st.markdown("**LLM client**")
+        st.json(get_llm_stats())
+        if os.getenv("DOCUCHAT_QUERY_BATCHING", "0") == "1":
+            st.markdown("**Query batching**")
+            st.json(get_query_batcher().stats())
+        st.markdown("**Embedding models**")
+        st.json(get_registry_stats())
+        st.download_button("Download Prometheus metrics", metrics.render_prometheus(),
+                           file_name="docuchat_metrics.txt", mime="text/plain")
+
+if st.query_params.get("admin") == "1" or os.getenv("DOCUCHAT_ADMIN", "0") == "1":
+    show_admin_panel()
+
+# Answers are shared across sessions; set DOCUCHAT_ANSWER_CACHE_SIMILARITY (e.g. 0.92)
+# to also reuse answers for paraphrased questions
+@st.cache_resource(show_spinner=False)
+def get_answer_cache():
+    threshold = os.getenv("DOCUCHAT_ANSWER_CACHE_SIMILARITY")
+    return AnswerCache(similarity_threshold=float(threshold) if threshold else None)
+
 # Modern header
 st.markdown("""
 <div class="header">
@@ -202,8 +284,123 @@ st.markdown("""
 </div>
 """, unsafe_allow_html=True)
 
+def describe_files(doc_info):
+    """Status-bar label for the files in the current chat"""
+    names = list(doc_info['files'])
+    if not names:
+        return "Your documents"
+    return names[0] if len(names) == 1 else f"{len(names)} documents"
+
+def get_processor():
+    # Chunk settings from DOCUCHAT_CHUNK_SIZE / DOCUCHAT_CHUNK_OVERLAP / DOCUCHAT_SPLITTER
+    return processor_from_env()
+
+def get_corpus_info(corpus_id):
+    return get_api_client().get_corpus_info(corpus_id) if API_URL else get_processor().get_corpus_info(corpus_id)
+
+def get_corpus_jobs(corpus_id):
+    return get_api_client().jobs_for(corpus_id) if API_URL else get_ingestion_queue().jobs_for(corpus_id)
+
+def remove_corpus_file(corpus_id, file_name):
+    if API_URL:
+        return get_api_client().remove_file(corpus_id, file_name)
+    return get_processor().remove_file(corpus_id, file_name)
+
+def build_corpus_engine(corpus_id):
+    """Shared engine for a corpus; adding files later updates the same collection, so it sees them immediately"""
+    processor = get_processor()
+    return ChatbotEngine(
+        vectorstore=processor.open_corpus(corpus_id), top_k=10, answer_cache=get_answer_cache(),
+        context_packer=ContextPacker(token_budget=1500),
+        lexical_index=processor.get_lexical_index(f"corpus_{corpus_id}"),
+        # Concurrent questions from all sessions share embedding and search calls
+        query_batcher=get_query_batcher() if os.getenv("DOCUCHAT_QUERY_BATCHING", "0") == "1" else None
+    )
+
+def release_corpus(corpus_id):
+    # A corpus still being indexed keeps its cached store for the running job
+    if not any(job.active for job in get_ingestion_queue().jobs_for(corpus_id)):
+        get_processor().release_corpus(corpus_id)
+
+# One engine per corpus shared by every browser tab on it; each chat only keeps its own memory,
+# and idle chats are evicted (DOCUCHAT_SESSION_TTL_MINUTES, DOCUCHAT_MAX_SESSIONS, DOCUCHAT_SESSION_MEMORY_MB)
+@st.cache_resource(show_spinner=False)
+def engine_pool():
+    return get_engine_pool(build_corpus_engine, release=release_corpus)
+
+def current_engine():
+    """This chat's engine: a view of the corpus's shared engine, or the API session"""
+    if API_URL:
+        return RemoteEngine(get_api_client(), st.session_state.corpus_id)
+    return engine_pool().session(st.session_state.corpus_id)
+
+def ensure_chat_engine():
+    """Open the chat as soon as a corpus exists; it answers from whatever is indexed so far"""
+    st.session_state.chat_active = True
+    doc_info = get_corpus_info(st.session_state.corpus_id)
+    st.session_state.doc_info = doc_info
+    st.session_state.current_file = describe_files(doc_info)
+
+def start_ingestion(uploaded_files):
+    """Queue uploads for background indexing into this chat's corpus"""
+    for uploaded_file in uploaded_files:
+        if API_URL:
+            get_api_client().submit(st.session_state.corpus_id, uploaded_file, uploaded_file.name)
+        else:
+            # Jobs read the upload buffer in place and drop it when they finish
+            get_ingestion_queue().submit(get_processor(), st.session_state.corpus_id, uploaded_file,
+                                         uploaded_file.name)
+    # A fresh uploader widget lets Streamlit release its copy of the files
+    st.session_state.uploader_key += 1
+    ensure_chat_engine()
+
+def announce_finished_jobs(jobs):
+    """Show one notification per finished upload batch (outside the conversation history)"""
+    finished = [job for job in jobs if not job.active and job.job_id not in st.session_state.announced_jobs]
+    if not finished:
+        return
+    st.session_state.announced_jobs.update(job.job_id for job in finished)
+    doc_info = st.session_state.doc_info
+    ready = [job.file_name for job in finished if job.status == DONE]
+    if ready:
+        st.toast(f"**{', '.join(ready)}** ready for conversation! {len(doc_info['files'])} documents, "
+                 f"{doc_info['pages']} pages, {doc_info['chunks']} sections in this chat.", icon="🎉")
+    for job in finished:
+        if job.status == FAILED:
+            st.toast(f"Could not process **{job.file_name}**: {job.error}", icon="⚠️")
+        elif job.status == CANCELLED:
+            st.toast(f"Stopped processing **{job.file_name}**.", icon="⏹")
+
+@st.fragment(run_every=1)
+def show_ingestion_progress():
+    """Poll the job queue; rerun the whole page when a job finishes"""
+    jobs = get_corpus_jobs(st.session_state.corpus_id)
+    if any(not job.active and job.job_id not in st.session_state.announced_jobs for job in jobs):
+        st.rerun()
+    for job in jobs:
+        if not job.active:
+            continue
+        text_col, cancel_col = st.columns([5, 1])
+        with text_col:
+            pages = f"{job.pages_done}/{job.total_pages} pages" if job.total_pages else "waiting"
+            st.progress(job.progress, text=f"⚙️ {job.file_name}: {pages} ({job.chunks_done} chunks, "
+                                           f"already searchable)")
+        if cancel_col.button("⏹", key=f"cancel_{job.job_id}", help=f"Stop processing {job.file_name}"):
+            job.cancel()
+
+# Reopen this chat's corpus after a browser refresh (the chat ID is kept in the URL)
+st.query_params["chat"] = st.session_state.corpus_id
+if API_URL and 'api_session' not in st.session_state:
+    # The chat ID is the API session ID; creating it again just reopens it
+    st.session_state.api_session = get_api_client().create_session(st.session_state.corpus_id)
+corpus_jobs = get_corpus_jobs(st.session_state.corpus_id)
+if st.session_state.chat_active or corpus_jobs or get_corpus_info(st.session_state.corpus_id)['files']:
+    ensure_chat_engine()
+    announce_finished_jobs(corpus_jobs)
+engine = current_engine() if st.session_state.chat_active else None
+
 # Document status (if loaded)
-if st.session_state.chatbot_engine and st.session_state.doc_info:
+if engine and st.session_state.doc_info:
     col1, col2 = st.columns([5, 1])
     with col1:
         st.markdown(f"""
@@ -212,126 +409,87 @@ if st.session_state.chatbot_engine and st.session_state.doc_info:
                 📄 <strong>{st.session_state.current_file}</strong> 
                 • {st.session_state.doc_info['pages']} pages • {st.session_state.doc_info['chunks']} chunks
             </div>
-            <div style="color: white; font-weight: 500;">Ready</div>
+            <div style="color: white; font-weight: 500;">{"Indexing..." if any(job.active for job in corpus_jobs) else "Ready"}</div>
         </div>
         """, unsafe_allow_html=True)
     with col2:
         if st.button("🔄 New"):
-            for key in ['chatbot_engine', 'current_file', 'doc_info', 'messages', 'processing_file']:
+            if not API_URL:
+                engine_pool().drop_session(st.session_state.corpus_id)
+            for key in ['messages', 'chat_active', 'current_file', 'doc_info', 'announced_jobs', 'corpus_id',
+                        'api_session']:
                 if key in st.session_state:
                     del st.session_state[key]
+            st.query_params.clear()
+            st.rerun()
+    
+    # Corpus management: every file in this chat shares one index
+    with st.sidebar:
+        st.markdown("### 📚 Documents")
+        file_names = list(st.session_state.doc_info['files'])
+        for name in file_names:
+            info = st.session_state.doc_info['files'][name]
+            name_col, remove_col = st.columns([4, 1])
+            name_col.markdown(f"📄 {name}  \n{info['pages']} pages • {info['chunks']} chunks")
+            if remove_col.button("🗑", key=f"remove_{name}", help=f"Remove {name}"):
+                doc_info = remove_corpus_file(st.session_state.corpus_id, name)
+                st.session_state.doc_info = doc_info
+                st.session_state.current_file = describe_files(doc_info)
+                st.rerun()
+        
+        selected = st.multiselect("Search only in", file_names, help="Leave empty to search all documents")
+        engine.set_file_filter(selected)
+        
+        more_files = st.file_uploader(
+            "➕ Add documents",
+            type=['pdf', 'txt', 'docx'],
+            accept_multiple_files=True,
+            key=f"more_files_{st.session_state.uploader_key}"
+        )
+        if more_files and st.button("Add to chat", use_container_width=True):
+            start_ingestion(more_files)
             st.rerun()
+    
+    show_ingestion_progress()
 
 # Clean and simple upload section
-if not st.session_state.chatbot_engine and not st.session_state.get('processing_file', False):
+if not engine:
     st.markdown("""
     <div class="upload-section">
         <h2 class="upload-title">📄 Ready to chat with your documents?</h2>
-        <p class="upload-description">Upload a PDF, TXT, or DOCX file to start an intelligent conversation</p>
+        <p class="upload-description">Upload PDF, TXT, or DOCX files to start an intelligent conversation</p>
     </div>
     """, unsafe_allow_html=True)
     
     # Simple file uploader
-    st.markdown("### 📎 Choose Your Document")
-    uploaded_file = st.file_uploader(
+    st.markdown("### 📎 Choose Your Documents")
+    uploaded_files = st.file_uploader(
         "Drag and drop or click to browse",
         type=['pdf', 'txt', 'docx'],
-        help="Supported formats: PDF, TXT, DOCX (up to 200MB)",
-        label_visibility="collapsed"
+        help="Supported formats: PDF, TXT, DOCX (up to 200MB each)",
+        accept_multiple_files=True,
+        label_visibility="collapsed",
+        key=f"uploaded_files_{st.session_state.uploader_key}"
     )
     
-    if uploaded_file is not None:
+    if uploaded_files:
         # Show file info
-        file_size = len(uploaded_file.getvalue()) / (1024*1024)  # MB
-        st.success(f"✅ **{uploaded_file.name}** loaded ({file_size:.1f} MB)")
+        for uploaded_file in uploaded_files:
+            file_size = uploaded_file.size / (1024*1024)  # MB
+            st.success(f"✅ **{uploaded_file.name}** loaded ({file_size:.1f} MB)")
         
         col1, col2, col3 = st.columns([1, 2, 1])
         with col2:
             if st.button("🚀 Process & Chat", type="primary", use_container_width=True):
-                st.session_state.uploaded_file_data = uploaded_file.getvalue()
-                st.session_state.uploaded_file_name = uploaded_file.name
-                st.session_state.processing_file = True
+                start_ingestion(uploaded_files)
                 st.rerun()
 
-# Processing section
-if st.session_state.get('processing_file', False):
-    st.markdown("""
-    <div class="processing">
-        <div class="processing-icon">⚙️</div>
-        <h2 style="color: #374151; margin-bottom: 0.5rem;">Processing Your Document</h2>
-        <p style="color: #6b7280; margin-bottom: 1.5rem;">Analyzing content and creating intelligent embeddings...</p>
-    </div>
-    """, unsafe_allow_html=True)
-    
-    progress_bar = st.progress(0)
-    status_text = st.empty()
-    
-    try:
-        file_data = st.session_state.uploaded_file_data
-        file_name = st.session_state.uploaded_file_name
-        file_extension = file_name.split('.')[-1]
-        
-        with tempfile.NamedTemporaryFile(delete=False, suffix=f".{file_extension}") as tmp_file:
-            tmp_file.write(file_data)
-            tmp_file_path = tmp_file.name
-        
-        status_text.text("Loading document...")
-        progress_bar.progress(25)
-        
-        processor = DocumentProcessor(chunk_size=1000, chunk_overlap=200)
-        
-        status_text.text("Creating chunks...")
-        progress_bar.progress(50)
-        
-        vectorstore, doc_info = processor.process_document(tmp_file_path)
-        
-        status_text.text("Building embeddings...")
-        progress_bar.progress(75)
-        
-        st.session_state.chatbot_engine = ChatbotEngine(vectorstore=vectorstore, top_k=10)
-        st.session_state.current_file = file_name
-        st.session_state.doc_info = doc_info
-        
-        progress_bar.progress(100)
-        status_text.text("Ready!")
-        
-        welcome_msg = f"""🎉 **{file_name}** is ready for conversation!
-
-📋 **Document Stats:**
-- 📄 **{doc_info['pages']} pages** processed
-- 🧩 **{doc_info['chunks']} sections** created  
-- 🧠 **AI embeddings** generated
-
-💬 **What would you like to know?** Just ask me anything about your document!"""
-        
-        st.session_state.messages.append({
-            "role": "assistant",
-            "content": welcome_msg,
-            "sources": []
-        })
-        
-        st.session_state.processing_file = False
-        del st.session_state.uploaded_file_data
-        del st.session_state.uploaded_file_name
-        
-        st.success("Document processed successfully!")
-        
-        import time
-        time.sleep(1)
-        st.rerun()
-        
-    except Exception as e:
-        st.error(f"Error: {str(e)}")
-        st.session_state.processing_file = False
-    
-    finally:
-        if 'tmp_file_path' in locals() and os.path.exists(tmp_file_path):
-            os.unlink(tmp_file_path)
-
-# Chat interface
-for message in st.session_state.messages:
-    with st.chat_message(message["role"]):
-        st.markdown(message["content"])
+# Chat interface: the whole transcript, although the engine only prompts with recent turns and a summary
+if engine:
+    if not st.session_state.messages:
+        # A refreshed page starts from the turns the engine still holds
+        st.session_state.messages = [{"role": m["role"].lower(), "content": m["content"]} for m in engine.history]
+    display_chat_history()
         
 # Sources display removed as per user request
 # if message["role"] == "assistant" and "sources" in message and message["sources"]:
@@ -373,21 +531,25 @@ for message in st.session_state.messages:
 #             st.rerun()
 
 # Chat input
-if st.session_state.chatbot_engine:
+if engine:
     if prompt := st.chat_input("💬 Ask me anything about your document..."):
-        # Add user message
-        st.session_state.messages.append({"role": "user", "content": prompt})
+        if not API_URL:
+            get_collection_registry().touch(st.session_state.doc_info['storage'])
         
+        st.session_state.messages.append({"role": "user", "content": prompt})
         with st.chat_message("user"):
             st.markdown(prompt)
         
-        # Generate response
+        # Generate response, rendering tokens as they arrive
         with st.chat_message("assistant"):
-            with st.spinner("🧠 Analyzing document and generating response..."):
-                try:
-                    response, sources = st.session_state.chatbot_engine.get_response(prompt)
-                    st.markdown(response)
-                    
+            try:
+                # Answers from a partly indexed corpus are not cached
+                engine.corpus_key = None if any(job.active for job in corpus_jobs) else corpus_cache_key(
+                    f['hash'] for f in st.session_state.doc_info['files'].values()
+                )
+                # The engine records the exchange in its own (bounded) history
+                response = st.write_stream(engine.stream_response(prompt))
+                
 # Sources display removed as per user request
 # if sources:
 #     with st.expander(f"📚 **View Sources** ({len(sources)} references)", expanded=False):
@@ -402,20 +564,13 @@ if st.session_state.chatbot_engine:
 #                 </div>
 #             </div>
 #             """, unsafe_allow_html=True)
-                
-                except Exception as e:
-                    response = f"⚠️ Sorry, I encountered an error: {str(e)}"
-                    sources = []
-                    st.error(response)
-        
-        # Add to history
-        st.session_state.messages.append({
-            "role": "assistant", 
-            "content": response,
-            "sources": sources if 'sources' in locals() else []
-        })
-
-# elif not st.session_state.get('processing_file', False):
+            
+            except Exception as e:
+                response = f"⚠️ Sorry, I encountered an error: {str(e)}"
+                st.error(response)
+        st.session_state.messages.append({"role": "assistant", "content": response})
+
+# elif not corpus_jobs:
 #     st.markdown("""
 #     <div style="text-align: center; padding: 2rem; background: #f8fafc; border-radius: 12px; border: 1px solid #e5e7eb; margin: 2rem 0;">
 #         <div style="font-size: 1.2rem; color: #10a37f; margin-bottom: 0.5rem;">🎯 Ready to Start?</div>
@@ -0,0 +1,178 @@
+"""
+Local load test of the HTTP API (api.py) with the fake LLM and hash-based embeddings.
+
+For each worker count, starts `python api.py --workers N --fake-llm --fake-embeddings --backend numpy`
+on a free port with a fresh persist directory, then:
+- ingest: creates --sessions sessions and uploads a synthetic TXT document to each, timing
+  until every job reports done
+- ask: sends --requests streamed questions spread over the sessions, --concurrency at a time,
+  recording time to first token and total latency per answer (the answer cache is off, so
+  every question runs retrieval and the model)
+
+Nothing is downloaded. With one CPU more workers cannot help; compare on a multi-core machine.
+
+Run from the repository root:
+    python -m benchmarks.bench_api --workers 1 2 4
+    python -m benchmarks.bench_api --sessions 50 --requests 500 --concurrency 32 --json
+"""
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+import argparse
+import tempfile
+import subprocess
+import numpy as np
+import aiohttp
+from benchmarks.synthetic_docs import make_document, make_questions
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(port, workers, persist_dir, ttft, token_delay) -> subprocess.Popen:
+    return subprocess.Popen(
+        [sys.executable, "api.py", "--port", str(port), "--workers", str(workers), "--persist-dir", persist_dir,
+         "--backend", "numpy", "--fake-llm", "--fake-embeddings", "--fake-llm-ttft", str(ttft),
+         "--fake-llm-token-delay", str(token_delay), "--no-answer-cache"],
+        cwd=ROOT, env={**os.environ, 'HF_HUB_OFFLINE': "1"}, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+async def wait_healthy(http, base_url, server, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"API server exited with code {server.returncode}")
+        try:
+            async with http.get(f"{base_url}/health") as response:
+                if response.status == 200:
+                    return
+        except aiohttp.ClientError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError("API server did not become healthy")
+
+
+async def ingest(http, base_url, num_sessions, document):
+    with open(document, "rb") as f:
+        data = f.read()
+    start = time.perf_counter()
+    sessions = []
+    for _ in range(num_sessions):
+        async with http.post(f"{base_url}/sessions") as response:
+            session_id = (await response.json())['session_id']
+        async with http.post(f"{base_url}/sessions/{session_id}/documents",
+                             params={'file_name': os.path.basename(document)}, data=data) as response:
+            response.raise_for_status()
+        sessions.append(session_id)
+    for session_id in sessions:
+        while True:
+            async with http.get(f"{base_url}/sessions/{session_id}/jobs") as response:
+                jobs = (await response.json())['jobs']
+            if all(job['status'] not in ("queued", "running") for job in jobs):
+                if any(job['status'] != "done" for job in jobs):
+                    raise RuntimeError(f"Ingestion failed: {jobs}")
+                break
+            await asyncio.sleep(0.05)
+    return sessions, time.perf_counter() - start
+
+
+async def ask(http, base_url, session_id, question):
+    """(time to first token, total) in seconds for one streamed answer"""
+    start = time.perf_counter()
+    first_token = None
+    async with http.post(f"{base_url}/sessions/{session_id}/ask",
+                         json={'question': question, 'stream': True}) as response:
+        response.raise_for_status()
+        async for line in response.content:
+            if first_token is None and line.startswith(b"event: token"):
+                first_token = time.perf_counter() - start
+    return first_token, time.perf_counter() - start
+
+
+async def load(http, base_url, sessions, questions, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    results, errors = [], 0
+
+    async def one(i):
+        nonlocal errors
+        async with semaphore:
+            try:
+                results.append(await ask(http, base_url, sessions[i % len(sessions)], questions[i]))
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(len(questions))))
+    return results, errors, time.perf_counter() - start
+
+
+async def bench(workers, args, work_dir):
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    persist_dir = os.path.join(work_dir, f"workers_{workers}")
+    document = make_document(work_dir, "txt", args.pages)
+    server = start_server(port, workers, persist_dir, args.ttft, args.token_delay)
+    try:
+        connector = aiohttp.TCPConnector(limit=args.concurrency * 2)
+        async with aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=300)) as http:
+            await wait_healthy(http, base_url, server)
+            sessions, ingest_seconds = await ingest(http, base_url, args.sessions, document)
+            questions = make_questions(args.pages, args.requests)
+            results, errors, seconds = await load(http, base_url, sessions, questions, args.concurrency)
+    finally:
+        server.terminate()
+        server.wait()
+    ttft = [first for first, _ in results if first is not None]
+    latency = [total for _, total in results]
+    return {
+        'workers': workers,
+        'sessions': args.sessions,
+        'ingest_s': round(ingest_seconds, 2),
+        'requests': len(results),
+        'errors': errors,
+        'requests_per_second': round(len(results) / seconds, 1),
+        'ttft_p50_ms': round(float(np.percentile(ttft, 50)) * 1000, 1) if ttft else None,
+        'ttft_p95_ms': round(float(np.percentile(ttft, 95)) * 1000, 1) if ttft else None,
+        'latency_p50_ms': round(float(np.percentile(latency, 50)) * 1000, 1) if latency else None,
+        'latency_p95_ms': round(float(np.percentile(latency, 95)) * 1000, 1) if latency else None,
+    }
+
+
+async def run(args):
+    results = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        for workers in args.workers:
+            results.append(await bench(workers, args, work_dir))
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2])
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--pages", type=int, default=10, help="pages of the document uploaded to each session")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--ttft", type=float, default=0.2, help="fake model time to first token (s)")
+    parser.add_argument("--token-delay", type=float, default=0.01, help="fake model delay per token (s)")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"{'workers':>8}{'sessions':>9}{'ingest s':>10}{'requests':>9}{'errors':>7}{'req/s':>8}"
+              f"{'ttft p50':>10}{'ttft p95':>10}{'p50 ms':>9}{'p95 ms':>9}")
+        for r in results:
+            print(f"{r['workers']:>8}{r['sessions']:>9}{r['ingest_s']:>10}{r['requests']:>9}{r['errors']:>7}"
+                  f"{r['requests_per_second']:>8}{r['ttft_p50_ms']:>10}{r['ttft_p95_ms']:>10}"
+                  f"{r['latency_p50_ms']:>9}{r['latency_p95_ms']:>9}")
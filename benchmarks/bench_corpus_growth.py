@@ -0,0 +1,63 @@
+"""
+Add 50 files to one corpus and show that the Nth add costs the same as the first.
+
+Run from the repository root:
+    python -m benchmarks.bench_corpus_growth --files 50
+    python -m benchmarks.bench_corpus_growth --fake   # offline, no model download
+"""
+import os
+import time
+import random
+import argparse
+import tempfile
+import statistics
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from document_processor import DocumentProcessor
+from embedding_registry import get_embeddings
+from benchmarks.bench_embedding_cache import WORDS
+
+
+def write_text_file(path, num_words, seed):
+    rng = random.Random(seed)
+    with open(path, "w") as f:
+        f.write(" ".join(rng.choice(WORDS) for _ in range(num_words)))
+
+
+def run(num_files, words_per_file, fake=False):
+    embeddings = DeterministicFakeEmbedding(size=384) if fake else get_embeddings()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        processor = DocumentProcessor(
+            chunk_size=1000, chunk_overlap=200,
+            persist_dir=os.path.join(work_dir, "chroma_db"),
+            embeddings=embeddings
+        )
+        add_times = []
+        for i in range(num_files):
+            path = os.path.join(work_dir, f"file_{i}.txt")
+            write_text_file(path, words_per_file, seed=i)
+            start = time.perf_counter()
+            doc_info = processor.add_file("bench", path)
+            add_times.append(time.perf_counter() - start)
+
+        # Removing one file must not rebuild the rest either
+        start = time.perf_counter()
+        processor.remove_file("bench", "file_0.txt")
+        remove_time = time.perf_counter() - start
+
+    print(f"Files: {num_files}, chunks in corpus: {doc_info['chunks']}")
+    print(f"Add 1st file:  {add_times[0] * 1000:.1f} ms")
+    print(f"Add last file: {add_times[-1] * 1000:.1f} ms")
+    print(f"Median add (first 10): {statistics.median(add_times[:10]) * 1000:.1f} ms")
+    print(f"Median add (last 10):  {statistics.median(add_times[-10:]) * 1000:.1f} ms")
+    print(f"Last/first ratio (medians): {statistics.median(add_times[-10:]) / statistics.median(add_times[:10]):.2f}")
+    print(f"Remove one file: {remove_time * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=50)
+    parser.add_argument("--words", type=int, default=3000, help="words per synthetic file")
+    parser.add_argument("--fake", action="store_true", help="use a deterministic fake embedding model")
+    args = parser.parse_args()
+    run(args.files, args.words, fake=args.fake)
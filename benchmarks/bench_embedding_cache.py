@@ -0,0 +1,56 @@
+"""
+Ingest the same synthetic corpus twice through CachedEmbeddings and report the speedup.
+
+Run from the repository root:
+    python -m benchmarks.bench_embedding_cache --chunks 2000
+    python -m benchmarks.bench_embedding_cache --fake   # offline, no model download
+"""
+import argparse
+import random
+import tempfile
+import time
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from embedding_cache import CachedEmbeddings, EmbeddingCache
+from embedding_registry import DEFAULT_MODEL_NAME, get_embeddings
+
+WORDS = ("invoice contract engineer python model retrieval vector document section page "
+         "summary skills experience project report manual install configure network "
+         "security deploy latency throughput memory cache index query answer").split()
+
+
+def make_corpus(num_chunks, words_per_chunk=150, seed=0):
+    rng = random.Random(seed)
+    return [" ".join(rng.choice(WORDS) for _ in range(words_per_chunk)) for _ in range(num_chunks)]
+
+
+def run(num_chunks, fake=False):
+    base = DeterministicFakeEmbedding(size=384) if fake else get_embeddings()
+    corpus = make_corpus(num_chunks)
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        embeddings = CachedEmbeddings(base, EmbeddingCache(cache_dir, max_entries=num_chunks * 2),
+                                      model_name="fake" if fake else DEFAULT_MODEL_NAME)
+
+        start = time.perf_counter()
+        embeddings.embed_documents(corpus)
+        cold = time.perf_counter() - start
+
+        start = time.perf_counter()
+        embeddings.embed_documents(corpus)
+        warm = time.perf_counter() - start
+
+        stats = embeddings.cache.get_stats()
+
+    print(f"Chunks: {num_chunks}")
+    print(f"First ingest (cold cache): {cold:.3f}s ({num_chunks / cold:.0f} chunks/s)")
+    print(f"Second ingest (warm cache): {warm:.3f}s ({num_chunks / warm:.0f} chunks/s)")
+    print(f"Speedup: {cold / warm:.1f}x")
+    print(f"Cache stats: {stats}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--fake", action="store_true", help="use a deterministic fake embedding model")
+    args = parser.parse_args()
+    run(args.chunks, fake=args.fake)
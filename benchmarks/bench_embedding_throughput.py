@@ -0,0 +1,73 @@
+"""
+Report embedding throughput (chunks/second) across batch size, torch threads and worker processes.
+
+Use it to pick DOCUCHAT_EMBED_BATCH_SIZE, DOCUCHAT_TORCH_THREADS and DOCUCHAT_EMBED_WORKERS per host.
+Needs the real model (sentence-transformers and torch installed).
+
+Run from the repository root:
+    python -m benchmarks.bench_embedding_throughput --chunks 2000
+    python -m benchmarks.bench_embedding_throughput --batch-sizes 32 128 --threads 4 8 --workers 0 2 4 --json
+"""
+import os
+import json
+import time
+import argparse
+from embedding_registry import get_embeddings, get_multi_process_embeddings, set_torch_threads
+from benchmarks.bench_embedding_cache import make_corpus
+
+
+def measure(embeddings, corpus):
+    start = time.perf_counter()
+    embeddings.embed_documents(corpus)
+    return len(corpus) / (time.perf_counter() - start)
+
+
+def run(num_chunks, batch_sizes, thread_counts, worker_counts):
+    corpus = make_corpus(num_chunks)
+    # Load the model once so the first configuration is not charged for it
+    get_embeddings(engine="torch").embed_documents(corpus[:8])
+
+    results = []
+    for workers in worker_counts:
+        for batch_size in batch_sizes:
+            if workers > 1:
+                # Workers size their own torch threads (cpu_count // workers)
+                embeddings = get_multi_process_embeddings(workers, batch_size=batch_size)
+                start = time.perf_counter()
+                embeddings.embed_documents(corpus[:embeddings.min_pool_texts])
+                startup = time.perf_counter() - start
+                results.append({'workers': workers, 'batch_size': batch_size, 'torch_threads': None,
+                                'pool_startup_s': round(startup, 2),
+                                'chunks_per_s': round(measure(embeddings, corpus), 1)})
+                embeddings.close()
+                continue
+            embeddings = get_embeddings(batch_size=batch_size, engine="torch")
+            for threads in thread_counts:
+                set_torch_threads(threads)
+                results.append({'workers': 0, 'batch_size': batch_size, 'torch_threads': threads,
+                                'pool_startup_s': None,
+                                'chunks_per_s': round(measure(embeddings, corpus), 1)})
+    return results
+
+
+if __name__ == "__main__":
+    cpus = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--batch-sizes", nargs="+", type=int, default=[16, 32, 64, 128])
+    parser.add_argument("--threads", nargs="+", type=int, default=sorted({1, max(1, cpus // 2), cpus}))
+    parser.add_argument("--workers", nargs="+", type=int, default=[0] + [w for w in (2, 4) if w <= cpus])
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    results = run(args.chunks, args.batch_sizes, args.threads, args.workers)
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"{'workers':>8}{'batch':>7}{'threads':>9}{'startup s':>11}{'chunks/s':>10}")
+        for r in results:
+            print(f"{r['workers']:>8}{r['batch_size']:>7}{str(r['torch_threads'] or '-'):>9}"
+                  f"{str(r['pool_startup_s'] or '-'):>11}{r['chunks_per_s']:>10}")
+        best = max(results, key=lambda r: r['chunks_per_s'])
+        print(f"Best: workers={best['workers']} batch_size={best['batch_size']} "
+              f"torch_threads={best['torch_threads'] or 'auto'} ({best['chunks_per_s']} chunks/s)")
@@ -0,0 +1,72 @@
+"""
+Compare vector-only retrieval with hybrid (vector + BM25, reciprocal rank fusion) retrieval latency.
+
+Vectors are random normalized 384-d embeddings searched by brute force, so the numbers
+isolate the extra cost of the lexical index and the fusion step.
+
+Run from the repository root:
+    python -m benchmarks.bench_hybrid_search --chunks 100000
+"""
+import time
+import random
+import argparse
+import tempfile
+import numpy as np
+from lexical_index import LexicalIndex, SegmentBuilder, reciprocal_rank_fusion
+from benchmarks.bench_embedding_cache import WORDS
+
+
+def percentile(values, q):
+    return float(np.percentile(np.asarray(values) * 1000, q))
+
+
+def run(num_chunks, words_per_chunk, queries, top_k, dim=384):
+    rng = random.Random(0)
+    np_rng = np.random.default_rng(0)
+    vectors = np_rng.standard_normal((num_chunks, dim), dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    ids = [f"chunk-{i}" for i in range(num_chunks)]
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        index = LexicalIndex(work_dir)
+        start = time.perf_counter()
+        # Files arrive as separate segments, like corpus uploads
+        per_file = max(1, num_chunks // 8)
+        for first in range(0, num_chunks, per_file):
+            builder = SegmentBuilder()
+            for i in range(first, min(first + per_file, num_chunks)):
+                text = " ".join(rng.choice(WORDS) for _ in range(words_per_chunk))
+                builder.add(ids[i], f"{text} code_{i}", f"file_{first // per_file}.txt")
+            index.add_segment(builder)
+        build_time = time.perf_counter() - start
+
+        vector_times, hybrid_times = [], []
+        for q in range(queries):
+            query_vector = vectors[rng.randrange(num_chunks)]
+            query_text = f"{rng.choice(WORDS)} {rng.choice(WORDS)} code_{rng.randrange(num_chunks)}"
+
+            start = time.perf_counter()
+            scores = vectors @ query_vector
+            top = np.argpartition(-scores, top_k)[:top_k]
+            vector_ids = [ids[i] for i in top[np.argsort(-scores[top])]]
+            vector_time = time.perf_counter() - start
+            vector_times.append(vector_time)
+
+            start = time.perf_counter()
+            lexical_ids = [doc_id for doc_id, _ in index.search(query_text, k=top_k)]
+            reciprocal_rank_fusion([vector_ids, lexical_ids])[:top_k]
+            hybrid_times.append(vector_time + time.perf_counter() - start)
+
+    print(f"Chunks: {num_chunks}, segments: {len(index.segments)}, index build: {build_time:.1f} s")
+    print(f"Vector only  p50 {percentile(vector_times, 50):7.2f} ms   p99 {percentile(vector_times, 99):7.2f} ms")
+    print(f"Hybrid       p50 {percentile(hybrid_times, 50):7.2f} ms   p99 {percentile(hybrid_times, 99):7.2f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=100000)
+    parser.add_argument("--words", type=int, default=150, help="words per synthetic chunk")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    args = parser.parse_args()
+    run(args.chunks, args.words, args.queries, args.top_k)
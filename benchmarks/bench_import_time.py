@@ -0,0 +1,139 @@
+"""
+Measure the import time of each DocuChat module with `python -X importtime`.
+
+Every import runs in a fresh interpreter (best of --repeat runs). Heavy ML dependencies
+(torch, sentence-transformers, chromadb, ...) must only load when a model or collection is
+actually used, so importing any of them at module level is reported as a regression.
+With --check, the run also fails if a module is more than --tolerance slower than the
+recorded baseline (benchmarks/import_time_baseline.json; refresh it with --update-baseline).
+
+Run from the repository root:
+    python -m benchmarks.bench_import_time
+    python -m benchmarks.bench_import_time --check
+    python -m benchmarks.bench_import_time --update-baseline --json
+"""
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_PATH = os.path.join(ROOT, "benchmarks", "import_time_baseline.json")
+
+MODULES = [
+    "document_processor",
+    "chatbot_engine",
+    "embedding_registry",
+    "embedding_cache",
+    "vector_backends",
+    "collection_registry",
+    "ingestion_jobs",
+    "lexical_index",
+    "answer_cache",
+    "context_packer",
+    "conversation_memory",
+    "llm_client",
+    "query_batcher",
+    "metrics",
+    "text_cache",
+    "token_splitter",
+    "engine_pool",
+]
+# Top-level packages that must not be imported until they are needed
+HEAVY_MODULES = [
+    "torch",
+    "sentence_transformers",
+    "transformers",
+    "langchain_huggingface",
+    "huggingface_hub",
+    "chromadb",
+    "langchain_chroma",
+    "langchain_community",
+    "onnxruntime",
+]
+
+
+def import_profile(module: str) -> dict:
+    """Import module in a fresh interpreter; returns its cumulative import time and the heavy packages it loaded"""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=ROOT, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+
+    total_us = None
+    loaded = set()
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|", 2)
+        if not cumulative.strip().isdigit():
+            continue  # header line
+        name = name.strip()
+        loaded.add(name.split(".")[0])
+        if name == module:
+            total_us = int(cumulative)
+    return {
+        'module': module,
+        'import_ms': round(total_us / 1000, 1) if total_us is not None else None,
+        'heavy_imports': sorted(loaded.intersection(HEAVY_MODULES)),
+    }
+
+
+def run(modules, repeat):
+    results = []
+    for module in modules:
+        runs = [import_profile(module) for _ in range(repeat)]
+        best = min(runs, key=lambda r: r['import_ms'])
+        results.append(best)
+    return results
+
+
+def check(results, baseline, tolerance):
+    """Return a list of regressions (empty when every module is within budget)"""
+    problems = []
+    for r in results:
+        if r['heavy_imports']:
+            problems.append(f"{r['module']} imports {', '.join(r['heavy_imports'])} at module level")
+        budget = baseline.get(r['module'])
+        if budget is not None and r['import_ms'] > budget * (1 + tolerance):
+            problems.append(f"{r['module']} takes {r['import_ms']} ms to import (baseline {budget} ms)")
+    return problems
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modules", nargs="+", default=MODULES)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--check", action="store_true", help="exit non-zero on a regression")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="allowed slowdown over the baseline")
+    parser.add_argument("--update-baseline", action="store_true", help="record these timings as the baseline")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    results = run(args.modules, args.repeat)
+    baseline = {}
+    if os.path.exists(BASELINE_PATH):
+        with open(BASELINE_PATH) as f:
+            baseline = json.load(f)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"{'module':<22}{'import ms':>11}{'baseline':>10}  heavy imports")
+        for r in results:
+            print(f"{r['module']:<22}{r['import_ms']:>11}{str(baseline.get(r['module'], '-')):>10}  "
+                  f"{', '.join(r['heavy_imports']) or '-'}")
+
+    if args.update_baseline:
+        baseline.update({r['module']: r['import_ms'] for r in results})
+        with open(BASELINE_PATH, "w") as f:
+            json.dump(baseline, f, indent=2)
+            f.write("\n")
+        print(f"Baseline written to {BASELINE_PATH}", file=sys.stderr)
+
+    if args.check:
+        problems = check(results, baseline, args.tolerance)
+        for problem in problems:
+            print(f"REGRESSION: {problem}", file=sys.stderr)
+        sys.exit(1 if problems else 0)
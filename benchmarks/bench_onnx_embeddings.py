@@ -0,0 +1,87 @@
+"""
+Compare embedding engines (torch, onnx, onnx-int8): cold start, memory, query latency and batch throughput.
+
+Each engine runs in a fresh process, so cold start includes imports and model loading
+and the RSS numbers are not shared between engines. Use it to pick DOCUCHAT_EMBEDDING_ENGINE.
+Needs the model files (downloaded from the Hugging Face Hub on first run); torch and
+sentence-transformers are only needed for the torch engine.
+
+Run from the repository root:
+    python -m benchmarks.bench_onnx_embeddings
+    python -m benchmarks.bench_onnx_embeddings --engines onnx onnx-int8 --chunks 500 --json
+"""
+import json
+import time
+import argparse
+import multiprocessing
+import numpy as np
+from embedding_registry import resident_memory_mb
+from benchmarks.bench_embedding_cache import make_corpus
+
+
+def run_one(engine, num_chunks, queries):
+    rss_start = resident_memory_mb()
+    start = time.perf_counter()
+    from embedding_registry import get_embeddings
+    embeddings = get_embeddings(engine=engine)
+    embeddings.embed_query("cold start")
+    cold_start = time.perf_counter() - start
+    rss_loaded = resident_memory_mb()
+
+    corpus = make_corpus(num_chunks)
+    latencies = []
+    for text in corpus[:queries]:
+        # Queries are short; use the first sentence-sized slice of each chunk
+        query = " ".join(text.split()[:12])
+        start = time.perf_counter()
+        embeddings.embed_query(query)
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    embeddings.embed_documents(corpus)
+    batch = time.perf_counter() - start
+    rss_end = resident_memory_mb()
+
+    latencies = np.asarray(latencies) * 1000
+    return {
+        'engine': engine,
+        'cold_start_s': round(cold_start, 2),
+        'rss_loaded_mb': round(rss_loaded - rss_start, 1),
+        'rss_peak_mb': round(rss_end - rss_start, 1),
+        'query_p50_ms': round(float(np.percentile(latencies, 50)), 2),
+        'query_p99_ms': round(float(np.percentile(latencies, 99)), 2),
+        'chunks_per_s': round(num_chunks / batch, 1),
+    }
+
+
+def run(engines, num_chunks, queries):
+    ctx = multiprocessing.get_context("spawn")
+    results = []
+    for engine in engines:
+        with ctx.Pool(1) as pool:
+            try:
+                results.append(pool.apply(run_one, (engine, num_chunks, queries)))
+            except Exception as e:
+                results.append({'engine': engine, 'error': str(e)})
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--engines", nargs="+", default=["torch", "onnx", "onnx-int8"])
+    parser.add_argument("--chunks", type=int, default=1000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    results = run(args.engines, args.chunks, args.queries)
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"{'engine':<11}{'cold s':>8}{'RSS load':>10}{'RSS peak':>10}{'p50 ms':>9}{'p99 ms':>9}{'chunks/s':>10}")
+        for r in results:
+            if 'error' in r:
+                print(f"{r['engine']:<11} failed: {r['error']}")
+                continue
+            print(f"{r['engine']:<11}{r['cold_start_s']:>8}{r['rss_loaded_mb']:>10}{r['rss_peak_mb']:>10}"
+                  f"{r['query_p50_ms']:>9}{r['query_p99_ms']:>9}{r['chunks_per_s']:>10}")
@@ -0,0 +1,207 @@
+"""
+Offline end-to-end benchmark: per-stage latency and throughput over synthetic PDF, TXT and DOCX files.
+
+For each format and size (small/medium/large = 10/100/500 pages) it times:
+- load: DocumentProcessor.load_document (pages/s)
+- split: the text splitter (chunks/s)
+- embed: embed_documents over every chunk (chunks/s)
+- store: building a fresh vector store from the vectors (chunks/s)
+- ingest: add_file end to end, as an upload is indexed (pages/s)
+- answer: ChatbotEngine.get_response with a deterministic fake LLM (p50/p95 ms)
+
+Nothing is downloaded: documents are generated (benchmarks/synthetic_docs.py), embeddings default
+to the NumPy projection model and the LLM answers instantly. Results are written as JSON with the
+commit and machine details so runs can be compared; --compare flags stages that got slower.
+
+Run from the repository root:
+    python -m benchmarks.bench_pipeline --output results.json
+    python -m benchmarks.bench_pipeline --formats pdf --sizes small medium --compare results.json --check
+    python -m benchmarks.bench_pipeline --embeddings torch --backend chroma --json
+"""
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import tempfile
+import subprocess
+from typing import Dict, List
+import numpy as np
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from chatbot_engine import ChatbotEngine
+from conversation_memory import ConversationMemory, _approximate_token_count
+from document_processor import DocumentProcessor
+from fake_llm import FakeStreamingChatModel
+from vector_backends import get_vector_backend
+from benchmarks.bench_query_batching import ProjectionEmbeddings
+from benchmarks.synthetic_docs import FORMATS, SIZES, make_document, make_questions
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STAGES = ("load", "split", "embed", "store", "ingest", "answer")
+ANSWER = "The pump runs at the pressure listed on that page of the manual."
+
+
+def make_embeddings(name):
+    if name == "fake":
+        return DeterministicFakeEmbedding(size=384)
+    if name == "projection":
+        return ProjectionEmbeddings()
+    from embedding_registry import get_embeddings
+    return get_embeddings(engine=name)
+
+
+def best_of(repeat, fn):
+    """Run fn repeat times; returns (fastest seconds, last result)"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def stage(seconds, items, unit):
+    return {'ms': round(seconds * 1000, 2), 'per_second': round(items / seconds, 1) if seconds else None,
+            'unit': unit}
+
+
+def bench_document(path, pages, work_dir, embeddings, backend, num_questions, repeat):
+    processor = DocumentProcessor(persist_dir=os.path.join(work_dir, "db"), embeddings=embeddings,
+                                  vector_backend=backend)
+    stages = {}
+
+    # TXT and DOCX load as one document; throughput is per synthetic page for every format
+    seconds, documents = best_of(repeat, lambda: processor.load_document(path))
+    stages['load'] = stage(seconds, pages, "pages")
+
+    seconds, chunks = best_of(repeat, lambda: processor.text_splitter.split_documents(documents))
+    stages['split'] = stage(seconds, len(chunks), "chunks")
+
+    texts = [chunk.page_content for chunk in chunks]
+    metadatas = [chunk.metadata for chunk in chunks]
+    seconds, vectors = best_of(repeat, lambda: embeddings.embed_documents(texts))
+    stages['embed'] = stage(seconds, len(chunks), "chunks")
+
+    runs = iter(range(repeat))
+
+    def build_store():
+        vectorstore = get_vector_backend(os.path.join(work_dir, "stores"), backend).open(
+            f"bench_{os.path.basename(path).replace('.', '_')}_{next(runs)}", embeddings)
+        vectorstore.add_vectors(texts, vectors, metadatas)
+        return vectorstore
+
+    seconds, vectorstore = best_of(repeat, build_store)
+    stages['store'] = stage(seconds, len(chunks), "chunks")
+
+    corpora = iter(range(repeat))
+    seconds, _ = best_of(repeat, lambda: processor.add_file(f"bench{next(corpora)}", path))
+    stages['ingest'] = stage(seconds, pages, "pages")
+
+    engine = ChatbotEngine(vectorstore, top_k=5, llm=FakeStreamingChatModel(response=ANSWER),
+                           memory=ConversationMemory(count_tokens=_approximate_token_count))
+    latencies = []
+    for question in make_questions(pages, num_questions):
+        start = time.perf_counter()
+        engine.get_response(question)
+        latencies.append((time.perf_counter() - start) * 1000)
+        engine.clear_memory()
+    stages['answer'] = {
+        'ms': round(float(np.percentile(latencies, 50)), 2),
+        'p95_ms': round(float(np.percentile(latencies, 95)), 2),
+        'per_second': round(1000 / float(np.mean(latencies)), 1),
+        'unit': "questions",
+    }
+    return len(chunks), stages
+
+
+def run(formats, sizes, embeddings_name, backend, num_questions, repeat) -> List[dict]:
+    embeddings = make_embeddings(embeddings_name)
+    results = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        for size in sizes:
+            for file_format in formats:
+                pages = SIZES[size]
+                path = make_document(work_dir, file_format, pages)
+                chunks, stages = bench_document(path, pages, os.path.join(work_dir, f"{file_format}_{size}"),
+                                                embeddings, backend, num_questions, repeat)
+                results.append({
+                    'format': file_format, 'size': size, 'pages': pages, 'bytes': os.path.getsize(path),
+                    'chunks': chunks, 'stages': stages,
+                })
+    return results
+
+
+def environment(args) -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                                text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'timestamp': time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        'commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'embeddings': args.embeddings,
+        'backend': args.backend,
+        'questions': args.questions,
+        'repeat': args.repeat,
+    }
+
+
+def compare(results, baseline, tolerance) -> List[str]:
+    """Stages whose time grew by more than tolerance over the baseline run"""
+    previous: Dict[tuple, dict] = {(r['format'], r['size']): r['stages'] for r in baseline['results']}
+    problems = []
+    for r in results:
+        old = previous.get((r['format'], r['size']))
+        if not old:
+            continue
+        for name in STAGES:
+            before, after = old.get(name, {}).get('ms'), r['stages'][name]['ms']
+            if before and after > before * (1 + tolerance):
+                problems.append(f"{r['format']}/{r['size']} {name}: {after} ms (baseline {before} ms)")
+    return problems
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--formats", nargs="+", default=list(FORMATS), choices=FORMATS)
+    parser.add_argument("--sizes", nargs="+", default=list(SIZES), choices=list(SIZES))
+    parser.add_argument("--embeddings", default="projection", choices=["projection", "fake", "torch", "onnx", "onnx-int8"])
+    parser.add_argument("--backend", default="numpy", choices=["numpy", "chroma"])
+    parser.add_argument("--questions", type=int, default=50, help="questions per document")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per stage; the fastest is reported")
+    parser.add_argument("--output", help="write the JSON report to this file")
+    parser.add_argument("--compare", help="a previous JSON report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown over --compare")
+    parser.add_argument("--check", action="store_true", help="exit non-zero when a stage regressed")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    report = {'environment': environment(args),
+              'results': run(args.formats, args.sizes, args.embeddings, args.backend, args.questions, args.repeat)}
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"{'format':<7}{'size':<8}{'pages':>6}{'chunks':>7}" + "".join(f"{name + ' ms':>11}" for name in STAGES)
+              + f"{'p95 ms':>9}")
+        for r in report['results']:
+            print(f"{r['format']:<7}{r['size']:<8}{r['pages']:>6}{r['chunks']:>7}"
+                  + "".join(f"{r['stages'][name]['ms']:>11}" for name in STAGES)
+                  + f"{r['stages']['answer']['p95_ms']:>9}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            problems = compare(report['results'], json.load(f), args.tolerance)
+        for problem in problems:
+            print(f"REGRESSION: {problem}", file=sys.stderr)
+        if args.check and problems:
+            sys.exit(1)
@@ -0,0 +1,137 @@
+"""
+Load test for query micro-batching: concurrent sessions asking questions with batching on and off.
+
+Every client thread owns a ChatbotEngine over one shared corpus (NumPy backend) and asks
+questions back to back; the LLM is an instant local fake, so latency is retrieval-bound.
+Reports p50/p99 latency per question and total throughput for each client count.
+
+By default queries are encoded by a small NumPy projection model (hashed bag of words through
+two dense layers) so the run needs no downloads; --engine torch/onnx uses the real model.
+
+Run from the repository root:
+    python -m benchmarks.bench_query_batching --chunks 50000 --clients 1 8 32
+    python -m benchmarks.bench_query_batching --engine onnx --max-wait-ms 2 --json
+"""
+import json
+import time
+import random
+import argparse
+import threading
+from typing import List
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from chatbot_engine import ChatbotEngine
+from conversation_memory import ConversationMemory, _approximate_token_count
+from fake_llm import FakeStreamingChatModel
+from query_batcher import QueryBatcher
+from vector_backends import NumpyVectorStore
+from benchmarks.bench_embedding_cache import WORDS, make_corpus
+
+DIM = 384
+
+
+class ProjectionEmbeddings(Embeddings):
+    """Hashed bag of words -> 2048 -> 384 dense network; like a transformer, batching amortizes the matmuls"""
+
+    def __init__(self, vocab: int = 4096, hidden: int = 2048, seed: int = 0):
+        rng = np.random.default_rng(seed)
+        self.vocab = vocab
+        self.w1 = rng.standard_normal((vocab, hidden), dtype=np.float32) / np.sqrt(vocab)
+        self.w2 = rng.standard_normal((hidden, DIM), dtype=np.float32) / np.sqrt(hidden)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        counts = np.zeros((len(texts), self.vocab), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in text.lower().split():
+                counts[row, hash(word) % self.vocab] += 1
+        vectors = np.maximum(counts @ self.w1, 0) @ self.w2
+        return vectors / np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+def make_embeddings(engine):
+    if engine == "projection":
+        return ProjectionEmbeddings()
+    from embedding_registry import get_embeddings
+    return get_embeddings(engine=engine)
+
+
+def run_clients(vectorstore, num_clients, duration, batcher):
+    llm = FakeStreamingChatModel(response="ok")
+    latencies: List[float] = []
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + duration
+
+    def client(seed):
+        rng = random.Random(seed)
+        engine = ChatbotEngine(vectorstore, top_k=10, llm=llm, query_batcher=batcher,
+                               memory=ConversationMemory(count_tokens=_approximate_token_count))
+        mine = []
+        while time.perf_counter() < stop_at:
+            question = " ".join(rng.choice(WORDS) for _ in range(8)) + "?"
+            start = time.perf_counter()
+            engine.get_response(question)
+            mine.append(time.perf_counter() - start)
+            engine.clear_memory()
+        with lock:
+            latencies.extend(mine)
+
+    threads = [threading.Thread(target=client, args=(seed,)) for seed in range(num_clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    latencies_ms = np.asarray(latencies) * 1000
+    return {
+        'clients': num_clients,
+        'requests': len(latencies),
+        'p50_ms': round(float(np.percentile(latencies_ms, 50)), 2),
+        'p99_ms': round(float(np.percentile(latencies_ms, 99)), 2),
+        'throughput_rps': round(len(latencies) / elapsed, 1),
+    }
+
+
+def run(num_chunks, client_counts, duration, engine, max_batch_size, max_wait_ms):
+    embeddings = make_embeddings(engine)
+    vectorstore = NumpyVectorStore(embeddings)
+    corpus = make_corpus(num_chunks, words_per_chunk=60)
+    for first in range(0, num_chunks, 1000):
+        vectorstore.add_texts(corpus[first:first + 1000])
+
+    batcher = QueryBatcher(max_batch_size=max_batch_size, max_wait_ms=max_wait_ms)
+    results = []
+    for num_clients in client_counts:
+        for batching in (False, True):
+            result = run_clients(vectorstore, num_clients, duration, batcher if batching else None)
+            result['batching'] = batching
+            results.append(result)
+    return results, batcher.stats()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=50000)
+    parser.add_argument("--clients", nargs="+", type=int, default=[1, 8, 32])
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds per configuration")
+    parser.add_argument("--engine", default="projection", choices=["projection", "torch", "onnx", "onnx-int8"])
+    parser.add_argument("--max-batch-size", type=int, default=32)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    results, stats = run(args.chunks, args.clients, args.duration, args.engine, args.max_batch_size,
+                         args.max_wait_ms)
+    if args.json:
+        print(json.dumps({'results': results, 'batcher': stats}, indent=2))
+    else:
+        print(f"{'clients':>8}{'batching':>10}{'requests':>10}{'p50 ms':>9}{'p99 ms':>9}{'req/s':>9}")
+        for r in results:
+            print(f"{r['clients']:>8}{'on' if r['batching'] else 'off':>10}{r['requests']:>10}"
+                  f"{r['p50_ms']:>9}{r['p99_ms']:>9}{r['throughput_rps']:>9}")
+        if stats['search_batches']:
+            print(f"Average search batch: {stats['search_queries'] / stats['search_batches']:.1f} queries")
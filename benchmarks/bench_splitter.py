@@ -0,0 +1,126 @@
+"""
+Compare the recursive character splitter with the offset-based token splitter on a large document.
+
+For each splitter, in a fresh process: split time, chunks/second, peak RSS growth, peak Python
+allocations (tracemalloc, in a separate run) and chunk sizes in model tokens, i.e. how many
+chunks exceed the embedding model's input limit and would be truncated at embed time. The token
+splitter is measured twice: producing Documents (what ingestion stores) and offsets only.
+The document is synthetic (--pages) unless --file gives a real PDF, TXT or DOCX.
+
+--tokenizer model loads the embedding model's tokenizer.json (falling back to the approximate
+tokenizer offline); --tokenizer approximate skips the download.
+
+Run from the repository root:
+    python -m benchmarks.bench_splitter --pages 2000
+    python -m benchmarks.bench_splitter --pages 5000 --chunk-size 1000 --chunk-overlap 200 --json
+    python -m benchmarks.bench_splitter --file manual.pdf --tokenizer model
+"""
+import json
+import time
+import argparse
+import tempfile
+import resource
+import tracemalloc
+import multiprocessing
+from langchain_core.documents import Document
+from benchmarks.synthetic_docs import page_lines
+
+TOKEN_LIMIT = 256 - 2  # MiniLM positions minus [CLS]/[SEP]
+
+
+def make_pages(num_pages, file_path=None):
+    if file_path:
+        from document_processor import DocumentProcessor
+        with tempfile.TemporaryDirectory() as work_dir:
+            processor = DocumentProcessor(persist_dir=work_dir, use_text_cache=False)
+            return [doc for documents, _ in processor.iter_document_batches(file_path) for doc in documents]
+    # Real manuals mix prose with part numbers and identifiers, which split into many word pieces
+    return [Document(page_content="\n".join(page_lines(page)) + f"\nPart no. XR-{page:05d}-B7/{page * 37 % 1000}\n",
+                     metadata={'page': page}) for page in range(num_pages)]
+
+
+def make_tokenizer(name):
+    from token_splitter import ApproximateTokenizer, get_chunk_tokenizer
+    return ApproximateTokenizer() if name == "approximate" else get_chunk_tokenizer()
+
+
+def measure(mode, num_pages, file_path, chunk_size, chunk_overlap, chunk_tokens, overlap_tokens, tokenizer_name):
+    """Runs in a fresh process so peak RSS reflects only this splitter"""
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+    from token_splitter import TokenTextSplitter
+
+    pages = make_pages(num_pages, file_path)
+    tokenizer = make_tokenizer(tokenizer_name)
+    if mode == "recursive":
+        splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap,
+                                                  add_start_index=True)
+        split = splitter.split_documents
+    else:
+        splitter = TokenTextSplitter(chunk_tokens, overlap_tokens, tokenizer=tokenizer)
+        if mode == "tokens":
+            split = splitter.split_documents
+        else:
+            split = lambda documents: splitter.split_offsets([doc.page_content for doc in documents])
+    split(pages[:2])  # one-off costs (regex compilation, tokenizer warm-up) are not measured
+
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    result = split(pages)
+    seconds = time.perf_counter() - start
+    rss_growth = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before
+    # Allocation tracing slows allocation-heavy code, so it gets a separate, untimed run
+    del result
+    tracemalloc.start()
+    result = split(pages)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    if mode == "offsets":
+        texts = [page.page_content[s:e] for page, spans in zip(pages, result) for s, e in spans]
+    else:
+        texts = [chunk.page_content for chunk in result]
+    token_counts = [len(spans) for spans in tokenizer.token_spans(texts)]
+    return {
+        'splitter': mode,
+        'chunks': len(texts),
+        'seconds': round(seconds, 3),
+        'chunks_per_second': round(len(texts) / seconds, 1),
+        'peak_alloc_mb': round(peak / (1024 * 1024), 1),
+        'peak_rss_growth_mb': round(rss_growth / 1024, 1),
+        'max_tokens': max(token_counts),
+        'over_limit': sum(count > TOKEN_LIMIT for count in token_counts),
+    }
+
+
+def run(num_pages, file_path, chunk_size, chunk_overlap, chunk_tokens, overlap_tokens, tokenizer_name):
+    results = []
+    context = multiprocessing.get_context("spawn")
+    for mode in ("recursive", "tokens", "offsets"):
+        with context.Pool(1) as pool:
+            results.append(pool.apply(measure, (mode, num_pages, file_path, chunk_size, chunk_overlap, chunk_tokens,
+                                                overlap_tokens, tokenizer_name)))
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=2000)
+    parser.add_argument("--file", help="split this document instead of a synthetic one")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="characters, recursive splitter")
+    parser.add_argument("--chunk-overlap", type=int, default=200, help="characters, recursive splitter")
+    parser.add_argument("--chunk-tokens", type=int, default=TOKEN_LIMIT, help="tokens, token splitter")
+    parser.add_argument("--overlap-tokens", type=int, default=32, help="tokens, token splitter")
+    parser.add_argument("--tokenizer", default="model", choices=["model", "approximate"])
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    results = run(args.pages, args.file, args.chunk_size, args.chunk_overlap, args.chunk_tokens, args.overlap_tokens,
+                  args.tokenizer)
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"{'splitter':<11}{'chunks':>8}{'seconds':>9}{'chunks/s':>10}{'alloc MB':>10}{'RSS MB':>8}"
+              f"{'max tok':>9}{'> limit':>9}")
+        for r in results:
+            print(f"{r['splitter']:<11}{r['chunks']:>8}{r['seconds']:>9}{r['chunks_per_second']:>10}"
+                  f"{r['peak_alloc_mb']:>10}{r['peak_rss_growth_mb']:>8}{r['max_tokens']:>9}{r['over_limit']:>9}")
@@ -0,0 +1,80 @@
+"""
+Re-chunking from the parsed-text cache versus re-parsing: time to produce chunks for several
+chunk settings over synthetic PDF and DOCX files.
+
+The first pass parses each file (and fills the cache); each further setting is chunked once by
+parsing the file again and once from the cache (DocumentProcessor.rechunk).
+
+Run from the repository root:
+    python -m benchmarks.bench_text_cache --pages 500 --settings 500:50 1000:100 1000:200 2000:200
+"""
+import os
+import json
+import time
+import argparse
+import tempfile
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from collection_registry import file_content_hash
+from document_processor import DocumentProcessor
+from benchmarks.synthetic_docs import make_document
+
+
+def chunk_by_parsing(processor, path):
+    return [chunk for documents, _ in processor.iter_document_batches(path)
+            for chunk in processor.text_splitter.split_documents(documents)]
+
+
+def run(formats, pages, settings):
+    results = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        for file_format in formats:
+            path = make_document(work_dir, file_format, pages)
+            content_hash = file_content_hash(path)
+            cached = DocumentProcessor(persist_dir=os.path.join(work_dir, "db"),
+                                       embeddings=DeterministicFakeEmbedding(size=8))
+            start = time.perf_counter()
+            list(cached.iter_document_batches(path))
+            first_parse = time.perf_counter() - start
+
+            for chunk_size, chunk_overlap in settings:
+                uncached = DocumentProcessor(chunk_size=chunk_size, chunk_overlap=chunk_overlap,
+                                             persist_dir=os.path.join(work_dir, "db"), use_text_cache=False,
+                                             embeddings=DeterministicFakeEmbedding(size=8))
+                start = time.perf_counter()
+                parsed = chunk_by_parsing(uncached, path)
+                parse_seconds = time.perf_counter() - start
+                start = time.perf_counter()
+                from_cache = cached.rechunk(content_hash, os.path.basename(path), chunk_size, chunk_overlap)
+                cache_seconds = time.perf_counter() - start
+                assert len(parsed) == len(from_cache)
+                results.append({
+                    'format': file_format,
+                    'chunk_size': chunk_size,
+                    'chunk_overlap': chunk_overlap,
+                    'chunks': len(parsed),
+                    'first_parse_ms': round(first_parse * 1000, 1),
+                    'reparse_ms': round(parse_seconds * 1000, 1),
+                    'from_cache_ms': round(cache_seconds * 1000, 1),
+                    'speedup': round(parse_seconds / cache_seconds, 1),
+                })
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--formats", nargs="+", default=["pdf", "docx"], choices=["pdf", "docx"])
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--settings", nargs="+", default=["500:50", "1000:100", "1000:200", "2000:200"],
+                        help="chunk_size:chunk_overlap pairs")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    settings = [tuple(int(value) for value in setting.split(":")) for setting in args.settings]
+    results = run(args.formats, args.pages, settings)
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"{'format':<8}{'size':>6}{'overlap':>9}{'chunks':>8}{'reparse ms':>12}{'cache ms':>10}{'speedup':>9}")
+        for r in results:
+            print(f"{r['format']:<8}{r['chunk_size']:>6}{r['chunk_overlap']:>9}{r['chunks']:>8}"
+                  f"{r['reparse_ms']:>12}{r['from_cache_ms']:>10}{r['speedup']:>8}x")
@@ -0,0 +1,118 @@
+"""
+Compare the Chroma and NumPy vector backends: build time, reopen time, query latency and RSS.
+
+Each configuration runs in a fresh process so RSS numbers do not leak between runs.
+Embeddings are random normalized 384-d vectors, so no model is needed.
+
+Run from the repository root:
+    python -m benchmarks.bench_vector_backends --sizes 1000 10000 100000
+    python -m benchmarks.bench_vector_backends --backends numpy --dtype float16
+"""
+import json
+import time
+import argparse
+import tempfile
+import multiprocessing
+from typing import List
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from embedding_registry import resident_memory_mb
+from vector_backends import get_vector_backend
+
+DIM = 384
+ADD_BATCH = 5000
+
+
+class RandomEmbeddings(Embeddings):
+    """Random unit vectors, cheap enough to leave the backends as the only cost"""
+
+    def __init__(self, seed: int = 0):
+        self.rng = np.random.default_rng(seed)
+
+    def _vectors(self, n):
+        vectors = self.rng.standard_normal((n, DIM), dtype=np.float32)
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._vectors(len(texts))
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._vectors(1)[0]
+
+
+def run_one(backend_name, num_chunks, queries, top_k, dtype):
+    embeddings = RandomEmbeddings()
+    with tempfile.TemporaryDirectory() as work_dir:
+        rss_start = resident_memory_mb()
+        backend = get_vector_backend(work_dir, backend_name)
+        if backend_name == "numpy":
+            backend.dtype = dtype
+        store = backend.open("bench", embeddings)
+
+        start = time.perf_counter()
+        for first in range(0, num_chunks, ADD_BATCH):
+            count = min(ADD_BATCH, num_chunks - first)
+            store.add_texts([f"chunk {i}" for i in range(first, first + count)],
+                            metadatas=[{'file_name': f"file_{i % 8}.txt"} for i in range(first, first + count)],
+                            ids=[f"chunk-{i}" for i in range(first, first + count)])
+        build = time.perf_counter() - start
+        rss_built = resident_memory_mb()
+
+        # A fresh backend object measures the cost of reopening a persisted collection
+        del store, backend
+        start = time.perf_counter()
+        backend = get_vector_backend(work_dir, backend_name)
+        store = backend.open("bench", embeddings)
+        store.similarity_search_by_vector(embeddings.embed_query(""), k=top_k)
+        reopen = time.perf_counter() - start
+
+        latencies = []
+        for _ in range(queries):
+            query = embeddings.embed_query("")
+            start = time.perf_counter()
+            store.similarity_search_by_vector(query, k=top_k)
+            latencies.append(time.perf_counter() - start)
+        rss_end = resident_memory_mb()
+
+    latencies = np.asarray(latencies) * 1000
+    return {
+        'backend': backend_name if backend_name != "numpy" else f"numpy-{dtype}",
+        'chunks': num_chunks,
+        'build_s': round(build, 2),
+        'reopen_ms': round(reopen * 1000, 1),
+        'query_p50_ms': round(float(np.percentile(latencies, 50)), 2),
+        'query_p99_ms': round(float(np.percentile(latencies, 99)), 2),
+        'rss_built_mb': round(rss_built - rss_start, 1),
+        'rss_end_mb': round(rss_end - rss_start, 1),
+    }
+
+
+def run(backends, sizes, queries, top_k, dtype):
+    ctx = multiprocessing.get_context("spawn")
+    results = []
+    for num_chunks in sizes:
+        for backend_name in backends:
+            with ctx.Pool(1) as pool:
+                results.append(pool.apply(run_one, (backend_name, num_chunks, queries, top_k, dtype)))
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", nargs="+", default=["chroma", "numpy"])
+    parser.add_argument("--sizes", nargs="+", type=int, default=[1000, 10000, 100000])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--dtype", default="float32", choices=["float32", "float16"])
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    results = run(args.backends, args.sizes, args.queries, args.top_k, args.dtype)
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"{'backend':<15}{'chunks':>8}{'build s':>9}{'reopen ms':>11}{'p50 ms':>9}{'p99 ms':>9}"
+              f"{'RSS built':>11}{'RSS end':>9}")
+        for r in results:
+            print(f"{r['backend']:<15}{r['chunks']:>8}{r['build_s']:>9}{r['reopen_ms']:>11}{r['query_p50_ms']:>9}"
+                  f"{r['query_p99_ms']:>9}{r['rss_built_mb']:>11}{r['rss_end_mb']:>9}")
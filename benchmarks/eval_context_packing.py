@@ -0,0 +1,100 @@
+"""
+Offline evaluation of context packing: prompt tokens and answer support, raw vs packed.
+
+A synthetic corpus has planted facts ("The access code for project X is ...").
+For each question the top_k retrieved chunks are formatted raw (as before) and
+packed by ContextPacker; we report prompt tokens and whether the fact survives.
+
+Run from the repository root:
+    python -m benchmarks.eval_context_packing
+    python -m benchmarks.eval_context_packing --fake --json   # offline, no model download
+"""
+import json
+import time
+import random
+import argparse
+import statistics
+from langchain_core.documents import Document
+from langchain_core.vectorstores import InMemoryVectorStore
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from context_packer import ContextPacker
+from conversation_memory import get_token_counter
+from embedding_registry import get_embeddings
+from benchmarks.bench_embedding_cache import WORDS
+
+
+def make_corpus(num_pages, facts_per_page=2, seed=0):
+    rng = random.Random(seed)
+    pages, facts = [], []
+    for page in range(num_pages):
+        sentences = [" ".join(rng.choice(WORDS) for _ in range(12)).capitalize() + "." for _ in range(40)]
+        for _ in range(facts_per_page):
+            project = f"{rng.choice(WORDS)}-{rng.randint(100, 999)}"
+            code = f"ZX{rng.randint(10000, 99999)}"
+            sentences.insert(rng.randrange(len(sentences)), f"The access code for project {project} is {code}.")
+            facts.append((f"What is the access code for project {project}?", code))
+        pages.append(Document(page_content=" ".join(sentences), metadata={'source': 'synthetic.txt', 'page': page}))
+    return pages, facts
+
+
+def run(num_pages, top_k, token_budget, fake=False):
+    embeddings = DeterministicFakeEmbedding(size=384) if fake else get_embeddings()
+    count_tokens = get_token_counter()
+    pages, facts = make_corpus(num_pages)
+    splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200, add_start_index=True)
+    chunks = splitter.split_documents(pages)
+    vectorstore = InMemoryVectorStore(embeddings)
+    vectorstore.add_documents(chunks)
+    packer = ContextPacker(token_budget=token_budget, count_tokens=count_tokens)
+
+    raw_tokens, packed_tokens, pack_ms = [], [], []
+    raw_hits = packed_hits = retained = 0
+    for question, code in facts:
+        query_vector = embeddings.embed_query(question)
+        results = vectorstore.similarity_search_with_score_by_vector(query_vector, k=top_k)
+        docs = [doc for doc, _ in results]
+        doc_vectors = [vectorstore.store[doc.id]['vector'] for doc in docs]
+
+        start = time.perf_counter()
+        packed = packer.pack(docs, doc_vectors, query_vector)
+        pack_ms.append((time.perf_counter() - start) * 1000)
+
+        raw_context = "\n\n".join(doc.page_content for doc in docs)
+        packed_context = "\n\n".join(doc.page_content for doc in packed)
+        raw_tokens.append(count_tokens(raw_context))
+        packed_tokens.append(count_tokens(packed_context))
+        raw_hit, packed_hit = code in raw_context, code in packed_context
+        raw_hits += raw_hit
+        packed_hits += packed_hit
+        retained += raw_hit and packed_hit
+
+    return {
+        'questions': len(facts),
+        'chunks': len(chunks),
+        'top_k': top_k,
+        'token_budget': token_budget,
+        'avg_prompt_tokens_raw': round(statistics.mean(raw_tokens), 1),
+        'avg_prompt_tokens_packed': round(statistics.mean(packed_tokens), 1),
+        'token_reduction': round(1 - sum(packed_tokens) / sum(raw_tokens), 3),
+        'fact_recall_raw': round(raw_hits / len(facts), 3),
+        'fact_recall_packed': round(packed_hits / len(facts), 3),
+        'facts_retained_after_packing': round(retained / max(raw_hits, 1), 3),
+        'avg_pack_ms': round(statistics.mean(pack_ms), 2)
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=50)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--token-budget", type=int, default=1500)
+    parser.add_argument("--fake", action="store_true", help="use a deterministic fake embedding model")
+    parser.add_argument("--json", action="store_true", help="print machine-readable JSON")
+    args = parser.parse_args()
+    results = run(args.pages, args.top_k, args.token_budget, fake=args.fake)
+    if args.json:
+        print(json.dumps(results))
+    else:
+        for key, value in results.items():
+            print(f"{key.replace('_', ' ').capitalize()}: {value}")
@@ -0,0 +1,101 @@
+"""
+Deterministic synthetic documents (PDF, TXT, DOCX) for offline benchmarks.
+
+Pages are built from a fixed vocabulary with a seeded RNG, so the same size and seed always
+produce byte-identical files. PDF and DOCX files are written by hand (no reportlab or
+python-docx needed) and are read by the same loaders as real uploads.
+"""
+import os
+import random
+import zipfile
+from typing import Dict, List
+from xml.sax.saxutils import escape
+from benchmarks.bench_embedding_cache import WORDS
+
+# Page counts per named size
+SIZES: Dict[str, int] = {'small': 10, 'medium': 100, 'large': 500}
+FORMATS = ("pdf", "txt", "docx")
+LINES_PER_PAGE = 40
+WORDS_PER_LINE = 12
+
+# A recognizable fact is planted on every page so questions have something to retrieve
+FACT = "The pump on page {page} runs at {pressure} bar."
+
+
+def page_lines(page: int, seed: int = 0) -> List[str]:
+    rng = random.Random(seed * 1_000_003 + page)
+    lines = [" ".join(rng.choice(WORDS) for _ in range(WORDS_PER_LINE)) + "." for _ in range(LINES_PER_PAGE - 1)]
+    lines.insert(rng.randrange(LINES_PER_PAGE), FACT.format(page=page + 1, pressure=2 + page % 7))
+    return lines
+
+
+def write_txt(path: str, pages: int, seed: int = 0):
+    with open(path, "w", encoding="utf-8") as f:
+        for page in range(pages):
+            f.write("\n".join(page_lines(page, seed)) + "\n\n")
+
+
+def write_pdf(path: str, pages: int, seed: int = 0):
+    """Minimal PDF 1.4: one Helvetica text stream per page"""
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for page in range(pages):
+        lines = [line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)") for line in page_lines(page, seed)]
+        stream = ("BT /F1 9 Tf 11 TL 40 800 Td " + " ".join(f"({line}) '" for line in lines) + " ET").encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                       b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % (len(objects)))
+        kids.append(len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(b"%d 0 R" % kid for kid in kids), pages)
+
+    with open(path, "wb") as f:
+        f.write(b"%PDF-1.4\n")
+        offsets = []
+        for number, body in enumerate(objects, 1):
+            offsets.append(f.tell())
+            f.write(b"%d 0 obj\n%s\nendobj\n" % (number, body))
+        xref = f.tell()
+        f.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+        f.writelines(b"%010d 00000 n \n" % offset for offset in offsets)
+        f.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
+
+
+def write_docx(path: str, pages: int, seed: int = 0):
+    """Minimal WordprocessingML package: one paragraph per line, a page break between pages"""
+    paragraphs = []
+    for page in range(pages):
+        if page:
+            paragraphs.append('<w:p><w:r><w:br w:type="page"/></w:r></w:p>')
+        paragraphs.extend(f"<w:p><w:r><w:t>{escape(line)}</w:t></w:r></w:p>" for line in page_lines(page, seed))
+    document = ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+                f"<w:body>{''.join(paragraphs)}</w:body></w:document>")
+    content_types = ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                     '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+                     '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+                     '<Default Extension="xml" ContentType="application/xml"/>'
+                     '<Override PartName="/word/document.xml" ContentType="application/'
+                     'vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/></Types>')
+    rels = ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/'
+            'relationships/officeDocument" Target="word/document.xml"/></Relationships>')
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as package:
+        package.writestr("[Content_Types].xml", content_types)
+        package.writestr("_rels/.rels", rels)
+        package.writestr("word/document.xml", document)
+
+
+WRITERS = {'pdf': write_pdf, 'txt': write_txt, 'docx': write_docx}
+
+
+def make_document(directory: str, file_format: str, pages: int, seed: int = 0) -> str:
+    """Write a synthetic document of the given format and page count; returns its path"""
+    path = os.path.join(directory, f"synthetic_{pages}p_{seed}.{file_format}")
+    WRITERS[file_format](path, pages, seed)
+    return path
+
+
+def make_questions(pages: int, count: int, seed: int = 0) -> List[str]:
+    rng = random.Random(seed)
+    return [f"What pressure does the pump on page {rng.randrange(pages) + 1} run at?" for _ in range(count)]
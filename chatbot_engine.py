@@ -1,46 +1,47 @@
-import os
+import copy
+import time
+import hashlib
+import asyncio
 import logging
-from typing import List, Tuple
-from langchain_huggingface import HuggingFaceEndpoint, ChatHuggingFace
+from typing import AsyncIterator, Dict, Iterator, List
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
-from langchain_core.runnables import RunnablePassthrough
+from conversation_memory import ConversationMemory
+from lexical_index import reciprocal_rank_fusion
+from metrics import get_metrics
 from dotenv import load_dotenv
 
 load_dotenv()
 
+# Timing keys recorded under a different metric stage name
+METRIC_STAGES = {'embed_query': "query_embed", 'first_token': "llm_first_token", 'total': "answer_total"}
+
 class ChatbotEngine:
-    def __init__(self, vectorstore, top_k=5):
+    def __init__(self, vectorstore, top_k=5, llm=None, answer_cache=None, corpus_key=None, memory=None,
+                 context_packer=None, lexical_index=None, query_batcher=None):
         self.vectorstore = vectorstore
         self.top_k = top_k
-        self.history = [] # Manual conversation history
-        
-        # Initialize the LLM - Using ChatHuggingFace wrapper for better chat capabilities
-        repo_id = "mistralai/Mistral-7B-Instruct-v0.2"
+        # Optional LexicalIndex; its BM25 hits are fused with vector hits by reciprocal rank
+        self.lexical_index = lexical_index
+        # Optional QueryBatcher that embeds and searches concurrent questions in batches
+        self.query_batcher = query_batcher
+        # Optional ContextPacker that merges, dedups and budgets retrieved chunks
+        self.context_packer = context_packer
+        # Optional AnswerCache; corpus_key identifies the document set answers belong to
+        self.answer_cache = answer_cache
+        self.corpus_key = corpus_key
+        self.last_cache_hit = False
+        # Bounded, token-budgeted conversation history with a rolling summary
+        self.memory = memory or ConversationMemory()
+        self.last_timings: Dict[str, float] = {}
+        self.last_sources: List[str] = []
+        self.file_filter: List[str] = [] # Restrict retrieval to these corpus files (empty = all)
         
-        try:
-            endpoint_llm = HuggingFaceEndpoint(
-                repo_id=repo_id,
-                max_new_tokens=1024,
-                temperature=0.1,
-                huggingfacehub_api_token=os.getenv("HUGGINGFACEHUB_API_TOKEN"),
-                timeout=300
-            )
-            self.llm = ChatHuggingFace(llm=endpoint_llm)
-        except Exception as e:
-            logging.error(f"Error initializing ChatHuggingFace: {e}")
-            # Fallback to direct endpoint
-            self.llm = HuggingFaceEndpoint(
-                repo_id=repo_id,
-                max_new_tokens=512,
-                temperature=0.1,
-                huggingfacehub_api_token=os.getenv("HUGGINGFACEHUB_API_TOKEN")
-            )
-        
-        # Initialize retriever
-        self.retriever = vectorstore.as_retriever(
-            search_kwargs={"k": top_k}
-        )
+        if llm is not None:
+            # Injected model, e.g. a local fake for offline tests
+            self.llm = llm
+        else:
+            self.llm = self._create_llm()
         
         # Define the RAG prompt with history
         self.prompt = ChatPromptTemplate.from_template("""
@@ -57,62 +58,302 @@ class ChatbotEngine:
         
         Answer:""")
         
-        # RAG Chain
-        self.chain = (
-            {
-                "context": self.retriever | self._format_docs, 
-                "history": lambda x: self._format_history(),
-                "question": RunnablePassthrough()
-            }
-            | self.prompt
-            | self.llm
-            | StrOutputParser()
-        )
+        # Generation chain: retrieval happens once in get_response and the same
+        # docs feed both the prompt context and the returned sources
+        self.chain = self.llm | StrOutputParser()
+
+    def _create_llm(self):
+        """Shared process-wide LLM client (pooled connections, concurrency cap, deadlines, hedging)"""
+        # Imported here so the HTTP client layer only loads when an engine is actually created
+        from llm_client import get_llm
+        return get_llm()
 
     def _format_docs(self, docs):
         """Format retrieved documents as context string"""
         return "\n\n".join(doc.page_content for doc in docs)
 
+    @property
+    def history(self):
+        """Recent messages still held verbatim (older ones live in memory.summary)"""
+        return self.memory.as_list()
+
     def _format_history(self):
-        """Format history list into a string"""
-        if not self.history:
-            return "No previous interaction."
-        # Keep last 5 exchanges to avoid prompt bloat
-        return "\n".join([f"{m['role']}: {m['content']}" for m in self.history[-6:]])
+        """Format history (rolling summary plus recent turns) within the token budget"""
+        return self.memory.format()
+
+    def _retrieve(self, question: str, timings: Dict[str, float]):
+        """Embed the query and search the vector store, recording each stage"""
+        start = time.perf_counter()
+        if self.query_batcher is not None:
+            query_vector = self.query_batcher.embed_query(self.vectorstore.embeddings, question)
+        else:
+            query_vector = self.vectorstore.embeddings.embed_query(question)
+        timings['embed_query'] = time.perf_counter() - start
+
+        search_kwargs = {}
+        if self.file_filter:
+            if len(self.file_filter) == 1:
+                search_kwargs['filter'] = {"file_name": self.file_filter[0]}
+            else:
+                search_kwargs['filter'] = {"file_name": {"$in": list(self.file_filter)}}
+
+        start = time.perf_counter()
+        if self.query_batcher is not None:
+            docs = self.query_batcher.search(self.vectorstore, query_vector, self.top_k, search_kwargs.get('filter'))
+        else:
+            docs = self.vectorstore.similarity_search_by_vector(query_vector, k=self.top_k, **search_kwargs)
+        timings['search'] = time.perf_counter() - start
+
+        if self.lexical_index is not None:
+            docs = self._fuse_lexical(question, docs, timings)
+        return docs, query_vector
+
+    def _fuse_lexical(self, question: str, docs, timings: Dict[str, float]):
+        """Reciprocal rank fusion of vector hits with BM25 hits (exact terms, codes, identifiers)"""
+        start = time.perf_counter()
+        hits = self.lexical_index.search(question, k=self.top_k, file_names=self.file_filter or None)
+        timings['lexical_search'] = time.perf_counter() - start
+        if not hits:
+            return docs
+
+        by_id = {doc.id: doc for doc in docs}
+        fused = reciprocal_rank_fusion([[doc.id for doc in docs], [doc_id for doc_id, _ in hits]])[:self.top_k]
+        missing = [doc_id for doc_id in fused if doc_id not in by_id]
+        if missing:
+            for doc in self.vectorstore.get_by_ids(missing):
+                by_id[doc.id] = doc
+        return [by_id[doc_id] for doc_id in fused if doc_id in by_id]
+
+    def _doc_vectors(self, docs):
+        """Stored embeddings of retrieved docs (re-embedding hits the embedding cache otherwise)"""
+        ids = [doc.id for doc in docs]
+        if all(ids) and hasattr(self.vectorstore, "get_vectors"):
+            vectors = self.vectorstore.get_vectors(ids)
+            if vectors is not None:
+                return vectors
+        return self.vectorstore.embeddings.embed_documents([doc.page_content for doc in docs])
+
+    def _prepare(self, question: str, timings: Dict[str, float]):
+        """
+        Retrieve once and build the prompt.
+        Returns (prompt_value, sources, turn); prompt_value is None when turn['cached']
+        holds an answer from the answer cache.
+        """
+        # 1. Retrieve docs, pack them into the context budget and filter unique ones for source tracking
+        docs, query_vector = self._retrieve(question, timings)
+        # Stable across processes, so persisted cache entries still match after a restart
+        chunk_ids = [doc.id or hashlib.sha256(doc.page_content.encode("utf-8")).hexdigest() for doc in docs]
+        
+        if self.context_packer is not None and docs:
+            start = time.perf_counter()
+            docs = self.context_packer.pack(docs, self._doc_vectors(docs), query_vector)
+            timings['pack'] = time.perf_counter() - start
+        
+        # Use a seen set to maintain order and uniqueness
+        seen = set()
+        sources = []
+        for doc in docs:
+            content = doc.page_content.strip()
+            if content and content not in seen:
+                seen.add(content)
+                sources.append(content)
+        
+        # 2. Reuse a cached answer for the same (or a paraphrased) question over the same chunks
+        turn = {
+            'chunk_ids': chunk_ids,
+            'query_vector': query_vector,
+            'cached': None
+        }
+        if self._cacheable():
+            start = time.perf_counter()
+            hit = self.answer_cache.get(self.corpus_key, question, turn['chunk_ids'], query_vector)
+            timings['cache_lookup'] = time.perf_counter() - start
+            if hit:
+                turn['cached'] = hit[0]
+                return None, sources, turn
+        
+        # 3. Build the prompt from the same docs plus history
+        start = time.perf_counter()
+        prompt_value = self.prompt.invoke({
+            "context": self._format_docs(docs),
+            "history": self._format_history(),
+            "question": question
+        })
+        timings['prompt_build'] = time.perf_counter() - start
+        return prompt_value, sources, turn
+
+    def _cacheable(self) -> bool:
+        """
+        Answers are shared across chats only for the first question of a conversation:
+        later prompts include this chat's history, so their answers are not reusable.
+        """
+        return (self.answer_cache is not None and bool(self.corpus_key)
+                and not self.memory.messages and not self.memory.summary)
+
+    def _store_answer(self, question: str, response: str, sources: List[str], turn: dict):
+        """Save a freshly generated answer in the answer cache"""
+        if self._cacheable() and response:
+            self.answer_cache.put(self.corpus_key, question, turn['chunk_ids'], response, sources,
+                                  turn['query_vector'])
+
+    def _remember(self, question: str, response: str):
+        """Update history with a finished exchange"""
+        self.memory.append("User", question)
+        self.memory.append("Assistant", response)
+
+    def _error_message(self, e: Exception) -> str:
+        error_msg = f"{type(e).__name__}: {str(e)}"
+        logging.error(f"Error in ChatbotEngine: {error_msg}")
+        if "Authorization" in str(e):
+            return "Authentication Error: Please verify your HUGGINGFACEHUB_API_TOKEN."
+        return f"Thinking error: {error_msg}"
 
-    def get_response(self, question: str) -> Tuple[str, List[str]]:
+    def _finish(self, timings: Dict[str, float], total_start: float, sources: List[str],
+                prompt_value=None, response: str = None, failed: bool = False):
+        timings['total'] = time.perf_counter() - total_start
+        self.last_timings = {stage: round(seconds * 1000, 2) for stage, seconds in timings.items()}
+        self.last_sources = sources
+        metrics = get_metrics()
+        if metrics.enabled:
+            for stage, seconds in timings.items():
+                metrics.observe(METRIC_STAGES.get(stage, stage), seconds)
+            metrics.increment("questions")
+            if failed:
+                metrics.increment("answer_errors")
+            elif self.last_cache_hit:
+                metrics.increment("answer_cache_hits")
+            elif prompt_value is not None:
+                # Token counts for generated answers only (cached answers cost no LLM tokens)
+                metrics.increment("prompt_tokens", self.memory.count_tokens(prompt_value.to_string()))
+                metrics.increment("completion_tokens", self.memory.count_tokens(response or ""))
+
+    def get_response(self, question: str, return_timings: bool = False):
         """
-        Process the user query and return (response_text, list_of_source_contents)
+        Process the user query and return (response_text, list_of_source_contents).
+        With return_timings=True a third element holds per-stage latency in milliseconds
+        (embed_query, search, prompt_build, llm, total).
         """
+        timings = {}
+        total_start = time.perf_counter()
+        prompt_value, failed = None, False
         try:
-            # 1. Get retrieved docs for source tracking and filter unique ones
-            docs = self.retriever.invoke(question)
+            prompt_value, sources, turn = self._prepare(question, timings)
+            self.last_cache_hit = turn['cached'] is not None
             
-            # Use a seen set to maintain order and uniqueness
-            seen = set()
-            sources = []
-            for doc in docs:
-                content = doc.page_content.strip()
-                if content and content not in seen:
-                    seen.add(content)
-                    sources.append(content)
+            # 4. Generate response (unless it came from the cache)
+            if self.last_cache_hit:
+                response = turn['cached']
+            else:
+                start = time.perf_counter()
+                response = self.chain.invoke(prompt_value).strip()
+                timings['llm'] = time.perf_counter() - start
+                self._store_answer(question, response, sources, turn)
             
-            # 2. Generate response including history
-            response = self.chain.invoke(question)
+            # 5. Update history
+            self._remember(question, response)
             
-            # 3. Update history
-            self.history.append({"role": "User", "content": question})
-            self.history.append({"role": "Assistant", "content": response.strip()})
+        except Exception as e:
+            response, sources, failed = self._error_message(e), [], True
+
+        self._finish(timings, total_start, sources, prompt_value, response, failed)
+        if return_timings:
+            return response, sources, self.last_timings
+        return response, sources
+
+    def stream_response(self, question: str) -> Iterator[str]:
+        """
+        Yield response tokens as the LLM produces them.
+        When exhausted, history is updated, last_sources/last_timings are set
+        (with a first_token stage) and the generator returns (response_text, sources).
+        """
+        timings = {}
+        total_start = time.perf_counter()
+        prompt_value, failed = None, False
+        try:
+            prompt_value, sources, turn = self._prepare(question, timings)
+            self.last_cache_hit = turn['cached'] is not None
+            if self.last_cache_hit:
+                yield turn['cached']
+                self._remember(question, turn['cached'])
+                self._finish(timings, total_start, sources)
+                return turn['cached'], sources
+            
+            start = time.perf_counter()
+            tokens = []
+            for token in self.chain.stream(prompt_value):
+                if not token:
+                    continue
+                if not tokens:
+                    timings['first_token'] = time.perf_counter() - start
+                tokens.append(token)
+                yield token
+            timings['llm'] = time.perf_counter() - start
             
-            return response.strip(), sources
+            response = "".join(tokens).strip()
+            self._store_answer(question, response, sources, turn)
+            self._remember(question, response)
             
         except Exception as e:
-            error_msg = f"{type(e).__name__}: {str(e)}"
-            logging.error(f"Error in ChatbotEngine: {error_msg}")
-            if "Authorization" in str(e):
-                return "Authentication Error: Please verify your HUGGINGFACEHUB_API_TOKEN.", []
-            return f"Thinking error: {error_msg}", []
+            response, sources, failed = self._error_message(e), [], True
+            yield response
+
+        self._finish(timings, total_start, sources, prompt_value, response, failed)
+        return response, sources
+
+    async def astream_response(self, question: str) -> AsyncIterator[str]:
+        """Async variant of stream_response; read last_sources once it is exhausted"""
+        timings = {}
+        total_start = time.perf_counter()
+        prompt_value, response, failed = None, None, False
+        try:
+            # Retrieval is CPU-bound, keep it off the event loop
+            prompt_value, sources, turn = await asyncio.to_thread(self._prepare, question, timings)
+            self.last_cache_hit = turn['cached'] is not None
+            if self.last_cache_hit:
+                yield turn['cached']
+                self._remember(question, turn['cached'])
+                self._finish(timings, total_start, sources)
+                return
+            
+            start = time.perf_counter()
+            tokens = []
+            async for token in self.chain.astream(prompt_value):
+                if not token:
+                    continue
+                if not tokens:
+                    timings['first_token'] = time.perf_counter() - start
+                tokens.append(token)
+                yield token
+            timings['llm'] = time.perf_counter() - start
+            
+            response = "".join(tokens).strip()
+            self._store_answer(question, response, sources, turn)
+            self._remember(question, response)
+            
+        except Exception as e:
+            sources, failed = [], True
+            yield self._error_message(e)
+
+        self._finish(timings, total_start, sources, prompt_value, response, failed)
+
+    def for_session(self, memory=None) -> "ChatbotEngine":
+        """
+        Engine for one conversation that shares this engine's vector store, indexes, LLM and caches.
+        Only the memory, file filter and last-answer details are its own (see engine_pool.py).
+        """
+        session = copy.copy(self)
+        session.memory = memory or ConversationMemory(
+            self.memory.max_messages, self.memory.token_budget, self.memory.summary_token_budget,
+            self.memory.max_message_chars, self.memory.count_tokens, self.memory.summarizer
+        )
+        session.file_filter = []
+        session.last_timings, session.last_sources, session.last_cache_hit = {}, [], False
+        return session
+
+    def set_file_filter(self, file_names=None):
+        """Search only the given corpus files; None or empty searches the whole corpus"""
+        self.file_filter = list(file_names or [])
 
     def clear_memory(self):
         """Reset conversation history"""
-        self.history = []
+        self.memory.clear()
@@ -0,0 +1,58 @@
+import uuid
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+from langchain_chroma import Chroma
+from langchain_core.documents import Document
+
+
+class ChromaStore(Chroma):
+    """Chroma collection with the backend-neutral helpers DocuChat uses"""
+
+    def count(self) -> int:
+        return self._collection.count()
+
+    def add_texts(self, texts: Iterable[str], metadatas: Optional[List[dict]] = None,
+                  ids: Optional[List[str]] = None, **kwargs: Any) -> List[str]:
+        """Add in slices no larger than the client's maximum batch size"""
+        texts = list(texts)
+        limit = self._client.get_max_batch_size()
+        added = []
+        for start in range(0, len(texts), limit):
+            end = start + limit
+            added.extend(super().add_texts(texts[start:end], metadatas[start:end] if metadatas else None,
+                                           ids[start:end] if ids else None, **kwargs))
+        return added
+
+    def add_vectors(self, texts: List[str], vectors: Sequence[List[float]], metadatas: Optional[List[dict]] = None,
+                    ids: Optional[List[str]] = None) -> List[str]:
+        """Store texts with embeddings computed by the caller"""
+        ids = list(ids) if ids else [str(uuid.uuid4()) for _ in texts]
+        limit = self._client.get_max_batch_size()
+        for start in range(0, len(texts), limit):
+            end = start + limit
+            self._collection.upsert(ids=ids[start:end], embeddings=[list(v) for v in vectors[start:end]],
+                                    documents=texts[start:end],
+                                    metadatas=[m or None for m in metadatas[start:end]] if metadatas else None)
+        return ids
+
+    def get_vectors(self, ids: Sequence[str]) -> Optional[List[List[float]]]:
+        """Stored embeddings in the order of ids, or None if any is missing"""
+        stored = self.get(ids=list(ids), include=["embeddings"])
+        by_id = dict(zip(stored['ids'], stored['embeddings']))
+        if len(by_id) != len(set(ids)):
+            return None
+        return [by_id[doc_id] for doc_id in ids]
+
+    def get_chunks(self) -> List[Tuple[str, str, dict]]:
+        """Every stored (id, text, metadata)"""
+        stored = self.get(include=["documents", "metadatas"])
+        return [(doc_id, text, metadata or {})
+                for doc_id, text, metadata in zip(stored['ids'], stored['documents'], stored['metadatas'])]
+
+    def batch_similarity_search_by_vector(self, embeddings: Sequence[List[float]], k: int = 4,
+                                          filter: Optional[Dict[str, Any]] = None) -> List[List[Document]]:
+        """Top-k for several queries in one collection query"""
+        results = self._collection.query(query_embeddings=[list(e) for e in embeddings], n_results=k, where=filter,
+                                         include=["documents", "metadatas"])
+        return [[Document(page_content=text, metadata=metadata or {}, id=doc_id)
+                 for doc_id, text, metadata in zip(ids, texts, metadatas)]
+                for ids, texts, metadatas in zip(results['ids'], results['documents'], results['metadatas'])]
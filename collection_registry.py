@@ -0,0 +1,254 @@
+import os
+import copy
+import json
+import time
+import hashlib
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+from file_lock import FileLock
+from lexical_index import delete_lexical_index, release_lexical_index
+from vector_backends import get_vector_backend
+
+DEFAULT_PERSIST_DIR = "chroma_db"
+DEFAULT_TTL_SECONDS = float(os.getenv("DOCUCHAT_COLLECTION_TTL_HOURS", "24")) * 3600
+# Avoid rewriting the registry file on every chat turn
+TOUCH_WRITE_INTERVAL = 60
+
+
+def file_content_hash(file_path) -> str:
+    """SHA-256 of the file contents, read in 1 MB blocks (an in-memory buffer is hashed in place)"""
+    digest = hashlib.sha256()
+    if isinstance(file_path, (bytes, bytearray, memoryview)):
+        digest.update(file_path)
+        return digest.hexdigest()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def collection_name_for(content_hash: str, chunk_size: int, chunk_overlap: int, splitter: str = "characters") -> str:
+    """Collection name for a document indexed with given chunk settings (3-63 chars)"""
+    settings = f"{chunk_size}|{chunk_overlap}" if splitter == "characters" else f"{chunk_size}|{chunk_overlap}|{splitter}"
+    key = hashlib.sha256(f"{content_hash}|{settings}".encode("utf-8")).hexdigest()
+    return f"doc_{key[:32]}"
+
+
+class CollectionRegistry:
+    """
+    Tracks the per-document vector collections inside one persist directory.
+
+    Each entry records when the collection was last used so a background
+    garbage collector can drop collections that have not been touched within the TTL.
+    Several processes (API workers) may share the directory: reads pick up the file when
+    another process changed it, and writes are read-modify-write under a file lock.
+    """
+
+    def __init__(self, persist_dir: str = DEFAULT_PERSIST_DIR, ttl_seconds: float = DEFAULT_TTL_SECONDS,
+                 backend: Optional[str] = None):
+        self.persist_dir = persist_dir
+        self.ttl_seconds = ttl_seconds
+        # Where vectors are stored: "chroma" or "numpy" (see vector_backends.py)
+        self.backend = get_vector_backend(persist_dir, backend)
+        self.registry_path = os.path.join(persist_dir, "collections.json")
+        self._lock = threading.RLock()
+        self._file_lock = FileLock(os.path.join(persist_dir, "locks", "collections.lock"))
+        self._writing = 0
+        self._build_locks: Dict[str, FileLock] = {}
+        self._gc_thread: Optional[threading.Thread] = None
+        self._gc_stop = threading.Event()
+        os.makedirs(persist_dir, exist_ok=True)
+        self._stamp = None
+        self._entries: Dict[str, dict] = {}
+        self._refresh()
+
+    def _file_stamp(self):
+        try:
+            stat = os.stat(self.registry_path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+    def _refresh(self):
+        """Re-read the registry file if another process replaced it since it was last read"""
+        stamp = self._file_stamp()
+        if stamp == self._stamp:
+            return
+        entries = {}
+        if stamp is not None:
+            try:
+                with open(self.registry_path) as f:
+                    entries = json.load(f)
+            except (OSError, ValueError) as e:
+                logging.error(f"Could not read collection registry: {e}")
+                return
+        self._entries, self._stamp = entries, stamp
+
+    @contextmanager
+    def _transaction(self):
+        """Thread and file lock around a read-modify-write of the registry (re-entrant)"""
+        with self._lock:
+            if self._writing:
+                self._writing += 1
+                try:
+                    yield
+                finally:
+                    self._writing -= 1
+                return
+            with self._file_lock:
+                self._writing = 1
+                try:
+                    self._refresh()
+                    yield
+                finally:
+                    self._writing = 0
+
+    def _write(self):
+        tmp_path = f"{self.registry_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self._entries, f)
+        os.replace(tmp_path, self.registry_path)
+        self._stamp = self._file_stamp()
+
+    def build_lock(self, name: str) -> FileLock:
+        """Lock serialising concurrent builds of the same collection, across threads and processes"""
+        with self._lock:
+            if name not in self._build_locks:
+                self._build_locks[name] = FileLock(os.path.join(self.persist_dir, "locks", f"{name}.lock"))
+            return self._build_locks[name]
+
+    def get(self, name: str) -> Optional[dict]:
+        with self._lock:
+            self._refresh()
+            entry = self._entries.get(name)
+            return copy.deepcopy(entry) if entry else None
+
+    def register(self, name: str, info: dict):
+        """Record a freshly built collection"""
+        with self._transaction():
+            now = time.time()
+            self._entries[name] = {**info, 'created_at': now, 'last_used': now}
+            self._write()
+
+    def ensure(self, name: str, info: dict):
+        """Register an entry unless it already exists, otherwise touch it"""
+        with self._lock:
+            self._refresh()
+            if name in self._entries:
+                self.touch(name)
+                return
+        with self._transaction():
+            if name in self._entries:
+                self.touch(name)
+            else:
+                self.register(name, info)
+
+    def update(self, name: str, info: dict):
+        """Update fields of an existing entry and mark it as used"""
+        with self._transaction():
+            entry = self._entries.setdefault(name, {'created_at': time.time()})
+            entry.update(info)
+            entry['last_used'] = time.time()
+            self._write()
+
+    def touch(self, name: str):
+        """Mark a collection as used now"""
+        with self._lock:
+            self._refresh()
+            entry = self._entries.get(name)
+            if entry is None:
+                return
+            now = time.time()
+            if now - entry['last_used'] < TOUCH_WRITE_INTERVAL:
+                entry['last_used'] = now
+                return
+        with self._transaction():
+            entry = self._entries.get(name)
+            if entry is not None:
+                entry['last_used'] = time.time()
+                self._write()
+
+    def open_collection(self, name: str, embeddings):
+        return self.backend.open(name, embeddings)
+
+    def release(self, name: str):
+        """Drop this process's cached objects for a collection; the data stays on disk"""
+        self.backend.release(name)
+        release_lexical_index(self.lexical_path(name))
+
+    def lexical_path(self, name: str) -> str:
+        """Directory of the BM25 index kept next to a collection"""
+        return os.path.join(self.persist_dir, "lexical", name)
+
+    def delete(self, name: str):
+        """Drop the collection, its lexical index and its registry entry"""
+        with self._transaction():
+            try:
+                self.backend.delete(name)
+            except Exception as e:
+                logging.error(f"Error deleting collection {name}: {e}")
+            delete_lexical_index(self.lexical_path(name))
+            self._entries.pop(name, None)
+            self._build_locks.pop(name, None)
+            self._write()
+
+    def expired(self, now: Optional[float] = None) -> List[str]:
+        now = now or time.time()
+        with self._lock:
+            self._refresh()
+            return [name for name, entry in self._entries.items()
+                    if now - entry['last_used'] > self.ttl_seconds]
+
+    def collect_garbage(self) -> List[str]:
+        """Delete every collection unused for longer than the TTL"""
+        removed = []
+        for name in self.expired():
+            lock = self.build_lock(name)
+            # Skip collections that are being (re)built right now
+            if not lock.acquire(blocking=False):
+                continue
+            try:
+                self.delete(name)
+                removed.append(name)
+            finally:
+                lock.release()
+        if removed:
+            logging.info(f"Garbage collected {len(removed)} unused collections")
+        return removed
+
+    def start_gc(self, interval_seconds: float = 600):
+        """Run collect_garbage periodically on a daemon thread"""
+        with self._lock:
+            if self._gc_thread and self._gc_thread.is_alive():
+                return
+
+            def loop():
+                while not self._gc_stop.wait(interval_seconds):
+                    try:
+                        self.collect_garbage()
+                    except Exception as e:
+                        logging.error(f"Collection garbage collector failed: {e}")
+
+            self._gc_stop.clear()
+            self._gc_thread = threading.Thread(target=loop, name="collection-gc", daemon=True)
+            self._gc_thread.start()
+
+    def stop_gc(self):
+        self._gc_stop.set()
+
+
+_registries: Dict[str, CollectionRegistry] = {}
+_registries_lock = threading.Lock()
+
+
+def get_collection_registry(persist_dir: str = DEFAULT_PERSIST_DIR, backend: Optional[str] = None) -> CollectionRegistry:
+    """Return the process-wide registry for a persist directory"""
+    with _registries_lock:
+        if persist_dir not in _registries:
+            _registries[persist_dir] = CollectionRegistry(persist_dir, backend=backend)
+        registry = _registries[persist_dir]
+        if backend and registry.backend.name != backend:
+            raise ValueError(f"{persist_dir} already uses the {registry.backend.name} vector backend")
+        return registry
@@ -0,0 +1,135 @@
+from typing import Callable, List, Optional, Sequence
+import numpy as np
+from langchain_core.documents import Document
+from conversation_memory import get_token_counter
+
+
+def merge_neighbours(docs: Sequence[Document]):
+    """
+    Merge retrieved chunks that overlap or touch in the same file and page.
+    Uses the splitter's start_index metadata, so the shared overlap text appears once.
+    Returns (merged_docs, members) where members[i] lists the input indices behind merged_docs[i],
+    ordered by the best-ranked member.
+    """
+    groups = {}
+    singles = []
+    for rank, doc in enumerate(docs):
+        start = doc.metadata.get('start_index')
+        if start is None:
+            singles.append([rank])
+            continue
+        key = (doc.metadata.get('file_name') or doc.metadata.get('source'), doc.metadata.get('page'))
+        groups.setdefault(key, []).append(rank)
+
+    spans = []
+    for ranks in groups.values():
+        ranks.sort(key=lambda r: docs[r].metadata['start_index'])
+        current = [ranks[0]]
+        end = docs[ranks[0]].metadata['start_index'] + len(docs[ranks[0]].page_content)
+        for rank in ranks[1:]:
+            start = docs[rank].metadata['start_index']
+            if start <= end:
+                current.append(rank)
+                end = max(end, start + len(docs[rank].page_content))
+            else:
+                spans.append(current)
+                current = [rank]
+                end = start + len(docs[rank].page_content)
+        spans.append(current)
+    spans.extend(singles)
+    spans.sort(key=min)
+
+    merged = []
+    for span in spans:
+        first = docs[span[0]]
+        if len(span) == 1:
+            merged.append(first)
+            continue
+        text = first.page_content
+        end = first.metadata['start_index'] + len(text)
+        for rank in span[1:]:
+            doc = docs[rank]
+            start = doc.metadata['start_index']
+            # Append only the part beyond what we already have
+            text += doc.page_content[max(0, end - start):]
+            end = max(end, start + len(doc.page_content))
+        metadata = dict(first.metadata, merged_chunks=len(span))
+        merged.append(Document(page_content=text, metadata=metadata, id=first.id))
+    return merged, spans
+
+
+class ContextPacker:
+    """
+    Turns retrieved chunks into a compact prompt context.
+
+    1. Merges overlapping neighbouring chunks (chunk_overlap text is kept once).
+    2. Drops near-duplicates whose embeddings are above dedup_threshold cosine similarity.
+    3. Picks chunks by maximal marginal relevance (mmr_lambda trades relevance for diversity)
+       until token_budget prompt tokens are used. The budget is never exceeded: if no chunk fits,
+       the most relevant one is cut to it.
+    """
+
+    def __init__(self, token_budget: int = 1500, dedup_threshold: float = 0.95, mmr_lambda: float = 0.7,
+                 count_tokens: Optional[Callable[[str], int]] = None):
+        self.token_budget = token_budget
+        self.dedup_threshold = dedup_threshold
+        self.mmr_lambda = mmr_lambda
+        self.count_tokens = count_tokens or get_token_counter()
+
+    def pack(self, docs: Sequence[Document], doc_vectors: Sequence[Sequence[float]],
+             query_vector: Sequence[float]) -> List[Document]:
+        """Select the packed context from docs (in retrieval order) and their normalized vectors"""
+        if not docs:
+            return []
+        vectors = np.asarray(doc_vectors, dtype=np.float32)
+        merged, spans = merge_neighbours(docs)
+
+        # A merged chunk is represented by the normalized mean of its members
+        merged_vectors = np.stack([vectors[span].mean(axis=0) for span in spans])
+        merged_vectors /= np.linalg.norm(merged_vectors, axis=1, keepdims=True) + 1e-12
+
+        # Near-duplicate removal, keeping the better-ranked copy
+        keep = []
+        for i in range(len(merged)):
+            if keep and float(np.max(merged_vectors[keep] @ merged_vectors[i])) >= self.dedup_threshold:
+                continue
+            keep.append(i)
+        candidates = [merged[i] for i in keep]
+        candidate_vectors = merged_vectors[keep]
+
+        relevance = candidate_vectors @ np.asarray(query_vector, dtype=np.float32)
+        tokens = [self.count_tokens(doc.page_content) for doc in candidates]
+
+        # MMR selection within the token budget
+        selected = []
+        used = 0
+        remaining = list(range(len(candidates)))
+        while remaining:
+            if selected:
+                redundancy = np.max(candidate_vectors[remaining] @ candidate_vectors[selected].T, axis=1)
+            else:
+                redundancy = np.zeros(len(remaining))
+            scores = self.mmr_lambda * relevance[remaining] - (1 - self.mmr_lambda) * redundancy
+            best = remaining[int(np.argmax(scores))]
+            remaining.remove(best)
+            if used + tokens[best] > self.token_budget:
+                # Too big for what is left; a smaller chunk may still fit
+                continue
+            selected.append(best)
+            used += tokens[best]
+
+        if not selected:
+            # Never send an empty context: keep the start of the most relevant chunk
+            return [self._truncate(candidates[int(np.argmax(relevance))])]
+        return [candidates[i] for i in selected]
+
+    def _truncate(self, doc: Document) -> Document:
+        """Longest prefix of doc within token_budget (binary search, as count_tokens may be any tokenizer)"""
+        low, high = 0, len(doc.page_content)
+        while low < high:
+            middle = (low + high + 1) // 2
+            if self.count_tokens(doc.page_content[:middle]) <= self.token_budget:
+                low = middle
+            else:
+                high = middle - 1
+        return Document(page_content=doc.page_content[:low], metadata=dict(doc.metadata, truncated=True), id=doc.id)
@@ -0,0 +1,151 @@
+import os
+import re
+import logging
+import threading
+from collections import deque
+from typing import Callable, List, Optional
+
+TOKENIZER_REPO = "mistralai/Mistral-7B-Instruct-v0.2"
+
+_counter_lock = threading.Lock()
+_token_counter: Optional[Callable[[str], int]] = None
+
+
+def _approximate_token_count(text: str) -> int:
+    """Word-piece estimate used only when no tokenizer can be loaded"""
+    return len(re.findall(r"\w+|[^\w\s]", text)) * 4 // 3
+
+
+def get_token_counter() -> Callable[[str], int]:
+    """Token counter for the chat model's tokenizer (loaded once per process)"""
+    global _token_counter
+    with _counter_lock:
+        if _token_counter is None:
+            try:
+                from tokenizers import Tokenizer
+                tokenizer = Tokenizer.from_pretrained(TOKENIZER_REPO, token=os.getenv("HUGGINGFACEHUB_API_TOKEN"))
+                _token_counter = lambda text: len(tokenizer.encode(text, add_special_tokens=False).ids)
+            except Exception as e:
+                logging.warning(f"Could not load {TOKENIZER_REPO} tokenizer, estimating token counts: {e}")
+                _token_counter = _approximate_token_count
+        return _token_counter
+
+
+def extractive_summarizer(summary: str, messages: List[dict]) -> str:
+    """Fold messages into the summary by keeping the first sentence of each"""
+    lines = [summary] if summary else []
+    for message in messages:
+        first_sentence = re.split(r"(?<=[.!?])\s", message['content'].strip(), maxsplit=1)[0]
+        lines.append(f"{message['role']}: {first_sentence[:300]}")
+    return "\n".join(lines)
+
+
+def llm_summarizer(llm) -> Callable[[str, List[dict]], str]:
+    """Summarizer that asks the chat model to update the running summary"""
+    def summarize(summary: str, messages: List[dict]) -> str:
+        transcript = "\n".join(f"{m['role']}: {m['content']}" for m in messages)
+        prompt = ("Update the summary of a conversation about a document with the new turns. "
+                  "Keep names, facts and open questions; answer with the summary only.\n\n"
+                  f"Current summary:\n{summary or 'None'}\n\nNew turns:\n{transcript}\n\nUpdated summary:")
+        result = llm.invoke(prompt)
+        return getattr(result, "content", result).strip()
+    return summarize
+
+
+class ConversationMemory:
+    """
+    Bounded conversation history for one chat.
+
+    Recent messages live in a ring buffer that is kept within token_budget; messages
+    pushed out of it are folded into a rolling summary at that moment, so the summary
+    is updated incrementally instead of being rebuilt every turn.
+    """
+
+    def __init__(self, max_messages: int = 12, token_budget: int = 1024, summary_token_budget: int = 256,
+                 max_message_chars: int = 8000, count_tokens: Optional[Callable[[str], int]] = None,
+                 summarizer: Optional[Callable[[str, List[dict]], str]] = None):
+        self.max_messages = max_messages
+        self.token_budget = token_budget
+        self.summary_token_budget = summary_token_budget
+        self.max_message_chars = max_message_chars
+        self.count_tokens = count_tokens or get_token_counter()
+        self.summarizer = summarizer or extractive_summarizer
+        self.messages = deque()
+        self.summary = ""
+        self.summary_tokens = 0
+        self._buffer_tokens = 0
+
+    def append(self, role: str, content: str):
+        """Add a message, folding the oldest ones into the summary when over budget"""
+        content = content[:self.max_message_chars]
+        tokens = self.count_tokens(f"{role}: {content}")
+        # A single message may use at most half the budget
+        limit = self.token_budget // 2
+        if tokens > limit:
+            content = content[:int(len(content) * limit / tokens)]
+            tokens = self.count_tokens(f"{role}: {content}")
+        self.messages.append({'role': role, 'content': content, 'tokens': tokens})
+        self._buffer_tokens += tokens
+
+        # Folding can grow the summary, so re-check the budget afterwards
+        while True:
+            evicted = []
+            while len(self.messages) > 1 and (
+                    len(self.messages) > self.max_messages or
+                    self._buffer_tokens + self.summary_tokens > self.token_budget):
+                message = self.messages.popleft()
+                self._buffer_tokens -= message['tokens']
+                evicted.append(message)
+            if not evicted:
+                break
+            self._fold(evicted)
+
+    def _fold(self, messages: List[dict]):
+        try:
+            summary = self.summarizer(self.summary, messages)
+        except Exception as e:
+            logging.error(f"Error summarizing conversation, falling back to extractive summary: {e}")
+            summary = extractive_summarizer(self.summary, messages)
+
+        # Keep the most recent part of the summary within its budget
+        tokens = self.count_tokens(summary)
+        while tokens > self.summary_token_budget and "\n" in summary:
+            summary = summary.split("\n", 1)[1]
+            tokens = self.count_tokens(summary)
+        if tokens > self.summary_token_budget:
+            summary = summary[-self.summary_token_budget * 3:]
+            tokens = self.count_tokens(summary)
+        self.summary, self.summary_tokens = summary, tokens
+
+    def format(self) -> str:
+        """Prompt text for the summary plus the recent messages"""
+        if not self.messages and not self.summary:
+            return "No previous interaction."
+        parts = []
+        if self.summary:
+            parts.append(f"Summary of earlier conversation:\n{self.summary}")
+        parts.extend(f"{m['role']}: {m['content']}" for m in self.messages)
+        return "\n".join(parts)
+
+    def token_count(self) -> int:
+        return self._buffer_tokens + self.summary_tokens
+
+    def as_list(self) -> List[dict]:
+        return [{'role': m['role'], 'content': m['content']} for m in self.messages]
+
+    def state(self) -> dict:
+        """JSON-serializable snapshot, e.g. to keep a session on disk between requests"""
+        return {'messages': list(self.messages), 'summary': self.summary, 'summary_tokens': self.summary_tokens}
+
+    def restore(self, state: dict):
+        """Load a snapshot taken with state()"""
+        self.messages = deque(dict(m) for m in state.get('messages', []))
+        self._buffer_tokens = sum(m['tokens'] for m in self.messages)
+        self.summary = state.get('summary', "")
+        self.summary_tokens = state.get('summary_tokens', 0)
+
+    def clear(self):
+        self.messages.clear()
+        self.summary = ""
+        self.summary_tokens = 0
+        self._buffer_tokens = 0
@@ -1,33 +1,194 @@
-from langchain_community.document_loaders import PyPDFLoader, TextLoader
-from langchain_community.document_loaders.word_document import Docx2txtLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_chroma import Chroma
-import tempfile
+from langchain_core.documents import Document
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
+from multiprocessing import shared_memory
+import multiprocessing
+import io
+import hashlib
+import time
 import os
 from dotenv import load_dotenv
+from pdf_extraction import BufferReader, SharedPdf, count_pdf_pages, extract_pdf_pages
+from embedding_registry import (get_embeddings, get_multi_process_embeddings, set_torch_threads, embedding_model_id,
+                                DEFAULT_BATCH_SIZE, DEFAULT_TORCH_THREADS, DEFAULT_EMBED_WORKERS, DEFAULT_ENGINE)
+from embedding_cache import get_cached_embeddings
+from collection_registry import get_collection_registry, file_content_hash, collection_name_for
+from lexical_index import SegmentBuilder, get_lexical_index
+from text_cache import get_text_cache
+from token_splitter import TokenTextSplitter, DEFAULT_CHUNK_TOKENS, DEFAULT_OVERLAP_TOKENS, MAX_CHUNK_TOKENS
+from metrics import get_metrics
 
 load_dotenv()
 
+# "characters": RecursiveCharacterTextSplitter, chunk_size/chunk_overlap in characters;
+# "tokens": TokenTextSplitter, chunk_size/chunk_overlap in embedding model tokens
+SPLITTERS = ("characters", "tokens")
+DEFAULT_SPLITTER = os.getenv("DOCUCHAT_SPLITTER", "characters")
+# (chunk_size, chunk_overlap) used when the processor is not given them
+SPLITTER_DEFAULTS = {
+    "characters": (1000, 100),
+    "tokens": (DEFAULT_CHUNK_TOKENS, DEFAULT_OVERLAP_TOKENS),
+}
+
+# TXT/DOCX text is chunked and embedded in blocks of this many characters (each counted as a page)
+TEXT_BATCH_CHARS = 32 * 1024
+
+
+def resolve_source(source):
+    """
+    A file path (str) or a zero-copy memoryview for a document source:
+    a path, bytes/bytearray/memoryview, or a file-like object such as a Streamlit upload.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        return os.fspath(source)
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return memoryview(source)
+    if hasattr(source, "getbuffer"):
+        # BytesIO (and Streamlit's UploadedFile) expose their contents without a copy
+        return source.getbuffer()
+    name = getattr(source, "name", None)
+    if isinstance(name, str) and os.path.isfile(name):
+        return name
+    if hasattr(source, "read"):
+        source.seek(0)
+        return memoryview(source.read())
+    raise TypeError(f"Unsupported document source: {type(source).__name__}")
+
+
+def _text_blocks(read):
+    """Yield text blocks of about TEXT_BATCH_CHARS, cut after a newline where possible"""
+    pending = ""
+    while True:
+        data = read(TEXT_BATCH_CHARS)
+        pending += data
+        while len(pending) >= TEXT_BATCH_CHARS or (not data and pending):
+            if len(pending) <= TEXT_BATCH_CHARS:
+                cut = len(pending)
+            else:
+                cut = pending.rfind("\n", 0, TEXT_BATCH_CHARS) + 1 or TEXT_BATCH_CHARS
+            yield pending[:cut]
+            pending = pending[cut:]
+        if not data:
+            return
+
+
+def _pdf_documents(source_label, total_pages, start, pages):
+    return [
+        Document(page_content=text, metadata={
+            'source': source_label,
+            'total_pages': total_pages,
+            'page': start + offset,
+            'page_label': label
+        })
+        for offset, (label, text) in enumerate(pages)
+    ]
+
+
+def _text_documents(source_label, start, texts):
+    return [Document(page_content=text, metadata={'source': source_label, 'page': start + offset})
+            for offset, text in enumerate(texts)]
+
+
+def _string_reader(text):
+    position = 0
+
+    def read(size):
+        nonlocal position
+        data = text[position:position + size]
+        position += len(data)
+        return data
+    return read
+
+
 class DocumentProcessor:
-    def __init__(self, chunk_size=1000, chunk_overlap=100):
-        self.chunk_size = chunk_size
-        self.chunk_overlap = chunk_overlap
-        # Use HuggingFace embeddings instead of Google to avoid async issues
-        self.embeddings = HuggingFaceEmbeddings(
-            model_name="all-MiniLM-L6-v2",
-            model_kwargs={'device': 'cpu'},
-            encode_kwargs={'normalize_embeddings': True}
-        )
-        self.text_splitter = RecursiveCharacterTextSplitter(
+    def __init__(self, chunk_size=None, chunk_overlap=None, use_embedding_cache=True, persist_dir="chroma_db",
+                 batch_pages=32, pdf_workers=None, embeddings=None, vector_backend=None,
+                 embed_batch_size=DEFAULT_BATCH_SIZE, torch_threads=DEFAULT_TORCH_THREADS,
+                 embed_workers=DEFAULT_EMBED_WORKERS, embedding_engine=DEFAULT_ENGINE, use_text_cache=True,
+                 text_cache_dir=None, splitter=DEFAULT_SPLITTER):
+        if splitter not in SPLITTERS:
+            raise ValueError(f"Unknown splitter {splitter!r}; expected one of {', '.join(SPLITTERS)}")
+        # Sizes are in characters or in model tokens depending on the splitter
+        default_size, default_overlap = SPLITTER_DEFAULTS[splitter]
+        self.chunk_size = chunk_size if chunk_size is not None else default_size
+        self.chunk_overlap = chunk_overlap if chunk_overlap is not None else default_overlap
+        self.splitter = splitter
+        # Pages are parsed, chunked, embedded and stored batch by batch,
+        # so peak memory depends on batch_pages rather than document size
+        self.batch_pages = batch_pages
+        self.pdf_workers = pdf_workers if pdf_workers is not None else min(4, os.cpu_count() or 1)
+        # Use HuggingFace embeddings instead of Google to avoid async issues.
+        # The model is loaded once per process and shared by every processor;
+        # the cache means chunks seen before (re-uploads, boilerplate) are not re-encoded.
+        # It is loaded on first use, so opening a processor (e.g. to list files) imports no ML code.
+        self._embeddings = embeddings
+        self._embedding_options = {
+            'use_cache': use_embedding_cache,
+            'batch_size': embed_batch_size,
+            'torch_threads': torch_threads,
+            'workers': embed_workers,
+            'engine': embedding_engine
+        }
+        self.text_splitter = self._make_splitter(self.chunk_size, self.chunk_overlap)
+        # vector_backend "chroma" or "numpy"; defaults to DOCUCHAT_VECTOR_BACKEND
+        self.collections = get_collection_registry(persist_dir, vector_backend)
+        # Extracted PDF/DOCX text is cached by content hash, so re-chunking a file (other chunk
+        # settings, or after a crash) does not parse it again
+        text_cache_dir = text_cache_dir or os.getenv("DOCUCHAT_TEXT_CACHE_DIR") or os.path.join(persist_dir, "parsed_text")
+        self.text_cache = get_text_cache(text_cache_dir) if use_text_cache else None
+
+    def _make_splitter(self, chunk_size, chunk_overlap):
+        # start_index lets the context packer merge overlapping neighbours
+        if self.splitter == "tokens":
+            if chunk_size > MAX_CHUNK_TOKENS:
+                raise ValueError(f"chunk_size ({chunk_size}) is in tokens with the token splitter and must be "
+                                 f"at most {MAX_CHUNK_TOKENS}, or the embedding model truncates chunks")
+            return TokenTextSplitter(chunk_size, chunk_overlap)
+        return RecursiveCharacterTextSplitter(
             chunk_size=chunk_size,
-            chunk_overlap=chunk_overlap
+            chunk_overlap=chunk_overlap,
+            add_start_index=True
         )
     
-    def load_document(self, file_path):
-        """Load document based on file extension"""
+    def _splitter_key(self):
+        """Splitter part of collection names; a host without the model tokenizer chunks differently"""
+        if self.splitter == "tokens" and self.text_splitter.tokenizer_name != "model":
+            return f"tokens-{self.text_splitter.tokenizer_name}"
+        return self.splitter
+    
+    @property
+    def embeddings(self):
+        if self._embeddings is None:
+            # Throughput controls: encode batch size, torch intra-op threads (process-wide),
+            # and workers > 1 for a multi-process pool on large batches.
+            # ONNX engines never import torch and size their own threads at load time.
+            options = self._embedding_options
+            if options['engine'] == "torch":
+                if options['torch_threads']:
+                    set_torch_threads(options['torch_threads'])
+                if options['workers'] > 1:
+                    base = get_multi_process_embeddings(options['workers'], batch_size=options['batch_size'])
+                else:
+                    base = get_embeddings(batch_size=options['batch_size'], engine="torch")
+            else:
+                base = get_embeddings(batch_size=options['batch_size'], engine=options['engine'])
+            if options['use_cache']:
+                base = get_cached_embeddings(embedding_model_id(engine=options['engine']), base=base)
+            self._embeddings = base
+        return self._embeddings
+    
+    def load_document(self, file_path, file_name=None):
+        """Load document based on file extension (in-memory sources need file_name for the extension)"""
+        source = resolve_source(file_path)
+        if not isinstance(source, str):
+            return [document for documents, _ in self.iter_document_batches(source, file_name)
+                    for document in documents]
         file_extension = os.path.splitext(file_path)[1].lower()
-        
+        # Loaders are imported on demand to keep module import (and app startup) fast
+        from langchain_community.document_loaders import PyPDFLoader, TextLoader
+        from langchain_community.document_loaders.word_document import Docx2txtLoader
+
         if file_extension == '.pdf':
             loader = PyPDFLoader(file_path)
         elif file_extension == '.txt':
@@ -39,42 +200,401 @@ class DocumentProcessor:
         
         return loader.load()
     
-    def process_document(self, file_path):
-        """Process document and create vector store"""
+    def iter_document_batches(self, file_path, file_name=None, content_hash=None):
+        """
+        Lazily yield (documents, total_pages) in batches of at most batch_pages pages.
+        file_path may also be bytes, a memoryview or a file-like upload (then file_name gives the type);
+        buffers are read in place, never copied to a temp file.
+        PDF text extraction runs in a process pool when the document spans several batches.
+        PDF/DOCX pages are read from the text cache when present and written to it otherwise
+        (content_hash is computed if not given).
+        """
+        source = resolve_source(file_path)
+        if file_name is None and not isinstance(source, str):
+            raise ValueError("file_name is required for in-memory documents")
+        label = file_name or source
+        file_extension = os.path.splitext(label)[1].lower()
+        
+        if file_extension == '.txt':
+            # Plain text is as fast to re-read as the cache, so it is not cached
+            if isinstance(source, str):
+                size = os.path.getsize(source)
+                stream = open(source, encoding="utf-8")
+            else:
+                size = source.nbytes
+                stream = io.TextIOWrapper(io.BufferedReader(BufferReader(source)), encoding="utf-8")
+            with stream:
+                yield from self._iter_text_batches(stream.read, size, label)
+            return
+        if file_extension not in ['.pdf', '.docx', '.doc']:
+            raise ValueError(f"Unsupported file type: {file_extension}")
+        
+        entry = None
+        if self.text_cache is not None:
+            content_hash = content_hash or file_content_hash(source)
+            entry = self.text_cache.lookup(content_hash)
+            if entry is not None and entry.complete:
+                yield from self._iter_cached_batches(entry, label, file_extension == '.pdf')
+                return
+        
+        if file_extension == '.pdf':
+            yield from self._iter_pdf_batches(source, label, content_hash, entry)
+            return
+        import docx2txt
+        text = docx2txt.process(source if isinstance(source, str) else BufferReader(source))
+        if self.text_cache is None:
+            yield from self._iter_text_batches(_string_reader(text), len(text), label)
+            return
+        # DOCX text is extracted in one go: cache it whole, then yield it in batches
+        blocks = list(_text_blocks(_string_reader(text)))
+        writer = self.text_cache.writer(content_hash, len(blocks))
+        if writer is not None:
+            try:
+                writer.append([(None, block) for block in blocks])
+                writer.finish()
+            finally:
+                writer.close()
+        for start in range(0, len(blocks), self.batch_pages):
+            yield _text_documents(label, start, blocks[start:start + self.batch_pages]), len(blocks)
+    
+    def _iter_cached_batches(self, entry, label, is_pdf):
+        for start, pages in entry.iter_pages(self.batch_pages):
+            if is_pdf:
+                yield _pdf_documents(label, entry.total_pages, start, pages), entry.total_pages
+            else:
+                yield _text_documents(label, start, [text for _, text in pages]), entry.total_pages
+    
+    def _iter_text_batches(self, read, size, label):
+        estimated_pages = size // TEXT_BATCH_CHARS + 1
+        batch = []
+        pages = 0
+        for text in _text_blocks(read):
+            batch.append(text)
+            pages += 1
+            if len(batch) >= self.batch_pages:
+                yield _text_documents(label, pages - len(batch), batch), max(estimated_pages, pages)
+                batch = []
+        if batch:
+            yield _text_documents(label, pages - len(batch), batch), pages
+    
+    def _iter_pdf_batches(self, source, source_label, content_hash=None, entry=None):
+        """Extract PDF pages, resuming after the pages of a partial cache entry and caching the rest"""
+        total_pages = count_pdf_pages(source)
+        writer = None
+        if content_hash is not None and self.text_cache is not None:
+            if entry is not None and entry.total_pages != total_pages:
+                entry = None
+            writer = self.text_cache.writer(content_hash, total_pages, entry)
         try:
-            # Load document
-            documents = self.load_document(file_path)
-            
-            # Split into chunks
-            chunks = self.text_splitter.split_documents(documents)
-            
-            # Use a persistent directory for the embeddings
-            persist_dir = "chroma_db"
-            
-            # Clear previous vector store to avoid duplicates/mixing documents
-            import shutil
-            if os.path.exists(persist_dir):
-                shutil.rmtree(persist_dir)
-            
-            # Create vector store
-            vectorstore = Chroma.from_documents(
-                documents=chunks,
-                embedding=self.embeddings,
-                persist_directory=persist_dir
-            )
-            
+            first_page = 0
+            if writer is not None and entry is not None:
+                yield from self._iter_cached_batches(entry, source_label, True)
+                first_page = entry.pages
+            for start, pages in self._iter_pdf_pages(source, total_pages, first_page):
+                if writer is not None:
+                    writer.append(pages)
+                yield _pdf_documents(source_label, total_pages, start, pages), total_pages
+            if writer is not None:
+                writer.finish()
+        finally:
+            if writer is not None:
+                writer.close()
+    
+    def _iter_pdf_pages(self, source, total_pages, first_page=0):
+        """Yield (start, [(page_label, text)]) for pages first_page onward, batch by batch"""
+        ranges = [(start, min(start + self.batch_pages, total_pages))
+                  for start in range(first_page, total_pages, self.batch_pages)]
+        
+        if self.pdf_workers <= 1 or len(ranges) < 2:
+            for start, end in ranges:
+                yield start, extract_pdf_pages(source, start, end)
+            return
+        
+        block = None
+        if not isinstance(source, str):
+            # Workers read an in-memory upload from one shared copy instead of a pickled copy each
+            block = shared_memory.SharedMemory(create=True, size=source.nbytes)
+            block.buf[:source.nbytes] = source
+            pool_source = SharedPdf(block.name, source.nbytes)
+        else:
+            pool_source = source
+        
+        # Keep at most two batches per worker in flight to bound memory
+        pool = ProcessPoolExecutor(max_workers=self.pdf_workers,
+                                   mp_context=multiprocessing.get_context("spawn"))
+        try:
+            remaining = iter(ranges)
+            pending = deque()
+            for start, end in remaining:
+                pending.append((start, pool.submit(extract_pdf_pages, pool_source, start, end)))
+                if len(pending) >= self.pdf_workers * 2:
+                    break
+            while pending:
+                start, future = pending.popleft()
+                pages = future.result()
+                next_range = next(remaining, None)
+                if next_range:
+                    pending.append((next_range[0], pool.submit(extract_pdf_pages, pool_source, *next_range)))
+                yield start, pages
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+            if block is not None:
+                block.close()
+                block.unlink()
+    
+    def rechunk(self, content_hash, file_name, chunk_size=None, chunk_overlap=None):
+        """
+        Chunks of a cached PDF/DOCX with other chunk settings, read only from the text cache
+        (for comparing chunking strategies). Raises KeyError if the document is not fully cached.
+        """
+        entry = self.text_cache.get(content_hash) if self.text_cache is not None else None
+        if entry is None or not entry.complete:
+            raise KeyError(f"{content_hash} is not in the text cache")
+        splitter = self._make_splitter(chunk_size or self.chunk_size,
+                                       self.chunk_overlap if chunk_overlap is None else chunk_overlap)
+        is_pdf = os.path.splitext(file_name)[1].lower() == '.pdf'
+        return [chunk for documents, _ in self._iter_cached_batches(entry, file_name, is_pdf)
+                for chunk in splitter.split_documents(documents)]
+    
+    def get_lexical_index(self, collection_name):
+        """BM25 index stored next to the collection"""
+        return get_lexical_index(self.collections.lexical_path(collection_name))
+    
+    def _ensure_lexical_index(self, vectorstore, collection_name):
+        """Build the lexical index from stored chunks for collections indexed before it existed"""
+        lexical_index = self.get_lexical_index(collection_name)
+        if lexical_index.num_docs == 0 and vectorstore.count():
+            builder = SegmentBuilder()
+            for doc_id, text, metadata in vectorstore.get_chunks():
+                builder.add(doc_id, text, metadata.get('file_name', ""))
+            lexical_index.add_segment(builder)
+        return lexical_index
+    
+    def _index_file(self, vectorstore, file_path, id_prefix, extra_metadata=None, progress_callback=None,
+                    lexical_index=None, file_name=None, content_hash=None):
+        """Stream a file into vectorstore (and the lexical index) batch by batch; returns (pages, chunks)"""
+        pages_done = 0
+        chunks_done = 0
+        lexical_builder = SegmentBuilder()
+        metrics = get_metrics()
+        file_start = time.perf_counter()
+        batches = self.iter_document_batches(file_path, file_name, content_hash)
+        try:
+            while True:
+                # Load: parse the next batch of pages
+                start = time.perf_counter()
+                batch = next(batches, None)
+                if batch is None:
+                    break
+                documents, total_pages = batch
+                metrics.observe("load", time.perf_counter() - start)
+
+                # Split this batch into chunks
+                start = time.perf_counter()
+                chunks = self.text_splitter.split_documents(documents)
+                metrics.observe("split", time.perf_counter() - start)
+                
+                # Embed and store; stable IDs make a repeated build idempotent
+                if chunks:
+                    if extra_metadata:
+                        for chunk in chunks:
+                            chunk.metadata.update(extra_metadata)
+                    ids = [f"{id_prefix}-{chunks_done + i}" for i in range(len(chunks))]
+                    texts = [chunk.page_content for chunk in chunks]
+                    metadatas = [chunk.metadata for chunk in chunks]
+                    if hasattr(vectorstore, "add_vectors"):
+                        start = time.perf_counter()
+                        vectors = self.embeddings.embed_documents(texts)
+                        metrics.observe("embed", time.perf_counter() - start)
+                        start = time.perf_counter()
+                        vectorstore.add_vectors(texts, vectors, metadatas, ids)
+                        metrics.observe("store", time.perf_counter() - start)
+                    else:
+                        vectorstore.add_texts(texts, metadatas, ids=ids)
+                    for chunk_id, chunk in zip(ids, chunks):
+                        lexical_builder.add(chunk_id, chunk.page_content, chunk.metadata.get('file_name', ""))
+                pages_done += len(documents)
+                chunks_done += len(chunks)
+                metrics.increment("pages", len(documents))
+                metrics.increment("chunks", len(chunks))
+                if progress_callback:
+                    progress_callback(pages_done, total_pages, chunks_done)
+        except BaseException:
+            # Failed or cancelled part-way: drop the chunks already stored
+            if chunks_done:
+                vectorstore.delete(ids=[f"{id_prefix}-{i}" for i in range(chunks_done)])
+            raise
+        finally:
+            # Stops the PDF workers and frees the shared memory and text cache lock now, not at garbage collection
+            batches.close()
+        
+        # Same chunks, one lexical segment per file
+        if lexical_index is not None:
+            lexical_index.add_segment(lexical_builder)
+        metrics.observe("ingest_total", time.perf_counter() - file_start)
+        metrics.increment("files")
+        return pages_done, chunks_done
+    
+    def process_document(self, file_path, progress_callback=None, file_name=None):
+        """
+        Process document into its own collection, reusing it if already indexed.
+        file_path may be a path, bytes/memoryview or a file-like upload (pass file_name for in-memory sources).
+        progress_callback(pages_done, total_pages, chunks_done) is called after each stored batch.
+        """
+        try:
+            source = resolve_source(file_path)
+            file_path = file_name or source
+            # Each document gets its own collection keyed by content hash (and chunk settings),
+            # so concurrent sessions never touch each other's index
+            content_hash = file_content_hash(source)
+            collection_name = collection_name_for(content_hash, self.chunk_size, self.chunk_overlap,
+                                                  self._splitter_key())
+
+            with self.collections.build_lock(collection_name):
+                entry = self.collections.get(collection_name)
+                if entry:
+                    # Already indexed: reopen instead of re-embedding
+                    vectorstore = self.collections.open_collection(collection_name, self.embeddings)
+                    if vectorstore.count() == entry['chunks']:
+                        self.collections.touch(collection_name)
+                        self._ensure_lexical_index(vectorstore, collection_name)
+                        if progress_callback:
+                            progress_callback(entry['pages'], entry['pages'], entry['chunks'])
+                        doc_info = {
+                            'pages': entry['pages'],
+                            'chunks': entry['chunks'],
+                            'file_path': file_path,
+                            'storage': collection_name,
+                            'reused': True
+                        }
+                        return vectorstore, doc_info
+                    # Partial or missing collection (e.g. crash mid-build): rebuild it
+                    self.collections.delete(collection_name)
+
+                vectorstore = self.collections.open_collection(collection_name, self.embeddings)
+                pages_done, chunks_done = self._index_file(
+                    vectorstore, source, collection_name, progress_callback=progress_callback,
+                    lexical_index=self.get_lexical_index(collection_name), file_name=file_name,
+                    content_hash=content_hash
+                )
+
+                self.collections.register(collection_name, {
+                    'pages': pages_done,
+                    'chunks': chunks_done
+                })
+
             # Document information
             doc_info = {
-                'pages': len(documents),
-                'chunks': len(chunks),
+                'pages': pages_done,
+                'chunks': chunks_done,
                 'file_path': file_path,
-                'storage': persist_dir
+                'storage': collection_name,
+                'reused': False
             }
-            
+
             return vectorstore, doc_info
-            
+
         except Exception as e:
             raise Exception(f"Error processing document: {str(e)}")
+
+    def open_corpus(self, corpus_id):
+        """Open (or create) the collection holding every file attached to a chat"""
+        collection_name = f"corpus_{corpus_id}"
+        self.collections.ensure(collection_name, {'pages': 0, 'chunks': 0, 'files': {}})
+        return self.collections.open_collection(collection_name, self.embeddings)
+    
+    def release_corpus(self, corpus_id):
+        """Let this process drop its cached vectors and lexical index for a corpus (kept on disk)"""
+        self.collections.release(f"corpus_{corpus_id}")
+    
+    def _file_chunk_prefix(self, file_name, content_hash):
+        return hashlib.sha256(f"{file_name}|{content_hash}".encode("utf-8")).hexdigest()[:24]
+    
+    def add_file(self, corpus_id, file_path, file_name=None, progress_callback=None):
+        """
+        Add a file to a corpus, touching only that file's chunks.
+        Re-adding an unchanged file is a no-op; a changed file is re-indexed.
+        file_path may also be bytes, a memoryview or a file-like upload, read without a temp file.
+        Returns the corpus doc_info.
+        """
+        try:
+            source = resolve_source(file_path)
+            if file_name is None and not isinstance(source, str):
+                raise ValueError("file_name is required for in-memory documents")
+            file_name = file_name or os.path.basename(source)
+            collection_name = f"corpus_{corpus_id}"
+            vectorstore = self.open_corpus(corpus_id)
+            content_hash = file_content_hash(source)
+            
+            with self.collections.build_lock(collection_name):
+                files = self.collections.get(collection_name)['files']
+                existing = files.get(file_name)
+                if existing and existing['hash'] == content_hash:
+                    if progress_callback:
+                        progress_callback(existing['pages'], existing['pages'], existing['chunks'])
+                    return self.get_corpus_info(corpus_id)
+                if existing:
+                    # Changed file: drop only its old chunks
+                    self._delete_file_chunks(vectorstore, collection_name, file_name, existing)
+                    del files[file_name]
+                    self._save_corpus(collection_name, files)
+                
+                prefix = self._file_chunk_prefix(file_name, content_hash)
+                pages, chunks = self._index_file(
+                    vectorstore, source, prefix,
+                    extra_metadata={'file_name': file_name, 'file_hash': content_hash},
+                    progress_callback=progress_callback,
+                    lexical_index=self.get_lexical_index(collection_name), file_name=file_name,
+                    content_hash=content_hash
+                )
+                files[file_name] = {'hash': content_hash, 'pages': pages, 'chunks': chunks}
+                self._save_corpus(collection_name, files)
+            
+            return self.get_corpus_info(corpus_id)
+            
+        except Exception as e:
+            raise Exception(f"Error adding document: {str(e)}")
+    
+    def reindex_file(self, corpus_id, file_path, file_name=None, progress_callback=None):
+        """Re-index a file whose contents changed (unchanged files are skipped)"""
+        return self.add_file(corpus_id, file_path, file_name, progress_callback)
+    
+    def remove_file(self, corpus_id, file_name):
+        """Remove one file's chunks from a corpus; returns the corpus doc_info"""
+        collection_name = f"corpus_{corpus_id}"
+        vectorstore = self.open_corpus(corpus_id)
+        with self.collections.build_lock(collection_name):
+            files = self.collections.get(collection_name)['files']
+            existing = files.pop(file_name, None)
+            if existing:
+                self._delete_file_chunks(vectorstore, collection_name, file_name, existing)
+                self._save_corpus(collection_name, files)
+        return self.get_corpus_info(corpus_id)
+    
+    def _delete_file_chunks(self, vectorstore, collection_name, file_name, file_entry):
+        prefix = self._file_chunk_prefix(file_name, file_entry['hash'])
+        if file_entry['chunks']:
+            ids = [f"{prefix}-{i}" for i in range(file_entry['chunks'])]
+            vectorstore.delete(ids=ids)
+            self.get_lexical_index(collection_name).remove(ids)
+    
+    def _save_corpus(self, collection_name, files):
+        self.collections.update(collection_name, {
+            'pages': sum(f['pages'] for f in files.values()),
+            'chunks': sum(f['chunks'] for f in files.values()),
+            'files': files
+        })
+    
+    def get_corpus_info(self, corpus_id):
+        """doc_info for a corpus: totals plus per-file pages and chunks"""
+        collection_name = f"corpus_{corpus_id}"
+        entry = self.collections.get(collection_name) or {'pages': 0, 'chunks': 0, 'files': {}}
+        return {
+            'pages': entry['pages'],
+            'chunks': entry['chunks'],
+            'files': entry['files'],
+            'storage': collection_name
+        }
     
     def get_document_stats(self, documents, chunks):
         """Get document statistics"""
@@ -86,4 +606,15 @@ class DocumentProcessor:
             'total_chunks': len(chunks),
             'total_characters': total_chars,
             'avg_chunk_size': int(avg_chunk_size)
-        }
\ No newline at end of file
+        }
+
+
+def processor_from_env(**kwargs):
+    """
+    DocumentProcessor with chunk settings from DOCUCHAT_CHUNK_SIZE / DOCUCHAT_CHUNK_OVERLAP
+    (in embedding model tokens with DOCUCHAT_SPLITTER=tokens), shared by the UI and the API.
+    Parsed text is cached, so changing the chunk settings re-chunks without re-parsing files.
+    """
+    defaults = SPLITTER_DEFAULTS[kwargs.get('splitter', DEFAULT_SPLITTER)]
+    return DocumentProcessor(chunk_size=int(os.getenv("DOCUCHAT_CHUNK_SIZE", defaults[0])),
+                             chunk_overlap=int(os.getenv("DOCUCHAT_CHUNK_OVERLAP", defaults[1])), **kwargs)
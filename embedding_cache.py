@@ -0,0 +1,253 @@
+import os
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from typing import Dict, List, Optional
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from embedding_registry import DEFAULT_MODEL_NAME, get_embeddings
+from file_lock import FileLock
+
+DEFAULT_CACHE_DIR = os.getenv("DOCUCHAT_EMBEDDING_CACHE_DIR", "embedding_cache")
+DEFAULT_MAX_ENTRIES = int(os.getenv("DOCUCHAT_EMBEDDING_CACHE_MAX_ENTRIES", "100000"))
+
+
+def embedding_key(model_name: str, normalize: bool, text: str) -> str:
+    """Content address of a chunk embedding"""
+    digest = hashlib.sha256()
+    digest.update(model_name.encode("utf-8"))
+    digest.update(b"\0" + (b"1" if normalize else b"0") + b"\0")
+    digest.update(text.encode("utf-8"))
+    return digest.hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Persistent, size-bounded store of float32 embeddings.
+
+    Vectors live in a fixed-capacity memory-mapped matrix (vectors.f32); a SQLite index
+    (index.sqlite3) maps each content key to its row with a last-used time, so a batch
+    only writes its own rows and the least recently used rows are reused when full.
+    Every access holds a lock file, so worker processes sharing the directory never hand
+    out the same row twice or read a row while another process rewrites it.
+    """
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.db_path = os.path.join(cache_dir, "index.sqlite3")
+        self.vectors_path = os.path.join(cache_dir, "vectors.f32")
+        self.dim: Optional[int] = None
+        self._vectors: Optional[np.memmap] = None
+        # Bumped in the index whenever a process (re)creates vectors.f32
+        self._generation = 0
+        self._lock = FileLock(os.path.join(cache_dir, "cache.lock"))
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        os.makedirs(cache_dir, exist_ok=True)
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS slots (
+                key TEXT PRIMARY KEY,
+                slot INTEGER NOT NULL,
+                last_used REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS slots_last_used ON slots (last_used)")
+        self._conn.commit()
+        with self._lock:
+            self._open_store()
+
+    def _meta(self) -> Dict[str, int]:
+        return dict(self._conn.execute("SELECT name, value FROM meta").fetchall())
+
+    def _set_meta(self, **values):
+        self._conn.executemany("INSERT OR REPLACE INTO meta VALUES (?, ?)", list(values.items()))
+
+    def _open_store(self):
+        """Reopen an existing cache, discarding it if the layout no longer matches"""
+        meta = self._meta()
+        self._generation = meta.get('generation', 0)
+        self.dim, self._vectors = None, None
+        if 'dim' not in meta:
+            return
+        expected_size = meta['dim'] * self.max_entries * 4
+        if meta.get('max_entries') != self.max_entries or not os.path.exists(self.vectors_path) or \
+                os.path.getsize(self.vectors_path) != expected_size:
+            logging.info("Embedding cache layout changed, starting a new cache")
+            self._reset()
+            self._conn.commit()
+            return
+        self.dim = meta['dim']
+        self._vectors = np.memmap(self.vectors_path, dtype=np.float32, mode="r+",
+                                  shape=(self.max_entries, self.dim))
+
+    def _reset(self):
+        self._conn.execute("DELETE FROM slots")
+        self._conn.execute("DELETE FROM meta WHERE name != 'generation'")
+        self.dim = None
+        self._vectors = None
+
+    def _sync(self) -> Dict[str, int]:
+        """Reopen the matrix if another process recreated it; returns the index metadata"""
+        meta = self._meta()
+        if meta.get('generation', 0) != self._generation or (self._vectors is None and 'dim' in meta):
+            self._open_store()
+            meta = self._meta()
+        return meta
+
+    def _create_store(self, dim: int):
+        """Allocate the memory-mapped matrix once the embedding width is known"""
+        generation = self._meta().get('generation', 0) + 1
+        self._reset()
+        self._vectors = np.memmap(self.vectors_path, dtype=np.float32, mode="w+",
+                                  shape=(self.max_entries, dim))
+        self.dim = dim
+        self._generation = generation
+        self._set_meta(dim=dim, max_entries=self.max_entries, next_slot=0, generation=generation)
+
+    def _lookup(self, keys: List[str]) -> Dict[str, int]:
+        slots = {}
+        unique = list(dict.fromkeys(keys))
+        # Stay under SQLite's bound-parameter limit
+        for i in range(0, len(unique), 500):
+            part = unique[i:i + 500]
+            slots.update(self._conn.execute(
+                f"SELECT key, slot FROM slots WHERE key IN ({','.join('?' * len(part))})", part
+            ).fetchall())
+        return slots
+
+    def get_many(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        """Return cached vectors for the keys that are present"""
+        found = {}
+        with self._lock:
+            self._sync()
+            slots = self._lookup(keys) if self._vectors is not None else {}
+            for key in keys:
+                slot = slots.get(key)
+                if slot is None:
+                    self.misses += 1
+                    continue
+                found[key] = np.array(self._vectors[slot])
+                self.hits += 1
+            if found:
+                now = time.time()
+                self._conn.executemany("UPDATE slots SET last_used = ? WHERE key = ?",
+                                       [(now, key) for key in found])
+                self._conn.commit()
+        return found
+
+    def put_many(self, keys: List[str], vectors: np.ndarray):
+        """Store vectors, reusing the least recently used rows when full"""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if len(keys) == 0:
+            return
+        with self._lock:
+            self._sync()
+            if self._vectors is None or self.dim != vectors.shape[1]:
+                self._create_store(vectors.shape[1])
+            slots = self._lookup(keys)
+            next_slot = self._meta()['next_slot']
+            now = time.time()
+            for key, vector in zip(keys, vectors):
+                slot = slots.get(key)
+                if slot is None:
+                    if next_slot < self.max_entries:
+                        slot, next_slot = next_slot, next_slot + 1
+                    else:
+                        evicted, slot = self._conn.execute(
+                            "SELECT key, slot FROM slots ORDER BY last_used LIMIT 1").fetchone()
+                        self._conn.execute("DELETE FROM slots WHERE key = ?", (evicted,))
+                        self.evictions += 1
+                    slots[key] = slot
+                self._vectors[slot] = vector
+                self._conn.execute("INSERT OR REPLACE INTO slots VALUES (?, ?, ?)", (key, slot, now))
+            self._set_meta(next_slot=next_slot)
+            # Vectors reach the file before the index points at them
+            self._vectors.flush()
+            self._conn.commit()
+
+    def clear(self):
+        """Remove every cached vector and reset the counters"""
+        with self._lock:
+            self._sync()
+            self._conn.execute("DELETE FROM slots")
+            if self._vectors is not None:
+                self._set_meta(next_slot=0)
+            self._conn.commit()
+            self.hits = self.misses = self.evictions = 0
+
+    def get_stats(self) -> dict:
+        """Hit/miss counters and occupancy"""
+        lookups = self.hits + self.misses
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM slots").fetchone()[0]
+        return {
+            'entries': entries,
+            'max_entries': self.max_entries,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper that only sends cache misses to the underlying model"""
+
+    def __init__(self, base: Embeddings, cache: EmbeddingCache, model_name: str = DEFAULT_MODEL_NAME,
+                 normalize: bool = True):
+        self.base = base
+        self.cache = cache
+        self.model_name = model_name
+        self.normalize = normalize
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [embedding_key(self.model_name, self.normalize, text) for text in texts]
+        found = self.cache.get_many(keys)
+
+        # Encode each distinct missing text once, even if repeated in this batch
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in missing:
+                missing[key] = text
+        if missing:
+            new_vectors = np.asarray(self.base.embed_documents(list(missing.values())), dtype=np.float32)
+            self.cache.put_many(list(missing.keys()), new_vectors)
+            found.update(zip(missing.keys(), new_vectors))
+
+        return [found[key].tolist() for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.base.embed_query(text)
+
+
+_shared_lock = threading.Lock()
+_shared: Dict[tuple, CachedEmbeddings] = {}
+_caches: Dict[str, EmbeddingCache] = {}
+
+
+def get_cached_embeddings(model_name: str = DEFAULT_MODEL_NAME, normalize: bool = True,
+                          cache_dir: str = DEFAULT_CACHE_DIR, base: Optional[Embeddings] = None) -> CachedEmbeddings:
+    """
+    Return the process-wide cached wrapper around the shared embedding model.
+    base overrides the model (e.g. a tuned batch size or worker pool); the cache files stay shared.
+    """
+    base = base or get_embeddings(model_name, normalize)
+    key = (model_name, normalize, cache_dir, id(base))
+    with _shared_lock:
+        if key not in _shared:
+            if cache_dir not in _caches:
+                _caches[cache_dir] = EmbeddingCache(cache_dir)
+            _shared[key] = CachedEmbeddings(
+                base=base,
+                cache=_caches[cache_dir],
+                model_name=model_name,
+                normalize=normalize
+            )
+        return _shared[key]
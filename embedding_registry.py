@@ -0,0 +1,254 @@
+import os
+import time
+import atexit
+import logging
+import threading
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+from langchain_core.embeddings import Embeddings
+
+if TYPE_CHECKING:
+    from langchain_huggingface import HuggingFaceEmbeddings
+
+DEFAULT_MODEL_NAME = "all-MiniLM-L6-v2"
+# Throughput defaults, tunable per host (see benchmarks/bench_embedding_throughput.py)
+DEFAULT_BATCH_SIZE = int(os.getenv("DOCUCHAT_EMBED_BATCH_SIZE", "32"))
+DEFAULT_TORCH_THREADS = int(os.getenv("DOCUCHAT_TORCH_THREADS", "0")) or None
+DEFAULT_EMBED_WORKERS = int(os.getenv("DOCUCHAT_EMBED_WORKERS", "0"))
+# "torch" (sentence-transformers), or "onnx" / "onnx-int8" to run the exported graph on onnxruntime
+# (see benchmarks/bench_onnx_embeddings.py)
+EMBEDDING_ENGINES = ("torch", "onnx", "onnx-int8")
+DEFAULT_ENGINE = os.getenv("DOCUCHAT_EMBEDDING_ENGINE", "torch")
+
+# Process-wide registry: one embedding model per (model_name, normalize, engine) key,
+# shared by every DocumentProcessor and every Streamlit session in this process.
+_lock = threading.Lock()
+_models: Dict[Tuple[str, bool, str], Embeddings] = {}
+_stats: Dict[Tuple[str, bool, str], dict] = {}
+_batch_views: Dict[Tuple[str, bool, str, int], Embeddings] = {}
+
+
+def resident_memory_mb() -> Optional[float]:
+    """Return the current resident set size of this process in MB (None if unknown)"""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / (1024 * 1024)
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/statm") as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def embedding_model_id(model_name: str = DEFAULT_MODEL_NAME, engine: str = DEFAULT_ENGINE) -> str:
+    """Identifier for cached vectors: engines produce slightly different vectors, so they do not share entries"""
+    return model_name if engine == "torch" else f"{model_name}@{engine}"
+
+
+def get_embeddings(model_name: str = DEFAULT_MODEL_NAME, normalize: bool = True,
+                   batch_size: Optional[int] = None, engine: str = DEFAULT_ENGINE) -> Embeddings:
+    """
+    Return the shared embedding model, loading it on first use.
+    With batch_size, returns a view of the same loaded model that encodes in batches of that size.
+    """
+    model = _get_shared_model(model_name, normalize, engine)
+    current = model.batch_size if engine != "torch" else model.encode_kwargs.get('batch_size')
+    if not batch_size or batch_size == current:
+        return model
+    key = (model_name, normalize, engine, batch_size)
+    with _lock:
+        if key not in _batch_views:
+            # Shallow copy: the model weights (or ONNX session) stay shared
+            if engine != "torch":
+                _batch_views[key] = model.with_batch_size(batch_size)
+            else:
+                _batch_views[key] = model.model_copy(
+                    update={'encode_kwargs': {**model.encode_kwargs, 'batch_size': batch_size}}
+                )
+        return _batch_views[key]
+
+
+def _load_model(model_name: str, normalize: bool, engine: str) -> Embeddings:
+    if engine == "torch":
+        # Imported here: langchain_huggingface pulls in sentence-transformers and torch
+        from langchain_huggingface import HuggingFaceEmbeddings
+        return HuggingFaceEmbeddings(
+            model_name=model_name,
+            model_kwargs={'device': 'cpu'},
+            encode_kwargs={'normalize_embeddings': normalize, 'batch_size': DEFAULT_BATCH_SIZE}
+        )
+    if engine not in EMBEDDING_ENGINES:
+        raise ValueError(f"Unknown embedding engine '{engine}', expected one of {', '.join(EMBEDDING_ENGINES)}")
+    from onnx_embeddings import OnnxEmbeddings
+    return OnnxEmbeddings(model_name, variant=engine, normalize=normalize,
+                          batch_size=DEFAULT_BATCH_SIZE, threads=DEFAULT_TORCH_THREADS)
+
+
+def _get_shared_model(model_name: str, normalize: bool, engine: str = DEFAULT_ENGINE) -> Embeddings:
+    key = (model_name, normalize, engine)
+    model = _models.get(key)
+    if model is not None:
+        # += on a shared dict is not atomic: concurrent sessions would lose counts
+        with _lock:
+            _stats[key]["requests"] += 1
+        return model
+
+    with _lock:
+        # Another thread may have finished loading while we waited
+        model = _models.get(key)
+        if model is not None:
+            _stats[key]["requests"] += 1
+            return model
+
+        rss_before = resident_memory_mb()
+        start = time.perf_counter()
+        model = _load_model(model_name, normalize, engine)
+        load_seconds = time.perf_counter() - start
+        rss_after = resident_memory_mb()
+
+        _stats[key] = {
+            'model_name': model_name,
+            'normalize': normalize,
+            'engine': engine,
+            'load_seconds': round(load_seconds, 3),
+            'rss_before_mb': rss_before,
+            'rss_after_mb': rss_after,
+            'rss_delta_mb': (rss_after - rss_before) if rss_before is not None and rss_after is not None else None,
+            'loaded_at': time.time(),
+            'requests': 1
+        }
+        _models[key] = model
+        logging.info(f"Loaded embedding model {model_name} ({engine}) in {load_seconds:.2f}s")
+        return model
+
+
+def set_torch_threads(num_threads: Optional[int]) -> int:
+    """Set torch's intra-op thread count for this process (None keeps the current value)"""
+    import torch
+    if num_threads:
+        torch.set_num_threads(num_threads)
+    return torch.get_num_threads()
+
+
+def _pool_worker(threads: int, *worker_args):
+    """Entry point of a spawned embedding worker: size its own thread pool, then serve encode requests"""
+    from sentence_transformers import SentenceTransformer
+    os.environ["OMP_NUM_THREADS"] = str(threads)
+    set_torch_threads(threads)
+    SentenceTransformer._encode_multi_process_worker(*worker_args)
+
+
+def _start_worker_pool(model, workers: int, threads: int) -> dict:
+    """
+    SentenceTransformer.start_multi_process_pool on CPU, with the thread count handed to each
+    worker instead of set in this process's environment (which request threads share)
+    """
+    import multiprocessing
+    model.to("cpu")
+    model.share_memory()
+    context = multiprocessing.get_context("spawn")
+    input_queue, output_queue = context.Queue(), context.Queue()
+    processes = []
+    for _ in range(workers):
+        process = context.Process(target=_pool_worker, args=(threads, "cpu", model, input_queue, output_queue),
+                                  daemon=True)
+        process.start()
+        processes.append(process)
+    return {'input': input_queue, 'output': output_queue, 'processes': processes}
+
+
+class MultiProcessEmbeddings(Embeddings):
+    """
+    Encodes large batches on a persistent sentence-transformers process pool.
+
+    Each worker holds its own copy of the model and gets cpu_count // workers torch threads;
+    small batches and queries are encoded in-process by the shared model.
+    """
+
+    def __init__(self, base: "HuggingFaceEmbeddings", workers: int, batch_size: int = DEFAULT_BATCH_SIZE):
+        self.base = base
+        self.workers = workers
+        self.batch_size = batch_size
+        # Below this many texts the pool's inter-process overhead is not worth it
+        self.min_pool_texts = workers * batch_size
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                # Workers together use the cores once rather than each sizing itself to all of them
+                threads = max(1, (os.cpu_count() or 1) // self.workers)
+                self._pool = _start_worker_pool(self.base._client, self.workers, threads)
+                logging.info(f"Started {self.workers} embedding worker processes ({threads} threads each)")
+            return self._pool
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if len(texts) < self.min_pool_texts:
+            return self.base.embed_documents(texts)
+        texts = [text.replace("\n", " ") for text in texts]
+        vectors = self.base._client.encode_multi_process(
+            texts, self._get_pool(), batch_size=self.batch_size,
+            chunk_size=-(-len(texts) // self.workers),
+            normalize_embeddings=self.base.encode_kwargs.get('normalize_embeddings', False)
+        )
+        return vectors.tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.base.embed_query(text)
+
+    def close(self):
+        with self._lock:
+            if self._pool is not None:
+                self.base._client.stop_multi_process_pool(self._pool)
+                self._pool = None
+
+
+_pools: Dict[tuple, MultiProcessEmbeddings] = {}
+
+
+def get_multi_process_embeddings(workers: int, model_name: str = DEFAULT_MODEL_NAME, normalize: bool = True,
+                                 batch_size: int = DEFAULT_BATCH_SIZE) -> MultiProcessEmbeddings:
+    """Return the process-wide worker pool wrapper for a model (started on the first large batch)"""
+    key = (model_name, normalize, workers, batch_size)
+    with _lock:
+        pool = _pools.get(key)
+    if pool is None:
+        base = get_embeddings(model_name, normalize, batch_size, engine="torch")
+        with _lock:
+            pool = _pools.setdefault(key, MultiProcessEmbeddings(base, workers, batch_size))
+    return pool
+
+
+@atexit.register
+def _stop_pools():
+    for pool in list(_pools.values()):
+        pool.close()
+
+
+def warm_up(model_name: str = DEFAULT_MODEL_NAME, normalize: bool = True, engine: str = DEFAULT_ENGINE) -> dict:
+    """Load the model and run one encode so the first real request is fast"""
+    model = _get_shared_model(model_name, normalize, engine)
+    model.embed_query("warm up")
+    return _stats[(model_name, normalize, engine)]
+
+
+def get_registry_stats() -> dict:
+    """Load-time and memory metrics for every model held by the registry"""
+    return {
+        'models_loaded': len(_models),
+        'rss_mb': resident_memory_mb(),
+        'models': [dict(stats) for stats in _stats.values()]
+    }
+
+
+def clear_registry():
+    """Drop all loaded models (mainly for tests)"""
+    _stop_pools()
+    with _lock:
+        _pools.clear()
+        _batch_views.clear()
+        _models.clear()
+        _stats.clear()
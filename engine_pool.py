@@ -0,0 +1,180 @@
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+from chatbot_engine import ChatbotEngine
+
+# Conversations idle this long are dropped, and the oldest ones go first when the process
+# holds more than DOCUCHAT_MAX_SESSIONS or their history exceeds DOCUCHAT_SESSION_MEMORY_MB
+DEFAULT_MAX_SESSIONS = int(os.getenv("DOCUCHAT_MAX_SESSIONS", "1000"))
+DEFAULT_SESSION_TTL_SECONDS = float(os.getenv("DOCUCHAT_SESSION_TTL_MINUTES", "60")) * 60
+DEFAULT_MEMORY_BUDGET_MB = float(os.getenv("DOCUCHAT_SESSION_MEMORY_MB", "256"))
+# Shared engines kept for corpora no session currently uses
+DEFAULT_MAX_IDLE_ENGINES = int(os.getenv("DOCUCHAT_MAX_IDLE_ENGINES", "16"))
+# Rough cost of a session beyond its message text (engine view, memory object, dicts)
+SESSION_OVERHEAD_BYTES = 4096
+
+
+def session_bytes(engine: ChatbotEngine) -> int:
+    """Estimated memory held by one conversation"""
+    memory = engine.memory
+    return SESSION_OVERHEAD_BYTES + len(memory.summary) + sum(len(m['content']) + 200 for m in memory.messages)
+
+
+class EnginePool:
+    """
+    One shared ChatbotEngine per corpus, with lightweight per-session views on top.
+
+    The shared engine holds the read-only parts (vector store, lexical index, LLM client,
+    answer cache, prompt); a session only adds its conversation memory, file filter and last answer
+    details (see ChatbotEngine.for_session). Sessions are kept in least-recently-used order and
+    evicted when idle past the TTL or when the process exceeds max_sessions or memory_budget_mb.
+    A corpus whose last session is gone keeps its engine until max_idle_engines is exceeded, then
+    release(corpus_id) lets its caches go.
+    """
+
+    def __init__(self, build_engine: Callable[[str], ChatbotEngine], release: Optional[Callable[[str], None]] = None,
+                 max_sessions: int = DEFAULT_MAX_SESSIONS, ttl_seconds: float = DEFAULT_SESSION_TTL_SECONDS,
+                 memory_budget_mb: float = DEFAULT_MEMORY_BUDGET_MB, max_idle_engines: int = DEFAULT_MAX_IDLE_ENGINES):
+        self.build_engine = build_engine
+        self.release = release
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.memory_budget_bytes = int(memory_budget_mb * 1024 * 1024)
+        self.max_idle_engines = max_idle_engines
+        self._lock = threading.RLock()
+        # corpus_id -> shared engine, least recently used first
+        self._engines: "OrderedDict[str, ChatbotEngine]" = OrderedDict()
+        # session_id -> [corpus_id, session view, last used], least recently used first
+        self._sessions: "OrderedDict[str, list]" = OrderedDict()
+        self._session_counts: Dict[str, int] = {}
+        self._evicted = 0
+
+    def shared(self, corpus_id: str) -> ChatbotEngine:
+        """The corpus's shared engine, built on first use; answer through for_session() views"""
+        with self._lock:
+            engine = self._engines.get(corpus_id)
+            if engine is None:
+                engine = self.build_engine(corpus_id)
+                self._engines[corpus_id] = engine
+                self._trim_engines(keep=corpus_id)
+            else:
+                self._engines.move_to_end(corpus_id)
+            return engine
+
+    def session(self, session_id: str, corpus_id: Optional[str] = None) -> ChatbotEngine:
+        """The session's engine view (a new conversation if it was evicted or never existed)"""
+        corpus_id = corpus_id or session_id
+        now = time.time()
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is not None and entry[0] != corpus_id:
+                self._remove(session_id)
+                entry = None
+            if entry is None:
+                entry = [corpus_id, self.shared(corpus_id).for_session(), now]
+                self._sessions[session_id] = entry
+                self._session_counts[corpus_id] = self._session_counts.get(corpus_id, 0) + 1
+            else:
+                entry[2] = now
+                self._sessions.move_to_end(session_id)
+                self._engines.move_to_end(corpus_id)
+            self.collect(now, keep=session_id)
+            return entry[1]
+
+    def drop_session(self, session_id: str):
+        """Forget a conversation, e.g. when the user starts a new chat"""
+        with self._lock:
+            self._remove(session_id)
+            self._trim_engines()
+
+    def drop_corpus(self, corpus_id: str):
+        """Forget a corpus's engine and its sessions, e.g. after the corpus was deleted"""
+        with self._lock:
+            for session_id in [s for s, entry in self._sessions.items() if entry[0] == corpus_id]:
+                self._remove(session_id)
+            if self._engines.pop(corpus_id, None) is not None:
+                self._release(corpus_id)
+
+    def collect(self, now: Optional[float] = None, keep: Optional[str] = None) -> List[str]:
+        """Evict idle sessions, then the least recently used ones over the count or memory budget"""
+        now = now or time.time()
+        evicted = []
+        with self._lock:
+            # Oldest first, so only the front of the queue needs checking
+            while self._sessions:
+                session_id, entry = next(iter(self._sessions.items()))
+                if session_id == keep or now - entry[2] <= self.ttl_seconds:
+                    break
+                evicted.append(session_id)
+                self._remove(session_id)
+            while len(self._sessions) > max(self.max_sessions, 1):
+                session_id = next(iter(self._sessions))
+                if session_id == keep:
+                    self._sessions.move_to_end(session_id)
+                    session_id = next(iter(self._sessions))
+                evicted.append(session_id)
+                self._remove(session_id)
+            total = sum(session_bytes(entry[1]) for entry in self._sessions.values())
+            for session_id in list(self._sessions):
+                if total <= self.memory_budget_bytes:
+                    break
+                if session_id == keep:
+                    continue
+                total -= session_bytes(self._sessions[session_id][1])
+                evicted.append(session_id)
+                self._remove(session_id)
+            self._evicted += len(evicted)
+            self._trim_engines()
+        return evicted
+
+    def _remove(self, session_id: str):
+        entry = self._sessions.pop(session_id, None)
+        if entry is not None:
+            corpus_id = entry[0]
+            self._session_counts[corpus_id] -= 1
+            if not self._session_counts[corpus_id]:
+                del self._session_counts[corpus_id]
+
+    def _trim_engines(self, keep: Optional[str] = None):
+        idle = [corpus_id for corpus_id in self._engines
+                if corpus_id not in self._session_counts and corpus_id != keep]
+        for corpus_id in idle[:max(len(idle) - self.max_idle_engines, 0)]:
+            del self._engines[corpus_id]
+            self._release(corpus_id)
+
+    def _release(self, corpus_id: str):
+        if self.release is None:
+            return
+        try:
+            self.release(corpus_id)
+        except Exception as e:
+            logging.error(f"Error releasing corpus {corpus_id}: {e}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'sessions': len(self._sessions),
+                'engines': len(self._engines),
+                'session_memory_mb': round(sum(session_bytes(entry[1]) for entry in self._sessions.values())
+                                           / (1024 * 1024), 2),
+                'evicted_sessions': self._evicted,
+            }
+
+
+_pool: Optional[EnginePool] = None
+_pool_lock = threading.Lock()
+
+
+def get_engine_pool(build_engine: Optional[Callable[[str], ChatbotEngine]] = None,
+                    release: Optional[Callable[[str], None]] = None) -> EnginePool:
+    """Process-wide pool; the first caller supplies how engines are built and released"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            if build_engine is None:
+                raise ValueError("build_engine is required to create the engine pool")
+            _pool = EnginePool(build_engine, release)
+        return _pool
@@ -0,0 +1,42 @@
+import time
+from typing import Any, Iterator, List, Optional
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+
+class FakeStreamingChatModel(BaseChatModel):
+    """
+    Local chat model that streams a canned answer word by word.
+
+    Used instead of the Hugging Face endpoint for offline tests and benchmarks;
+    the delays simulate model latency so time-to-first-token can be measured.
+    """
+
+    response: str = "This is a canned answer from the local fake model."
+    first_token_delay: float = 0.0
+    token_delay: float = 0.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-streaming-chat"
+
+    def _tokens(self) -> List[str]:
+        words = self.response.split(" ")
+        return [word if i == 0 else " " + word for i, word in enumerate(words)]
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager=None, **kwargs: Any) -> ChatResult:
+        time.sleep(self.first_token_delay + self.token_delay * len(self._tokens()))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self.response))])
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager=None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        time.sleep(self.first_token_delay)
+        for i, token in enumerate(self._tokens()):
+            if i:
+                time.sleep(self.token_delay)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager:
+                run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
@@ -0,0 +1,200 @@
+import os
+import time
+import uuid
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+from collection_registry import file_content_hash
+from document_processor import resolve_source
+
+DEFAULT_WORKERS = int(os.getenv("DOCUCHAT_INGEST_WORKERS", "2"))
+# Finished jobs stay visible to status polling for this long
+FINISHED_JOB_TTL_SECONDS = 3600
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+ACTIVE_STATES = (QUEUED, RUNNING)
+
+
+class IngestionCancelled(Exception):
+    """Raised inside a running job once cancellation is requested"""
+
+
+class IngestionJob:
+    """One file being added to a corpus, with progress readable from any thread"""
+
+    def __init__(self, corpus_id: str, source, file_name: str, content_hash: str, owns_file: bool,
+                 on_update: Optional[Callable[["IngestionJob"], None]] = None):
+        self.job_id = uuid.uuid4().hex
+        self.corpus_id = corpus_id
+        # A path, or an in-memory upload that is released once the job finishes
+        self.source = source
+        self.file_name = file_name
+        self.content_hash = content_hash
+        self.owns_file = owns_file
+        self.status = QUEUED
+        self.pages_done = 0
+        self.total_pages = 0
+        self.chunks_done = 0
+        self.error: Optional[str] = None
+        self.doc_info: Optional[dict] = None
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.future = None
+        # Called (on the worker thread) whenever status or progress changes, e.g. to persist it
+        self.on_update = on_update
+        self._cancel = threading.Event()
+
+    @property
+    def progress(self) -> float:
+        if self.status == DONE:
+            return 1.0
+        return self.pages_done / self.total_pages if self.total_pages else 0.0
+
+    @property
+    def active(self) -> bool:
+        return self.status in ACTIVE_STATES
+
+    def cancel(self):
+        """Stop the job; a queued job never starts, a running one stops after its current batch"""
+        self._cancel.set()
+        if self.future is not None and self.future.cancel():
+            self._finish(CANCELLED)
+
+    def _notify(self):
+        if self.on_update is None:
+            return
+        try:
+            self.on_update(self)
+        except Exception as e:
+            logging.error(f"Error in update callback of ingestion job {self.job_id}: {e}")
+
+    def _on_progress(self, pages_done, total_pages, chunks_done):
+        self.pages_done, self.total_pages, self.chunks_done = pages_done, total_pages, chunks_done
+        self._notify()
+        if self._cancel.is_set():
+            raise IngestionCancelled(self.job_id)
+
+    def _finish(self, status: str, error: Optional[str] = None):
+        self.status = status
+        self.error = error
+        self.finished_at = time.time()
+        if self.owns_file and os.path.exists(self.source):
+            os.unlink(self.source)
+        self.source = None
+        self._notify()
+
+    def to_dict(self) -> dict:
+        return {
+            'job_id': self.job_id,
+            'corpus_id': self.corpus_id,
+            'file_name': self.file_name,
+            'status': self.status,
+            'progress': round(self.progress, 4),
+            'pages_done': self.pages_done,
+            'total_pages': self.total_pages,
+            'chunks_done': self.chunks_done,
+            'error': self.error
+        }
+
+
+class IngestionQueue:
+    """
+    Runs DocumentProcessor.add_file jobs on a bounded worker pool.
+
+    Chunks are stored batch by batch, so a corpus can be queried while its files are
+    still embedding. Submitting a file that is already queued or running for the same
+    corpus (same content hash) returns the existing job instead of indexing it twice.
+    """
+
+    def __init__(self, max_workers: int = DEFAULT_WORKERS):
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ingest")
+        self._jobs: Dict[str, IngestionJob] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, processor, corpus_id: str, source, file_name: Optional[str] = None,
+               owns_file: bool = False, on_update: Optional[Callable[[IngestionJob], None]] = None) -> IngestionJob:
+        """
+        Queue a file for indexing into a corpus.
+        source is a path or an in-memory upload (bytes, memoryview, file-like; file_name required).
+        With owns_file the job deletes the source path once it is finished (e.g. a temp file).
+        on_update(job) is called on every status and progress change of a new job.
+        """
+        source = resolve_source(source)
+        if file_name is None and not isinstance(source, str):
+            raise ValueError("file_name is required for in-memory documents")
+        file_name = file_name or os.path.basename(source)
+        content_hash = file_content_hash(source)
+        with self._lock:
+            self._purge_finished()
+            for job in self._jobs.values():
+                if job.active and job.corpus_id == corpus_id and job.content_hash == content_hash:
+                    if owns_file:
+                        os.unlink(source)
+                    return job
+            job = IngestionJob(corpus_id, source, file_name, content_hash, owns_file, on_update)
+            self._jobs[job.job_id] = job
+            job._notify()
+            job.future = self._executor.submit(self._run, processor, job)
+            return job
+
+    def _run(self, processor, job: IngestionJob):
+        if job._cancel.is_set():
+            job._finish(CANCELLED)
+            return
+        job.status = RUNNING
+        job._notify()
+        try:
+            job.doc_info = processor.add_file(job.corpus_id, job.source, job.file_name,
+                                              progress_callback=job._on_progress)
+            job._finish(DONE)
+        except Exception as e:
+            if job._cancel.is_set():
+                job._finish(CANCELLED)
+            else:
+                logging.error(f"Error ingesting {job.file_name}: {e}")
+                job._finish(FAILED, str(e))
+
+    def get(self, job_id: str) -> Optional[IngestionJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def jobs_for(self, corpus_id: str) -> List[IngestionJob]:
+        """Jobs of a corpus, oldest first"""
+        with self._lock:
+            return sorted((job for job in self._jobs.values() if job.corpus_id == corpus_id),
+                          key=lambda job: job.created_at)
+
+    def cancel(self, job_id: str) -> bool:
+        job = self.get(job_id)
+        if job is None or not job.active:
+            return False
+        job.cancel()
+        return True
+
+    def _purge_finished(self):
+        cutoff = time.time() - FINISHED_JOB_TTL_SECONDS
+        for job_id in [job_id for job_id, job in self._jobs.items()
+                       if job.finished_at is not None and job.finished_at < cutoff]:
+            del self._jobs[job_id]
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait)
+
+
+_queue: Optional[IngestionQueue] = None
+_queue_lock = threading.Lock()
+
+
+def get_ingestion_queue() -> IngestionQueue:
+    """Process-wide ingestion queue shared by every session"""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = IngestionQueue()
+        return _queue
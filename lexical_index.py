@@ -0,0 +1,409 @@
+import os
+import re
+import json
+import shutil
+import logging
+import threading
+from array import array
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+
+# Keeps identifiers such as "ZX-1234", "v2.0" or "part_no" together; their parts are indexed too
+TOKEN_RE = re.compile(r"[a-z0-9]+(?:[-_./][a-z0-9]+)*")
+MAX_SEGMENTS = 8
+# Query terms whose idf is remembered until the index next changes
+MAX_CACHED_IDF = 100000
+# Terms in more than this share of a segment's documents are scored in one pass over the whole segment
+DENSE_TERM_FRACTION = 0.25
+
+
+def tokenize(text: str) -> List[str]:
+    tokens = []
+    for token in TOKEN_RE.findall(text.lower()):
+        tokens.append(token)
+        if not token.isalnum():
+            tokens.extend(part for part in re.split(r"[-_./]", token) if part)
+    return tokens
+
+
+class Segment:
+    """
+    Immutable block of the inverted index stored as flat arrays (CSR layout):
+    postings for term t are docs[offsets[t]:offsets[t + 1]] with frequencies tf[...].
+    """
+
+    def __init__(self, terms: List[str], offsets: np.ndarray, docs: np.ndarray, tf: np.ndarray,
+                 doc_lengths: np.ndarray, doc_ids: List[str], file_codes: np.ndarray, files: List[str]):
+        self.terms = terms
+        self.vocab = {term: i for i, term in enumerate(terms)}
+        self.offsets = offsets
+        self.docs = docs
+        self.tf = tf
+        self.doc_lengths = doc_lengths
+        self.doc_ids = doc_ids
+        self.file_codes = file_codes
+        self.files = files
+        self.name: Optional[str] = None
+        self.dead_rows = np.zeros(0, dtype=np.int64)
+        # Postings per term that belong to tombstoned documents (None: no tombstones)
+        self.dead_df: Optional[np.ndarray] = None
+
+    def mark_deleted(self, deleted: set):
+        """Cache the rows of tombstoned documents so search can mask them and leave them out of BM25 statistics"""
+        dead_rows = np.array([i for i, doc_id in enumerate(self.doc_ids) if doc_id in deleted], dtype=np.int64)
+        dead_df = None
+        if len(dead_rows):
+            dead = np.zeros(self.num_docs, dtype=bool)
+            dead[dead_rows] = True
+            dead_postings = np.concatenate(([0], np.cumsum(dead[self.docs])))
+            dead_df = dead_postings[self.offsets[1:]] - dead_postings[self.offsets[:-1]]
+        self.dead_rows, self.dead_df = dead_rows, dead_df
+
+    @property
+    def num_docs(self) -> int:
+        return len(self.doc_ids)
+
+    @property
+    def live_docs(self) -> int:
+        return self.num_docs - len(self.dead_rows)
+
+    def live_length(self) -> int:
+        """Total length of the documents that are not tombstoned"""
+        return int(self.doc_lengths.sum()) - int(self.doc_lengths[self.dead_rows].sum())
+
+    def document_frequency(self, term: str) -> int:
+        """Documents containing term, not counting tombstoned ones"""
+        term_id = self.vocab.get(term)
+        if term_id is None:
+            return 0
+        df = int(self.offsets[term_id + 1] - self.offsets[term_id])
+        return df if self.dead_df is None else df - int(self.dead_df[term_id])
+
+    @classmethod
+    def from_triples(cls, term_ids: np.ndarray, doc_rows: np.ndarray, freqs: np.ndarray, terms: List[str],
+                     doc_lengths: np.ndarray, doc_ids: List[str], file_codes: np.ndarray, files: List[str]):
+        """Build the CSR arrays from unsorted (term, doc, tf) triples"""
+        order = np.argsort(term_ids, kind="stable")
+        counts = np.bincount(term_ids, minlength=len(terms))
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+        # tf is stored as uint16: clip rather than wrap (BM25 has long saturated at that count)
+        tf = np.minimum(freqs[order], np.iinfo(np.uint16).max).astype(np.uint16)
+        return cls(terms, offsets, doc_rows[order].astype(np.int32), tf,
+                   doc_lengths.astype(np.int32), doc_ids, file_codes.astype(np.int32), files)
+
+    def save(self, path: str):
+        np.savez(path + ".npz", offsets=self.offsets, docs=self.docs, tf=self.tf,
+                 doc_lengths=self.doc_lengths, file_codes=self.file_codes)
+        with open(path + ".json", "w") as f:
+            json.dump({'terms': self.terms, 'doc_ids': self.doc_ids, 'files': self.files}, f)
+
+    @classmethod
+    def load(cls, path: str) -> "Segment":
+        arrays = np.load(path + ".npz")
+        with open(path + ".json") as f:
+            meta = json.load(f)
+        segment = cls(meta['terms'], arrays['offsets'], arrays['docs'], arrays['tf'], arrays['doc_lengths'],
+                      meta['doc_ids'], arrays['file_codes'], meta['files'])
+        segment.name = os.path.basename(path)
+        return segment
+
+
+class SegmentBuilder:
+    """Accumulates chunks (e.g. one file, fed batch by batch) into a Segment"""
+
+    def __init__(self):
+        self.vocab: Dict[str, int] = {}
+        # Flat int32 buffers: no per-chunk array overhead while a large file streams in
+        self.term_ids = array("i")
+        self.doc_rows = array("i")
+        self.freqs = array("i")
+        self.doc_lengths = array("i")
+        self.doc_ids: List[str] = []
+        self.file_codes = array("i")
+        self.files: Dict[str, int] = {}
+
+    def add(self, doc_id: str, text: str, file_name: str = ""):
+        counts = Counter(tokenize(text))
+        row = len(self.doc_ids)
+        self.term_ids.extend(self.vocab.setdefault(t, len(self.vocab)) for t in counts)
+        self.freqs.extend(counts.values())
+        self.doc_rows.extend([row] * len(counts))
+        self.doc_lengths.append(sum(counts.values()))
+        self.doc_ids.append(doc_id)
+        self.file_codes.append(self.files.setdefault(file_name, len(self.files)))
+
+    def build(self) -> Optional[Segment]:
+        if not self.doc_ids:
+            return None
+        terms = [None] * len(self.vocab)
+        for term, term_id in self.vocab.items():
+            terms[term_id] = term
+        return Segment.from_triples(
+            np.frombuffer(self.term_ids, dtype=np.int32), np.frombuffer(self.doc_rows, dtype=np.int32),
+            np.frombuffer(self.freqs, dtype=np.int32), terms, np.frombuffer(self.doc_lengths, dtype=np.int32),
+            self.doc_ids, np.frombuffer(self.file_codes, dtype=np.int32), list(self.files)
+        )
+
+
+def merge_segments(segments: List[Segment], deleted: set) -> Optional[Segment]:
+    """Compact several segments into one, dropping deleted documents"""
+    vocab: Dict[str, int] = {}
+    files: Dict[str, int] = {}
+    term_parts, doc_parts, tf_parts = [], [], []
+    doc_lengths, doc_ids, file_codes = [], [], []
+    for segment in segments:
+        alive = np.array([doc_id not in deleted for doc_id in segment.doc_ids], dtype=bool)
+        new_rows = np.cumsum(alive) - 1 + len(doc_ids)
+        term_map = np.array([vocab.setdefault(t, len(vocab)) for t in segment.terms], dtype=np.int32)
+        file_map = np.array([files.setdefault(f, len(files)) for f in segment.files], dtype=np.int32)
+
+        posting_terms = np.repeat(np.arange(len(segment.terms)), np.diff(segment.offsets))
+        keep = alive[segment.docs]
+        term_parts.append(term_map[posting_terms[keep]])
+        doc_parts.append(new_rows[segment.docs[keep]])
+        tf_parts.append(segment.tf[keep])
+
+        doc_lengths.extend(segment.doc_lengths[alive].tolist())
+        doc_ids.extend(doc_id for doc_id, ok in zip(segment.doc_ids, alive) if ok)
+        file_codes.extend(file_map[segment.file_codes[alive]].tolist())
+    if not doc_ids:
+        return None
+    terms = [None] * len(vocab)
+    for term, term_id in vocab.items():
+        terms[term_id] = term
+    return Segment.from_triples(np.concatenate(term_parts), np.concatenate(doc_parts), np.concatenate(tf_parts),
+                                terms, np.asarray(doc_lengths), doc_ids, np.asarray(file_codes), list(files))
+
+
+class IndexStatistics:
+    """
+    BM25 inputs for one state of the index: live document count, average length, the length
+    normalisation of every document and (filled in by queries) idf per term.
+    """
+
+    def __init__(self, segments: List[Segment], version: int, k1: float, b: float):
+        self.segments = segments
+        self.version = version
+        self.num_docs = sum(segment.live_docs for segment in segments)
+        avg_length = sum(segment.live_length() for segment in segments) / max(self.num_docs, 1) or 1.0
+        self.norms = [(k1 * (1 - b + b * segment.doc_lengths / avg_length)).astype(np.float32)
+                      for segment in segments]
+        self._idf: Dict[str, float] = {}
+
+    def idf(self, term: str) -> float:
+        """0 for terms no live document contains"""
+        value = self._idf.get(term)
+        if value is None:
+            df = sum(segment.document_frequency(term) for segment in self.segments)
+            value = float(np.log(1 + (self.num_docs - df + 0.5) / (df + 0.5))) if df > 0 else 0.0
+            if len(self._idf) < MAX_CACHED_IDF:
+                self._idf[term] = value
+        return value
+
+
+class LexicalIndex:
+    """
+    BM25 index over the chunks of one collection, persisted in its own directory.
+
+    New files are added as segments and removed documents are tombstoned; segments
+    are compacted once there are more than MAX_SEGMENTS or a quarter of the docs are deleted.
+    The manifest is re-read when another process (API worker) replaced it. BM25 statistics are
+    computed once per state of the index rather than on every query.
+    """
+
+    def __init__(self, path: str, k1: float = 1.2, b: float = 0.75):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self.segments: List[Segment] = []
+        self.deleted: set = set()
+        self._next_segment = 0
+        self._lock = threading.RLock()
+        self._manifest_stamp = None
+        # Bumped after every change, so searches rebuild their cached statistics
+        self._version = 0
+        self._statistics: Optional[IndexStatistics] = None
+        self._load()
+
+    def _manifest_path(self) -> str:
+        return os.path.join(self.path, "manifest.json")
+
+    def _stamp(self):
+        try:
+            return os.stat(self._manifest_path()).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _refresh(self):
+        if self._stamp() != self._manifest_stamp:
+            with self._lock:
+                self._load()
+
+    def _load(self):
+        manifest_path = self._manifest_path()
+        self._manifest_stamp = self._stamp()
+        if self._manifest_stamp is None:
+            self.segments, self.deleted = [], set()
+            return
+        try:
+            with open(manifest_path) as f:
+                manifest = json.load(f)
+            # Segment files are immutable, so segments already in memory are kept
+            loaded = {segment.name: segment for segment in self.segments if segment.name}
+            self.segments = [loaded.get(name) or Segment.load(os.path.join(self.path, name))
+                             for name in manifest['segments']]
+            self.deleted = set(manifest['deleted'])
+            self._next_segment = manifest['next_segment']
+            for segment in self.segments:
+                segment.mark_deleted(self.deleted)
+        except (OSError, ValueError, KeyError) as e:
+            logging.error(f"Could not load lexical index at {self.path}: {e}")
+            self.segments, self.deleted = [], set()
+            # e.g. a segment compacted away while the manifest was read: retry on next use
+            self._manifest_stamp = None
+        self._version += 1
+
+    def _save(self):
+        os.makedirs(self.path, exist_ok=True)
+        names = []
+        for segment in self.segments:
+            if segment.name is None:
+                segment.name = f"segment_{self._next_segment}"
+                self._next_segment += 1
+                segment.save(os.path.join(self.path, segment.name))
+            names.append(segment.name)
+        tmp_path = os.path.join(self.path, f"manifest.json.{os.getpid()}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump({'segments': names, 'deleted': sorted(self.deleted),
+                       'next_segment': self._next_segment}, f)
+        os.replace(tmp_path, self._manifest_path())
+        self._manifest_stamp = self._stamp()
+        self._version += 1
+        # Drop files of segments that were compacted away
+        live = set(names)
+        for file_name in os.listdir(self.path):
+            stem = file_name.rsplit(".", 1)[0]
+            if stem.startswith("segment_") and stem not in live:
+                os.remove(os.path.join(self.path, file_name))
+
+    @property
+    def num_docs(self) -> int:
+        self._refresh()
+        return self.statistics().num_docs
+
+    def statistics(self) -> IndexStatistics:
+        """Statistics of the current index state; not locked, so a search never waits for a compaction"""
+        statistics = self._statistics
+        if statistics is None or statistics.version != self._version:
+            # Version first: if a change lands in between, these statistics are rebuilt on the next call
+            version = self._version
+            statistics = IndexStatistics(self.segments, version, self.k1, self.b)
+            self._statistics = statistics
+        return statistics
+
+    def add_segment(self, builder: SegmentBuilder):
+        """Add the chunks collected by a builder"""
+        segment = builder.build()
+        if segment is None:
+            return
+        with self._lock:
+            self._refresh()
+            # Re-adding tombstoned IDs: purge the old copies first
+            self._maybe_compact(force=bool(self.deleted.intersection(segment.doc_ids)))
+            self.segments = self.segments + [segment]
+            self._maybe_compact()
+            self._save()
+
+    def remove(self, doc_ids: Iterable[str]):
+        """Tombstone documents (compaction reclaims the space)"""
+        with self._lock:
+            self._refresh()
+            self.deleted = self.deleted | set(doc_ids)
+            for segment in self.segments:
+                segment.mark_deleted(self.deleted)
+            self._maybe_compact()
+            self._save()
+
+    def _maybe_compact(self, force: bool = False):
+        total = sum(segment.num_docs for segment in self.segments)
+        if force or len(self.segments) > MAX_SEGMENTS or (total and len(self.deleted) * 4 > total):
+            merged = merge_segments(self.segments, self.deleted)
+            self.segments = [merged] if merged else []
+            self.deleted = set()
+
+    def search(self, query: str, k: int = 10, file_names: Optional[List[str]] = None) -> List[Tuple[str, float]]:
+        """Top-k (doc_id, bm25 score) for the query, optionally restricted to some files"""
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms or k <= 0:
+            return []
+        self._refresh()
+        statistics = self.statistics()
+        if not statistics.segments:
+            return []
+        idf = {term: term_idf for term in terms if (term_idf := statistics.idf(term))}
+
+        results = []
+        for segment, norm in zip(statistics.segments, statistics.norms):
+            matches = [(segment.vocab[term], term_idf) for term, term_idf in idf.items() if term in segment.vocab]
+            if not matches:
+                continue
+            scores = np.zeros(segment.num_docs, dtype=np.float32)
+            for term_id, term_idf in matches:
+                start, end = segment.offsets[term_id], segment.offsets[term_id + 1]
+                docs = segment.docs[start:end]
+                if end - start > DENSE_TERM_FRACTION * segment.num_docs:
+                    # Cheaper than gathering norm and scattering scores for most of the segment
+                    tf = np.zeros(segment.num_docs, dtype=np.float32)
+                    tf[docs] = segment.tf[start:end]
+                    scores += term_idf * tf * (self.k1 + 1) / (tf + norm)
+                else:
+                    tf = segment.tf[start:end].astype(np.float32)
+                    scores[docs] += term_idf * tf * (self.k1 + 1) / (tf + norm[docs])
+
+            if file_names is not None:
+                allowed = [i for i, name in enumerate(segment.files) if name in file_names]
+                scores[~np.isin(segment.file_codes, allowed)] = 0
+            scores[segment.dead_rows] = 0
+            candidates = np.argpartition(scores, len(scores) - k)[-k:] if len(scores) > k else np.arange(len(scores))
+            candidates = candidates[scores[candidates] > 0]
+            results.extend((segment.doc_ids[i], float(scores[i])) for i in candidates)
+
+        results.sort(key=lambda item: item[1], reverse=True)
+        return results[:k]
+
+
+def reciprocal_rank_fusion(rankings: List[List[str]], k: int = 60) -> List[str]:
+    """Fuse ranked ID lists: score(d) = sum over lists of 1 / (k + rank)"""
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, 1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores, key=scores.get, reverse=True)
+
+
+_indexes: Dict[str, LexicalIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_lexical_index(path: str) -> LexicalIndex:
+    """Process-wide LexicalIndex for a directory, so every session sees updates"""
+    path = os.path.abspath(path)
+    with _indexes_lock:
+        if path not in _indexes:
+            _indexes[path] = LexicalIndex(path)
+        return _indexes[path]
+
+
+def release_lexical_index(path: str):
+    """Drop the cached index (it is reloaded from disk on next use)"""
+    with _indexes_lock:
+        _indexes.pop(os.path.abspath(path), None)
+
+
+def delete_lexical_index(path: str):
+    path = os.path.abspath(path)
+    with _indexes_lock:
+        _indexes.pop(path, None)
+    shutil.rmtree(path, ignore_errors=True)
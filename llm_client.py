@@ -0,0 +1,373 @@
+"""
+Shared LLM client layer.
+
+Every engine in the process talks to the model through one LLMClient per backend, which adds:
+- a pooled keep-alive HTTP connection pool (one httpx.Client per base URL),
+- a process-wide concurrency cap; requests queue for a slot until their deadline,
+- a per-request deadline covering queueing, retries and streaming,
+- hedged retries: if no token arrives within hedge_after seconds a second attempt races
+  the first (only when a slot is free), and failed attempts are retried with backoff.
+
+Backends speak the OpenAI chat completions protocol, served by the Hugging Face router,
+TGI, vLLM and the local stub in llm_stub_server.py (for load tests without network).
+"""
+import os
+import json
+import time
+import queue
+import random
+import logging
+import threading
+from typing import Any, Dict, Iterator, List, Optional
+import httpx
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+LLM_BACKENDS = {
+    'huggingface': {
+        'base_url': "https://router.huggingface.co/v1",
+        'model': "mistralai/Mistral-7B-Instruct-v0.2",
+        'api_key_env': "HUGGINGFACEHUB_API_TOKEN"
+    },
+    # Any OpenAI-compatible server: TGI, vLLM, or `python llm_stub_server.py`
+    'openai': {
+        'base_url': os.getenv("DOCUCHAT_LLM_BASE_URL", "http://127.0.0.1:8089/v1"),
+        'model': "tgi",
+        'api_key_env': "DOCUCHAT_LLM_API_KEY"
+    },
+}
+DEFAULT_BACKEND = os.getenv("DOCUCHAT_LLM_BACKEND", "huggingface")
+MAX_CONCURRENCY = int(os.getenv("DOCUCHAT_LLM_MAX_CONCURRENCY", "8"))
+DEADLINE_SECONDS = float(os.getenv("DOCUCHAT_LLM_DEADLINE", "120"))
+# 0 disables hedging
+HEDGE_AFTER_SECONDS = float(os.getenv("DOCUCHAT_LLM_HEDGE_AFTER", "6")) or None
+MAX_ATTEMPTS = 3
+RETRY_BACKOFF_SECONDS = 0.5
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+_ROLES = {'human': "user", 'ai': "assistant", 'system': "system"}
+
+
+class LLMError(Exception):
+    """A failed LLM request; retryable marks errors worth another attempt"""
+
+    def __init__(self, message: str, retryable: bool = False):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+class LLMTimeout(LLMError):
+    """The request's deadline passed while queued, retrying or streaming"""
+
+
+class ConcurrencyLimiter:
+    """Process-wide cap on in-flight LLM requests; callers wait for a slot until their timeout"""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.in_flight = 0
+        self.waiting = 0
+        self._cond = threading.Condition()
+
+    def acquire(self, timeout: Optional[float] = None, blocking: bool = True) -> bool:
+        with self._cond:
+            if not blocking:
+                if self.in_flight >= self.limit:
+                    return False
+                self.in_flight += 1
+                return True
+            self.waiting += 1
+            try:
+                acquired = self._cond.wait_for(lambda: self.in_flight < self.limit, timeout)
+            finally:
+                self.waiting -= 1
+            if acquired:
+                self.in_flight += 1
+            return acquired
+
+    def release(self):
+        with self._cond:
+            self.in_flight -= 1
+            self._cond.notify()
+
+    def resize(self, limit: int):
+        with self._cond:
+            self.limit = limit
+            self._cond.notify_all()
+
+
+_lock = threading.Lock()
+_limiter = ConcurrencyLimiter(MAX_CONCURRENCY)
+_http_clients: Dict[str, httpx.Client] = {}
+_llms: Dict[str, "LLMClient"] = {}
+_stats = {'requests': 0, 'attempts': 0, 'hedges': 0, 'hedge_wins': 0, 'retries': 0, 'timeouts': 0, 'errors': 0}
+
+
+def get_llm_limiter() -> ConcurrencyLimiter:
+    return _limiter
+
+
+def get_http_client(base_url: str) -> httpx.Client:
+    """Process-wide keep-alive connection pool for a backend"""
+    with _lock:
+        client = _http_clients.get(base_url)
+        if client is None:
+            # Room for every slot plus its hedge
+            size = 2 * _limiter.limit
+            client = httpx.Client(
+                limits=httpx.Limits(max_connections=size, max_keepalive_connections=size, keepalive_expiry=60),
+                timeout=httpx.Timeout(DEADLINE_SECONDS, connect=10)
+            )
+            _http_clients[base_url] = client
+        return client
+
+
+def _count(name: str, n: int = 1):
+    with _lock:
+        _stats[name] += n
+
+
+def get_llm_stats() -> dict:
+    """Request counters plus the limiter's current load"""
+    with _lock:
+        stats = dict(_stats)
+    stats.update({'in_flight': _limiter.in_flight, 'queued': _limiter.waiting, 'max_concurrency': _limiter.limit})
+    return stats
+
+
+class _Attempt(threading.Thread):
+    """One streamed HTTP request; pushes (number, kind, value) events and releases its slot when done"""
+
+    def __init__(self, llm: "LLMClient", number: int, payload: dict, deadline_at: float, events: queue.Queue):
+        super().__init__(name=f"llm-attempt-{number}", daemon=True)
+        self.llm = llm
+        self.number = number
+        self.payload = payload
+        self.deadline_at = deadline_at
+        self.events = events
+        self.cancelled = threading.Event()
+        self.response = None
+        self._released = False
+        self._release_lock = threading.Lock()
+
+    def release(self):
+        """Give the concurrency slot back (once)"""
+        with self._release_lock:
+            if not self._released:
+                self._released = True
+                _limiter.release()
+
+    def cancel(self):
+        self.cancelled.set()
+        # A cancelled attempt stops counting against the limit even if its thread is still blocked
+        self.release()
+        response = self.response
+        if response is not None:
+            # Closing the response unblocks a read that is waiting on a stalled server
+            try:
+                response.close()
+            except Exception:
+                pass
+
+    def run(self):
+        _count('attempts')
+        try:
+            remaining = max(0.001, self.deadline_at - time.monotonic())
+            client = get_http_client(self.llm.base_url)
+            url = f"{self.llm.base_url.rstrip('/')}/chat/completions"
+            timeout = httpx.Timeout(remaining, connect=min(10, remaining))
+            with client.stream("POST", url, json=self.payload, headers=self.llm._headers(),
+                               timeout=timeout) as response:
+                self.response = response
+                if response.status_code != 200:
+                    response.read()
+                    raise _status_error(response)
+                for line in response.iter_lines():
+                    if self.cancelled.is_set():
+                        return
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[5:].strip()
+                    if data == "[DONE]":
+                        break
+                    try:
+                        choices = json.loads(data).get('choices') or [{}]
+                        text = (choices[0].get('delta') or {}).get('content')
+                    except (ValueError, LookupError, AttributeError, TypeError) as e:
+                        # Truncated or garbled event (e.g. cut by a proxy): worth another attempt
+                        raise LLMError(f"Malformed stream event from LLM backend: {data[:200]!r}",
+                                       retryable=True) from e
+                    if text:
+                        self.events.put((self.number, "chunk", text))
+            self.events.put((self.number, "done", None))
+        except Exception as e:
+            if not self.cancelled.is_set():
+                if isinstance(e, httpx.TransportError):
+                    e = LLMError(f"{type(e).__name__}: {e}", retryable=True)
+                elif not isinstance(e, LLMError):
+                    e = LLMError(f"{type(e).__name__}: {e}")
+                self.events.put((self.number, "error", e))
+        finally:
+            self.release()
+
+
+def _status_error(response) -> LLMError:
+    body = response.text[:300]
+    if response.status_code in (401, 403):
+        return LLMError(f"Authorization failed (HTTP {response.status_code}): {body}")
+    return LLMError(f"HTTP {response.status_code} from LLM backend: {body}",
+                    retryable=response.status_code in RETRYABLE_STATUS)
+
+
+class LLMClient(BaseChatModel):
+    """Chat model over an OpenAI-compatible backend, sharing the process-wide pool and limiter"""
+
+    base_url: str
+    model: str
+    api_key: Optional[str] = None
+    max_tokens: int = 1024
+    temperature: float = 0.1
+    deadline: float = DEADLINE_SECONDS
+    hedge_after: Optional[float] = HEDGE_AFTER_SECONDS
+    max_attempts: int = MAX_ATTEMPTS
+
+    @property
+    def _llm_type(self) -> str:
+        return "docuchat-openai-compatible"
+
+    def _headers(self) -> dict:
+        return {'Authorization': f"Bearer {self.api_key}"} if self.api_key else {}
+
+    def _payload(self, messages: List[BaseMessage], stop: Optional[List[str]]) -> dict:
+        payload = {
+            'model': self.model,
+            'messages': [{'role': _ROLES.get(m.type, "user"), 'content': m.content} for m in messages],
+            'max_tokens': self.max_tokens,
+            'temperature': self.temperature,
+            'stream': True
+        }
+        if stop:
+            payload['stop'] = stop
+        return payload
+
+    def stream_text(self, payload: dict) -> Iterator[str]:
+        """
+        Yield response text for one request within self.deadline.
+        Attempts race until one produces its first token; later failures are not retried
+        because part of the answer has already been returned.
+        """
+        _count('requests')
+        deadline_at = time.monotonic() + self.deadline
+        if not _limiter.acquire(timeout=self.deadline):
+            _count('timeouts')
+            raise LLMTimeout(f"No LLM slot free within {self.deadline:g}s ({_limiter.waiting} requests queued)")
+
+        events = queue.Queue()
+        attempts: Dict[int, _Attempt] = {}
+        hedges = set()
+
+        def launch():
+            attempt = _Attempt(self, len(attempts) + 1, payload, deadline_at, events)
+            attempts[attempt.number] = attempt
+            attempt.start()
+
+        launch()
+        running = 1
+        winner = None
+        hedge_at = time.monotonic() + self.hedge_after if self.hedge_after else None
+        retry_at = None
+        try:
+            while True:
+                now = time.monotonic()
+                if now >= deadline_at:
+                    _count('timeouts')
+                    raise LLMTimeout(f"LLM request exceeded its {self.deadline:g}s deadline")
+                wait = deadline_at - now
+                for at in (hedge_at if winner is None else None, retry_at):
+                    if at is not None:
+                        wait = min(wait, max(0.0, at - now))
+                try:
+                    number, kind, value = events.get(timeout=wait)
+                except queue.Empty:
+                    now = time.monotonic()
+                    if retry_at is not None and now >= retry_at:
+                        retry_at = None
+                        if not _limiter.acquire(timeout=deadline_at - now):
+                            continue
+                        _count('retries')
+                        launch()
+                        running += 1
+                    elif winner is None and hedge_at is not None and now >= hedge_at:
+                        hedge_at = None
+                        # Hedge only into spare capacity, never queue behind other sessions for it
+                        if len(attempts) < self.max_attempts and _limiter.acquire(blocking=False):
+                            _count('hedges')
+                            launch()
+                            hedges.add(len(attempts))
+                            running += 1
+                    continue
+
+                if winner is not None and number != winner:
+                    continue
+                if kind == "chunk":
+                    if winner is None:
+                        winner = number
+                        if number in hedges:
+                            _count('hedge_wins')
+                        for other in attempts.values():
+                            if other.number != winner:
+                                other.cancel()
+                    yield value
+                elif kind == "done":
+                    return
+                else:
+                    running -= 1
+                    if winner is not None:
+                        raise value
+                    if running > 0:
+                        # Another attempt is still in the race
+                        continue
+                    if not getattr(value, 'retryable', False) or len(attempts) >= self.max_attempts:
+                        raise value
+                    backoff = RETRY_BACKOFF_SECONDS * 2 ** (len(attempts) - 1)
+                    retry_at = time.monotonic() + backoff * random.uniform(0.5, 1.5)
+                    logging.error(f"LLM attempt {number} failed, retrying in {retry_at - time.monotonic():.2f}s: {value}")
+        except LLMError:
+            _count('errors')
+            raise
+        finally:
+            for attempt in attempts.values():
+                attempt.cancel()
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager=None, **kwargs: Any) -> ChatResult:
+        text = "".join(self.stream_text(self._payload(messages, stop)))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager=None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        for token in self.stream_text(self._payload(messages, stop)):
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager:
+                run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+
+
+def get_llm(backend: Optional[str] = None) -> LLMClient:
+    """Process-wide client for a backend (default from DOCUCHAT_LLM_BACKEND)"""
+    backend = backend or DEFAULT_BACKEND
+    if backend not in LLM_BACKENDS:
+        logging.error(f"Unknown LLM backend: {backend}")
+        raise ValueError(f"Unknown LLM backend {backend!r}, expected one of {sorted(LLM_BACKENDS)}")
+    with _lock:
+        llm = _llms.get(backend)
+        if llm is None:
+            config = LLM_BACKENDS[backend]
+            llm = LLMClient(
+                base_url=config['base_url'],
+                model=os.getenv("DOCUCHAT_LLM_MODEL", config['model']),
+                api_key=os.getenv(config['api_key_env'])
+            )
+            _llms[backend] = llm
+        return llm
@@ -0,0 +1,169 @@
+"""
+Local OpenAI/TGI-compatible chat completions server for load tests without network.
+
+Streams a canned answer word by word with configurable latency, and can inject
+failures (HTTP 503) and stalls so retries, hedging and deadlines can be exercised.
+
+    python llm_stub_server.py --port 8089 --ttft 0.3 --token-delay 0.02
+    DOCUCHAT_LLM_BACKEND=openai DOCUCHAT_LLM_BASE_URL=http://127.0.0.1:8089/v1 streamlit run app.py
+"""
+import sys
+import json
+import time
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_RESPONSE = ("Based on the uploaded documents, the answer is covered in the relevant section. "
+                    "This reply comes from the local stub server.")
+
+
+class StubLLMServer(ThreadingHTTPServer):
+    """
+    Serves POST /v1/chat/completions (streamed or not), GET /health and GET /stats.
+    fail_every=n answers every n-th request with 503; garble_every=n starts every n-th answer with a
+    malformed event; stall_every=n makes the 1st, (n+1)-th, ...
+    request wait stall_seconds before its first token.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address=("127.0.0.1", 8089), ttft: float = 0.2, token_delay: float = 0.01,
+                 response: str = DEFAULT_RESPONSE, fail_every: int = 0, stall_every: int = 0,
+                 stall_seconds: float = 30.0, garble_every: int = 0):
+        super().__init__(address, _StubHandler)
+        self.ttft = ttft
+        self.token_delay = token_delay
+        self.response = response
+        self.fail_every = fail_every
+        self.garble_every = garble_every
+        self.stall_every = stall_every
+        self.stall_seconds = stall_seconds
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def begin(self) -> int:
+        with self._lock:
+            self.requests += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            return self.requests
+
+    def end(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def handle_error(self, request, client_address):
+        # Clients dropping kept-alive or cancelled connections is expected
+        if not isinstance(sys.exc_info()[1], (ConnectionResetError, BrokenPipeError)):
+            super().handle_error(request, client_address)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'requests': self.requests, 'in_flight': self.in_flight, 'max_in_flight': self.max_in_flight}
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like a real inference server
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, body: dict):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _write_chunk(self, data: bytes):
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send_json(200, {'status': "ok"})
+        elif self.path == "/stats":
+            self._send_json(200, self.server.stats())
+        else:
+            self._send_json(404, {'error': "not found"})
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        if not self.path.endswith("/chat/completions"):
+            self._send_json(404, {'error': "not found"})
+            return
+        server = self.server
+        number = server.begin()
+        try:
+            if server.fail_every and number % server.fail_every == 0:
+                self._send_json(503, {'error': "stub overloaded"})
+                return
+            stall = server.stall_seconds if server.stall_every and (number - 1) % server.stall_every == 0 else 0
+            time.sleep(server.ttft + stall)
+
+            words = server.response.split(" ")[:body.get('max_tokens') or None]
+            tokens = [word if i == 0 else " " + word for i, word in enumerate(words)]
+            model = body.get('model', "stub")
+            if not body.get('stream'):
+                time.sleep(server.token_delay * len(tokens))
+                self._send_json(200, {
+                    'id': f"stub-{number}", 'object': "chat.completion", 'model': model,
+                    'choices': [{'index': 0, 'finish_reason': "stop",
+                                 'message': {'role': "assistant", 'content': "".join(tokens)}}]
+                })
+                return
+
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for i, token in enumerate(tokens):
+                if i:
+                    time.sleep(server.token_delay)
+                event = {'id': f"stub-{number}", 'object': "chat.completion.chunk", 'model': model,
+                         'choices': [{'index': 0, 'delta': {'content': token}, 'finish_reason': None}]}
+                if i == 0 and server.garble_every and number % server.garble_every == 0:
+                    self._write_chunk(b"data: {\"choices\": [\n\n")
+                self._write_chunk(f"data: {json.dumps(event)}\n\n".encode("utf-8"))
+            self._write_chunk(b"data: [DONE]\n\n")
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            # The client cancelled (e.g. a hedge lost the race)
+            self.close_connection = True
+        finally:
+            server.end()
+
+
+def start_stub_server(port: int = 0, **options) -> StubLLMServer:
+    """Start a stub server on a background thread (port 0 picks a free port); stop it with shutdown()"""
+    server = StubLLMServer(("127.0.0.1", port), **options)
+    threading.Thread(target=server.serve_forever, name="llm-stub", daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--ttft", type=float, default=0.2, help="seconds before the first token")
+    parser.add_argument("--token-delay", type=float, default=0.01, help="seconds between tokens")
+    parser.add_argument("--fail-every", type=int, default=0, help="answer every n-th request with 503")
+    parser.add_argument("--garble-every", type=int, default=0, help="start every n-th answer with a malformed event")
+    parser.add_argument("--stall-every", type=int, default=0, help="stall every n-th request")
+    parser.add_argument("--stall-seconds", type=float, default=30.0)
+    args = parser.parse_args()
+
+    server = StubLLMServer((args.host, args.port), ttft=args.ttft, token_delay=args.token_delay,
+                           fail_every=args.fail_every, stall_every=args.stall_every,
+                           stall_seconds=args.stall_seconds, garble_every=args.garble_every)
+    print(f"Stub LLM server listening on {server.base_url}")
+    server.serve_forever()
@@ -0,0 +1,222 @@
+"""
+Process-wide latency histograms and counters.
+
+Stages recorded:
+- ingestion: load, split, embed, store, ingest_total
+- answers: query_embed, search, lexical_search, pack, cache_lookup, prompt_build,
+  llm_first_token, llm, answer_total
+
+Counters include pages, chunks, questions, cache hits, errors and prompt/completion tokens.
+
+Disabled unless DOCUCHAT_METRICS=1; then observe() and increment() return after one flag check.
+Exposed as Prometheus text (render_prometheus, or an HTTP endpoint with DOCUCHAT_METRICS_PORT),
+a JSON snapshot (snapshot, or a periodic file dump with DOCUCHAT_METRICS_DUMP) and the admin panel
+in app.py.
+"""
+import os
+import json
+import time
+import bisect
+import logging
+import threading
+from typing import Dict, Optional, Tuple
+
+# Upper bounds in seconds, from sub-millisecond lookups to multi-minute ingestion
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+           120.0, 300.0)
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram (Prometheus layout)"""
+
+    def __init__(self, buckets: Tuple[float, ...] = BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimate by linear interpolation inside the bucket holding the q-th observation"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, bucket_count in enumerate(self.counts):
+            if seen + bucket_count >= rank and bucket_count:
+                lower = self.buckets[i - 1] if i else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.buckets[-1]
+                return lower + (upper - lower) * (rank - seen) / bucket_count
+            seen += bucket_count
+        return self.buckets[-1]
+
+
+class Metrics:
+    """Histograms keyed by stage and counters keyed by name, safe to update from any thread"""
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self.started_at = time.time()
+        self._histograms: Dict[str, Histogram] = {}
+        self._counters: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage: str, seconds: float):
+        if not self.enabled:
+            return
+        with self._lock:
+            histogram = self._histograms.get(stage)
+            if histogram is None:
+                histogram = self._histograms[stage] = Histogram()
+            histogram.observe(seconds)
+
+    def increment(self, name: str, amount: float = 1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    def time(self, stage: str) -> "_Timer":
+        """Context manager recording the duration of its block under stage"""
+        return _Timer(self, stage)
+
+    def snapshot(self) -> dict:
+        """JSON-friendly view: per-stage count, mean and p50/p95/p99 in milliseconds, plus counters"""
+        with self._lock:
+            stages = {}
+            for stage, histogram in sorted(self._histograms.items()):
+                stages[stage] = {
+                    'count': histogram.count,
+                    'mean_ms': round(histogram.sum / histogram.count * 1000, 3),
+                    'p50_ms': round(histogram.quantile(0.50) * 1000, 3),
+                    'p95_ms': round(histogram.quantile(0.95) * 1000, 3),
+                    'p99_ms': round(histogram.quantile(0.99) * 1000, 3),
+                }
+            counters = dict(sorted(self._counters.items()))
+        return {
+            'enabled': self.enabled,
+            'uptime_s': round(time.time() - self.started_at, 1),
+            'stages': stages,
+            'counters': counters
+        }
+
+    def render_prometheus(self) -> str:
+        """Prometheus text exposition format"""
+        lines = ["# HELP docuchat_stage_seconds Latency of each ingestion and answer stage",
+                 "# TYPE docuchat_stage_seconds histogram"]
+        with self._lock:
+            for stage, histogram in sorted(self._histograms.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(histogram.buckets + (float("inf"),), histogram.counts):
+                    cumulative += bucket_count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f'docuchat_stage_seconds_bucket{{stage="{stage}",le="{le}"}} {cumulative}')
+                lines.append(f'docuchat_stage_seconds_sum{{stage="{stage}"}} {histogram.sum}')
+                lines.append(f'docuchat_stage_seconds_count{{stage="{stage}"}} {histogram.count}')
+            for name, value in sorted(self._counters.items()):
+                lines.append(f"# TYPE docuchat_{name}_total counter")
+                lines.append(f"docuchat_{name}_total {value:g}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+            self.started_at = time.time()
+
+
+class _Timer:
+    def __init__(self, metrics: Metrics, stage: str):
+        self.metrics = metrics
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.observe(self.stage, time.perf_counter() - self.start)
+        return False
+
+
+_metrics = Metrics(enabled=os.getenv("DOCUCHAT_METRICS", "0") == "1")
+_exporters_lock = threading.Lock()
+_exporters: Dict[str, object] = {}
+
+
+def get_metrics() -> Metrics:
+    """Process-wide metrics shared by every processor, engine and session"""
+    return _metrics
+
+
+def start_json_dump(path: str, interval_seconds: float = 60.0) -> threading.Thread:
+    """Write snapshot() to path every interval (atomically replaced), once per process"""
+    with _exporters_lock:
+        if 'json' in _exporters:
+            return _exporters['json']
+
+        def dump():
+            while True:
+                time.sleep(interval_seconds)
+                try:
+                    tmp_path = f"{path}.tmp"
+                    with open(tmp_path, "w") as f:
+                        json.dump(_metrics.snapshot(), f, indent=2)
+                    os.replace(tmp_path, path)
+                except OSError as e:
+                    logging.error(f"Error writing metrics to {path}: {str(e)}")
+
+        thread = threading.Thread(target=dump, name="metrics-dump", daemon=True)
+        thread.start()
+        _exporters['json'] = thread
+        return thread
+
+
+def start_http_exporter(port: int, host: str = "127.0.0.1"):
+    """Serve GET /metrics (Prometheus text) and GET /metrics.json on a background thread, once per process"""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def do_GET(self):
+            if self.path == "/metrics":
+                body, content_type = _metrics.render_prometheus(), "text/plain; version=0.0.4"
+            elif self.path == "/metrics.json":
+                body, content_type = json.dumps(_metrics.snapshot()), "application/json"
+            else:
+                self.send_error(404)
+                return
+            data = body.encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+    with _exporters_lock:
+        if 'http' in _exporters:
+            return _exporters['http']
+        server = ThreadingHTTPServer((host, port), Handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+        _exporters['http'] = server
+        logging.info(f"Serving metrics on http://{host}:{server.server_address[1]}/metrics")
+        return server
+
+
+def start_exporters_from_env():
+    """Start the exporters configured by DOCUCHAT_METRICS_PORT / DOCUCHAT_METRICS_DUMP (if metrics are enabled)"""
+    if not _metrics.enabled:
+        return
+    port = os.getenv("DOCUCHAT_METRICS_PORT")
+    if port:
+        start_http_exporter(int(port))
+    dump_path = os.getenv("DOCUCHAT_METRICS_DUMP")
+    if dump_path:
+        start_json_dump(dump_path, float(os.getenv("DOCUCHAT_METRICS_DUMP_INTERVAL", "60")))
@@ -0,0 +1,86 @@
+import os
+import copy
+import logging
+from typing import List, Optional
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+# Exported ONNX graphs published alongside the sentence-transformers checkpoint
+ONNX_VARIANTS = {
+    'onnx': "onnx/model.onnx",
+    'onnx-int8': os.getenv("DOCUCHAT_ONNX_INT8_FILE", "onnx/model_quint8_avx2.onnx"),
+}
+MAX_SEQ_LENGTH = 256  # all-MiniLM-L6-v2's max_seq_length
+
+
+class OnnxEmbeddings(Embeddings):
+    """
+    Sentence-transformers model run through onnxruntime on CPU, without importing torch.
+
+    Reproduces the model's pipeline: WordPiece tokenization (tokenizer.json), the exported
+    transformer, mean pooling over the attention mask and optional L2 normalization.
+    """
+
+    def __init__(self, model_name: str, variant: str = "onnx", normalize: bool = True, batch_size: int = 32,
+                 threads: Optional[int] = None, max_length: int = MAX_SEQ_LENGTH):
+        import onnxruntime
+        from huggingface_hub import hf_hub_download
+        from tokenizers import Tokenizer
+
+        repo_id = model_name if "/" in model_name else f"sentence-transformers/{model_name}"
+        self.model_name = model_name
+        self.variant = variant
+        self.normalize = normalize
+        self.batch_size = batch_size
+
+        self.tokenizer = Tokenizer.from_file(hf_hub_download(repo_id, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=max_length)
+        self.tokenizer.enable_padding()
+
+        options = onnxruntime.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        model_path = hf_hub_download(repo_id, ONNX_VARIANTS[variant])
+        self.session = onnxruntime.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+        logging.info(f"Loaded {variant} embedding model {repo_id} ({os.path.basename(model_path)})")
+
+    def with_batch_size(self, batch_size: int) -> "OnnxEmbeddings":
+        """Shallow copy encoding in batches of batch_size (the session is shared)"""
+        view = copy.copy(self)
+        view.batch_size = batch_size
+        return view
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(texts)
+        input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+        attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        feeds = {'input_ids': input_ids, 'attention_mask': attention_mask}
+        if "token_type_ids" in self.input_names:
+            feeds['token_type_ids'] = np.array([e.type_ids for e in encodings], dtype=np.int64)
+        token_embeddings = self.session.run(None, feeds)[0]
+
+        # Mean pooling over real (non-padding) tokens
+        mask = attention_mask[:, :, None].astype(np.float32)
+        vectors = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        if self.normalize:
+            vectors /= np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+        return vectors.astype(np.float32)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        texts = [text.replace("\n", " ") for text in texts]
+        # Batch texts of similar length together so little compute goes to padding
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        vectors = np.empty((len(texts), 0), dtype=np.float32)
+        for start in range(0, len(texts), self.batch_size):
+            batch = order[start:start + self.batch_size]
+            encoded = self._encode([texts[i] for i in batch])
+            if vectors.shape[1] == 0:
+                vectors = np.empty((len(texts), encoded.shape[1]), dtype=np.float32)
+            vectors[batch] = encoded
+        return vectors.tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
@@ -0,0 +1,96 @@
+"""
+Page-range PDF text extraction.
+
+Kept free of heavy imports so process-pool workers only need pypdf.
+A source is a file path, an in-memory buffer (bytes/memoryview), or the name
+of a shared memory block holding the PDF, so uploads never need a temp file.
+"""
+import io
+from multiprocessing import shared_memory
+from typing import List, Tuple, Union
+from pypdf import PdfReader
+
+
+class BufferReader(io.RawIOBase):
+    """Seekable read-only stream over a buffer, without copying it"""
+
+    def __init__(self, buffer):
+        self._view = memoryview(buffer).cast("B")
+        self._pos = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            self._pos = offset
+        elif whence == io.SEEK_CUR:
+            self._pos += offset
+        else:
+            self._pos = len(self._view) + offset
+        self._pos = max(0, self._pos)
+        return self._pos
+
+    def readinto(self, b):
+        data = self._view[self._pos:self._pos + len(b)]
+        n = len(data)
+        b[:n] = data
+        self._pos += n
+        return n
+
+    def close(self):
+        self._view.release()
+        super().close()
+
+
+class SharedPdf:
+    """Reference to a PDF in shared memory, picklable for pool workers"""
+
+    def __init__(self, name: str, size: int):
+        self.name = name
+        self.size = size
+
+
+def _reader(source):
+    """Return (reader, close) for any supported source"""
+    if isinstance(source, SharedPdf):
+        # Pool workers share the creator's resource tracker; the creator unlinks the block
+        block = shared_memory.SharedMemory(name=source.name)
+        view = block.buf[:source.size]
+        stream = BufferReader(view)
+
+        def close():
+            # Release every view of the block before closing it
+            stream.close()
+            view.release()
+            block.close()
+        return PdfReader(stream), close
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        stream = BufferReader(source)
+        return PdfReader(stream), stream.close
+    return PdfReader(source), lambda: None
+
+
+def count_pdf_pages(source: Union[str, bytes, memoryview, SharedPdf]) -> int:
+    """Number of pages in a PDF (reads only the page tree, not the content)"""
+    reader, close = _reader(source)
+    try:
+        return len(reader.pages)
+    finally:
+        close()
+
+
+def extract_pdf_pages(source: Union[str, bytes, memoryview, SharedPdf], start: int, end: int) -> List[Tuple[str, str]]:
+    """Return (page_label, text) for pages [start, end)"""
+    reader, close = _reader(source)
+    try:
+        labels = reader.page_labels
+        return [(labels[i], reader.pages[i].extract_text().strip()) for i in range(start, end)]
+    finally:
+        close()
@@ -0,0 +1,166 @@
+"""
+Micro-batching of query embedding and vector search across concurrent sessions.
+
+Requests arriving within max_wait_ms of each other (up to max_batch_size) are embedded
+with one encoder call and searched with one batched similarity search per vector store,
+and each caller gets its own result back. While a batch is running, new requests queue
+up and form the next batch, so batches grow with load. Under light load (no other request
+within max_wait_ms before this one) a request is run at once instead of waiting.
+"""
+import os
+import json
+import time
+import queue
+import logging
+import threading
+import weakref
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+from embedding_cache import CachedEmbeddings
+
+DEFAULT_MAX_BATCH_SIZE = int(os.getenv("DOCUCHAT_BATCH_MAX_SIZE", "32"))
+DEFAULT_MAX_WAIT_MS = float(os.getenv("DOCUCHAT_BATCH_MAX_WAIT_MS", "5"))
+# A caller gives up (TimeoutError) if its batch has not finished by then
+DEFAULT_TIMEOUT_SECONDS = float(os.getenv("DOCUCHAT_BATCH_TIMEOUT_SECONDS", "60"))
+
+
+class MicroBatcher:
+    """
+    Collects submitted items on a worker thread and runs them in batches.
+    Items are grouped by key; batch_fn(key, items) returns one result per item, and
+    every item of a group fails if it raises or returns a different number of results.
+    """
+
+    def __init__(self, batch_fn: Callable[[Hashable, List[Any]], List[Any]],
+                 max_batch_size: int = DEFAULT_MAX_BATCH_SIZE, max_wait_ms: float = DEFAULT_MAX_WAIT_MS,
+                 name: str = "batcher", timeout: Optional[float] = DEFAULT_TIMEOUT_SECONDS):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.timeout = timeout
+        self.batches = 0
+        self.items = 0
+        self._last_arrival = float("-inf")
+        self._queue: "queue.Queue[Tuple[Hashable, Any, Future, float]]" = queue.Queue()
+        self._worker = threading.Thread(target=self._run, name=name, daemon=True)
+        self._worker.start()
+
+    def submit(self, key: Hashable, item: Any) -> Future:
+        future = Future()
+        self._queue.put((key, item, future, time.monotonic()))
+        return future
+
+    def __call__(self, key: Hashable, item: Any) -> Any:
+        """Submit and wait for the result; raises TimeoutError after self.timeout seconds"""
+        future = self.submit(key, item)
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            # Not started yet: the worker skips it
+            future.cancel()
+            raise
+
+    def _collect(self) -> List[Tuple[Hashable, Any, Future, float]]:
+        batch = [self._queue.get()]
+        wait = self.max_wait_ms / 1000
+        arrived = batch[0][3]
+        # A lone request after a quiet spell is unlikely to get company; do not make it wait
+        deadline = arrived + wait if arrived - self._last_arrival < wait else 0.0
+        self._last_arrival = arrived
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                # Past the wait window, still take whatever already queued up
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+            self._last_arrival = batch[-1][3]
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            groups: Dict[Hashable, List[Tuple[Any, Future]]] = {}
+            for key, item, future, _ in batch:
+                # False once the caller gave up waiting
+                if future.set_running_or_notify_cancel():
+                    groups.setdefault(key, []).append((item, future))
+            for key, entries in groups.items():
+                # Anything escaping here would end the worker thread and leave every later caller waiting
+                try:
+                    results = self.batch_fn(key, [item for item, _ in entries])
+                    if len(results) != len(entries):
+                        raise RuntimeError(f"Batched call returned {len(results)} results for {len(entries)} items")
+                except BaseException as e:
+                    logging.error(f"Error in batched call: {str(e)}")
+                    for _, future in entries:
+                        future.set_exception(e)
+                    continue
+                for (_, future), result in zip(entries, results):
+                    future.set_result(result)
+            self.batches += len(groups)
+            self.items += len(batch)
+
+
+class QueryBatcher:
+    """Batched embed_query and similarity search shared by every ChatbotEngine in the process"""
+
+    def __init__(self, max_batch_size: int = DEFAULT_MAX_BATCH_SIZE, max_wait_ms: float = DEFAULT_MAX_WAIT_MS,
+                 timeout: Optional[float] = DEFAULT_TIMEOUT_SECONDS):
+        # Keys are id()s; callers keep the object alive while their request is queued,
+        # so an id cannot be reused before its batch runs
+        self._objects = weakref.WeakValueDictionary()
+        self._lock = threading.Lock()
+        self._embed = MicroBatcher(self._embed_batch, max_batch_size, max_wait_ms, name="query-embed", timeout=timeout)
+        self._search = MicroBatcher(self._search_batch, max_batch_size, max_wait_ms, name="query-search",
+                                    timeout=timeout)
+
+    def _register(self, obj) -> int:
+        with self._lock:
+            self._objects[id(obj)] = obj
+        return id(obj)
+
+    def _embed_batch(self, key, texts: List[str]) -> List[List[float]]:
+        embeddings = self._objects[key]
+        # Queries bypass the chunk embedding cache, as CachedEmbeddings.embed_query does
+        if isinstance(embeddings, CachedEmbeddings):
+            embeddings = embeddings.base
+        return embeddings.embed_documents(texts)
+
+    def _search_batch(self, key, queries: List[List[float]]) -> List[list]:
+        store_key, k, filter_json = key
+        vectorstore = self._objects[store_key]
+        filter = json.loads(filter_json) if filter_json else None
+        if hasattr(vectorstore, "batch_similarity_search_by_vector"):
+            return vectorstore.batch_similarity_search_by_vector(queries, k=k, filter=filter)
+        search_kwargs = {'filter': filter} if filter else {}
+        return [vectorstore.similarity_search_by_vector(query, k=k, **search_kwargs) for query in queries]
+
+    def embed_query(self, embeddings, text: str) -> List[float]:
+        return self._embed(self._register(embeddings), text)
+
+    def search(self, vectorstore, query_vector: List[float], k: int, filter: Optional[dict] = None) -> list:
+        # Only requests for the same store, k and filter share a search call
+        key = (self._register(vectorstore), k, json.dumps(filter, sort_keys=True) if filter else None)
+        return self._search(key, query_vector)
+
+    def stats(self) -> dict:
+        return {
+            'embed_batches': self._embed.batches,
+            'embed_queries': self._embed.items,
+            'search_batches': self._search.batches,
+            'search_queries': self._search.items,
+        }
+
+
+_batcher: Optional[QueryBatcher] = None
+_batcher_lock = threading.Lock()
+
+
+def get_query_batcher() -> QueryBatcher:
+    """Process-wide query batcher (size and wait from DOCUCHAT_BATCH_MAX_SIZE / DOCUCHAT_BATCH_MAX_WAIT_MS)"""
+    global _batcher
+    with _batcher_lock:
+        if _batcher is None:
+            _batcher = QueryBatcher()
+        return _batcher
@@ -0,0 +1,92 @@
+import os
+
+# Offline test: never reach out to the Hugging Face Hub
+os.environ.setdefault("HF_HUB_OFFLINE", "1")
+
+import time
+import tempfile
+import numpy as np
+from langchain_core.vectorstores import InMemoryVectorStore
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from answer_cache import AnswerCache, normalize_question
+from chatbot_engine import ChatbotEngine
+from fake_llm import FakeStreamingChatModel
+
+
+def unit(vector):
+    vector = np.asarray(vector, dtype=np.float32)
+    return (vector / np.linalg.norm(vector)).tolist()
+
+
+def test_exact_and_semantic_hits():
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = AnswerCache(os.path.join(tmp, "answers.sqlite3"), similarity_threshold=0.9)
+        cache.put("corpus", "Summarize this document", ["c1", "c2"], "A summary.", ["src"], unit([1, 0, 0]))
+
+        assert normalize_question("  Summarize THIS document? ") == "summarize this document"
+        assert cache.get("corpus", "summarize this document?", ["c1", "c2"]) == ("A summary.", ["src"])
+        # Same question over different chunks is a different entry
+        assert cache.get("corpus", "Summarize this document", ["c3"]) is None
+        # Paraphrase with a close query vector over the same chunks reuses the answer
+        assert cache.get("corpus", "Give me a summary", ["c2", "c1"], unit([1, 0.1, 0]))[0] == "A summary."
+        assert cache.get("corpus", "Give me a summary", ["c9"], unit([1, 0.1, 0])) is None
+        assert cache.get("corpus", "What are the skills?", ["c1", "c2"], unit([0, 1, 0])) is None
+        assert cache.get("other", "Give me a summary", ["c1", "c2"], unit([1, 0.1, 0])) is None
+
+        stats = cache.get_stats()
+        print(f"Answer cache stats: {stats}")
+        assert stats['hits'] == 2 and stats['semantic_hits'] == 1 and stats['misses'] == 4
+
+
+def test_eviction_and_persistence():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "answers.sqlite3")
+        cache = AnswerCache(db_path, max_entries=2, ttl_seconds=3600)
+        cache.put("corpus", "q1", [], "a1", [])
+        cache.put("corpus", "q2", [], "a2", [])
+        time.sleep(0.01)
+        cache.get("corpus", "q1", [])
+        cache.put("corpus", "q3", [], "a3", [])
+
+        reopened = AnswerCache(db_path, max_entries=2)
+        assert reopened.get("corpus", "q1", []) is not None
+        assert reopened.get("corpus", "q2", []) is None  # least recently used was evicted
+        assert reopened.get("corpus", "q3", []) is not None
+
+        expired = AnswerCache(db_path, ttl_seconds=0)
+        assert expired.get("corpus", "q3", []) is None
+
+
+def test_engine_uses_cache():
+    with tempfile.TemporaryDirectory() as tmp:
+        vectorstore = InMemoryVectorStore(DeterministicFakeEmbedding(size=32))
+        vectorstore.add_texts(["Skills: Python, SQL.", "Experience: five years."])
+        llm = FakeStreamingChatModel(response="Python and SQL.", first_token_delay=0.2)
+        engine = ChatbotEngine(vectorstore, top_k=2, llm=llm,
+                               answer_cache=AnswerCache(os.path.join(tmp, "answers.sqlite3")),
+                               corpus_key="corpus")
+
+        first, _ = engine.get_response("What are the key skills?")
+        # Another chat asking the same opening question gets the cached answer
+        other = engine.for_session()
+        start = time.perf_counter()
+        second = "".join(other.stream_response("what are the key skills"))
+        cached_seconds = time.perf_counter() - start
+
+        print(f"Cached answer returned in {cached_seconds * 1000:.1f} ms")
+        assert first == second == "Python and SQL."
+        assert other.last_cache_hit
+        assert cached_seconds < 0.2
+        assert len(other.history) == 2
+
+        # Follow-ups depend on the chat's history, so they are neither served from nor stored in the cache
+        engine.get_response("What are the key skills?")
+        assert not engine.last_cache_hit and len(engine.history) == 4
+        assert engine.answer_cache.get_stats()['entries'] == 1
+
+
+if __name__ == "__main__":
+    test_exact_and_semantic_hits()
+    test_eviction_and_persistence()
+    test_engine_uses_cache()
+    print("Answer cache tests passed.")
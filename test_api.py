@@ -0,0 +1,186 @@
+import os
+
+# Offline test: never reach out to the Hugging Face Hub
+os.environ.setdefault("HF_HUB_OFFLINE", "1")
+
+import json
+import time
+import asyncio
+import tempfile
+import numpy as np
+from aiohttp import FormData
+from aiohttp.test_utils import TestClient, TestServer
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from api import DocuChatAPI, create_app
+from conversation_memory import _approximate_token_count
+from document_processor import DocumentProcessor
+from fake_llm import FakeStreamingChatModel
+from ingestion_jobs import CANCELLED
+
+ANSWER = "The pump runs at four bar."
+
+
+async def wait_for_jobs(client, session_id, timeout=30):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while True:
+        jobs = (await (await client.get(f"/sessions/{session_id}/jobs")).json())['jobs']
+        if all(job['status'] not in ("queued", "running") for job in jobs) or \
+                asyncio.get_running_loop().time() > deadline:
+            return jobs
+        await asyncio.sleep(0.05)
+
+
+async def exercise_api(work_dir):
+    processor = DocumentProcessor(chunk_size=200, chunk_overlap=20, persist_dir=os.path.join(work_dir, "db"),
+                                  embeddings=DeterministicFakeEmbedding(size=64), vector_backend="numpy")
+    service = DocuChatAPI(processor=processor, llm=FakeStreamingChatModel(response=ANSWER),
+                          count_tokens=_approximate_token_count)
+    async with TestClient(TestServer(create_app(service))) as client:
+        response = await client.post("/sessions")
+        assert response.status == 201
+        session_id = (await response.json())['session_id']
+        assert (await client.get("/sessions/0123")).status == 404
+
+        # Multipart upload and a raw body both return ingestion jobs
+        form = FormData()
+        form.add_field("file", b"The pump runs at four bar. " * 40, filename="pump.txt")
+        response = await client.post(f"/sessions/{session_id}/documents", data=form)
+        assert response.status == 202
+        job_id = (await response.json())['jobs'][0]['job_id']
+        response = await client.post(f"/sessions/{session_id}/documents?file_name=valve.txt",
+                                     data=b"The valve is checked monthly. " * 40)
+        assert response.status == 202
+        assert (await client.post(f"/sessions/{session_id}/documents?file_name=x.exe", data=b"MZ")).status == 415
+
+        jobs = await wait_for_jobs(client, session_id)
+        assert [job['status'] for job in jobs] == ["done", "done"]
+        job = await (await client.get(f"/sessions/{session_id}/jobs/{job_id}")).json()
+        assert job['file_name'] == "pump.txt" and job['chunks_done'] > 0
+        info = await (await client.get(f"/sessions/{session_id}/documents")).json()
+        assert sorted(info['files']) == ["pump.txt", "valve.txt"] and not info['indexing']
+
+        response = await client.post(f"/sessions/{session_id}/ask", json={'question': "What pressure?"})
+        result = await response.json()
+        assert result['answer'] == ANSWER and result['sources']
+
+        # Streaming: token events, then done with the sources
+        response = await client.post(f"/sessions/{session_id}/ask",
+                                     json={'question': "And the valve?", 'stream': True, 'files': ["valve.txt"]})
+        assert response.headers['Content-Type'].startswith("text/event-stream")
+        events = [block for block in (await response.text()).split("\n\n") if block]
+        tokens = [json.loads(block.split("data: ", 1)[1])['text'] for block in events[:-1]]
+        assert "".join(tokens).strip() == ANSWER
+        assert events[-1].startswith("event: done")
+        assert all("valve" in source for source in json.loads(events[-1].split("data: ", 1)[1])['sources'])
+
+        # The conversation lives in the session, not in the worker
+        session = await (await client.get(f"/sessions/{session_id}")).json()
+        assert [m['role'] for m in session['history']] == ["User", "Assistant", "User", "Assistant"]
+        assert session['file_filter'] == ["valve.txt"]
+
+        info = await (await client.delete(f"/sessions/{session_id}/documents/valve.txt")).json()
+        assert list(info['files']) == ["pump.txt"]
+        assert (await client.delete(f"/sessions/{session_id}")).status == 200
+        assert (await client.get(f"/sessions/{session_id}/documents")).status == 404
+        assert processor.get_corpus_info(session_id)['files'] == {}
+
+
+def test_api_ingest_ask_and_delete():
+    with tempfile.TemporaryDirectory() as work_dir:
+        asyncio.run(exercise_api(work_dir))
+
+
+async def ask_from_two_workers(work_dir):
+    services = [DocuChatAPI(processor=DocumentProcessor(chunk_size=200, chunk_overlap=20,
+                                                        persist_dir=os.path.join(work_dir, "db"),
+                                                        embeddings=DeterministicFakeEmbedding(size=64),
+                                                        vector_backend="numpy"),
+                            llm=FakeStreamingChatModel(response=ANSWER, first_token_delay=0.2),
+                            count_tokens=_approximate_token_count) for _ in range(2)]
+    async with TestClient(TestServer(create_app(services[0]))) as first, \
+            TestClient(TestServer(create_app(services[1]))) as second:
+        session_id = (await (await first.post("/sessions")).json())['session_id']
+        await first.post(f"/sessions/{session_id}/documents?file_name=pump.txt", data=b"The pump runs at four bar. " * 40)
+        await wait_for_jobs(first, session_id)
+        await asyncio.gather(first.post(f"/sessions/{session_id}/ask", json={'question': "What pressure?"}),
+                             second.post(f"/sessions/{session_id}/ask", json={'question': "Which pump?"}))
+        session = await (await second.get(f"/sessions/{session_id}")).json()
+        assert sorted(m['content'] for m in session['history'] if m['role'] == "User") == ["What pressure?", "Which pump?"]
+
+
+def test_turns_from_two_workers_are_both_kept():
+    with tempfile.TemporaryDirectory() as work_dir:
+        asyncio.run(ask_from_two_workers(work_dir))
+
+
+class SlowEmbedding(DeterministicFakeEmbedding):
+    def embed_documents(self, texts):
+        time.sleep(0.05)
+        return super().embed_documents(texts)
+
+
+async def expire_session_while_indexing(work_dir):
+    processor = DocumentProcessor(chunk_size=200, chunk_overlap=20, persist_dir=os.path.join(work_dir, "db"),
+                                  embeddings=SlowEmbedding(size=16), vector_backend="numpy", batch_pages=1)
+    service = DocuChatAPI(processor=processor, llm=FakeStreamingChatModel(response=ANSWER))
+    async with TestClient(TestServer(create_app(service))) as client:
+        session_id = (await (await client.post("/sessions")).json())['session_id']
+        response = await client.post(f"/sessions/{session_id}/documents?file_name=big.txt",
+                                     data=b"The pump runs at four bar. " * 40000)
+        job = service.queue.get((await response.json())['jobs'][0]['job_id'])
+        while job.pages_done == 0:
+            await asyncio.sleep(0.02)
+
+        service.session_ttl_seconds = -1
+        assert await asyncio.to_thread(service.collect_expired_sessions) == [session_id]
+        for _ in range(200):
+            if not job.active:
+                break
+            await asyncio.sleep(0.05)
+        assert job.status == CANCELLED and job.pages_done < job.total_pages
+
+
+def test_expired_sessions_stop_their_uploads():
+    with tempfile.TemporaryDirectory() as work_dir:
+        asyncio.run(expire_session_while_indexing(work_dir))
+
+
+def test_workers_share_indexes():
+    """Stores opened by another process (here: a second object) see each other's writes"""
+    from collection_registry import CollectionRegistry
+    from embedding_cache import EmbeddingCache
+    from vector_backends import NumpyVectorStore
+    with tempfile.TemporaryDirectory() as work_dir:
+        first, second = CollectionRegistry(work_dir, backend="numpy"), CollectionRegistry(work_dir, backend="numpy")
+        first.register("corpus_a", {'files': {}})
+        second.update("corpus_a", {'files': {'a.txt': {}}})
+        assert first.get("corpus_a")['files'] == {'a.txt': {}}
+
+        embeddings = DeterministicFakeEmbedding(size=16)
+        writer = NumpyVectorStore(embeddings, os.path.join(work_dir, "store"))
+        reader = NumpyVectorStore(embeddings, os.path.join(work_dir, "store"))
+        writer.add_texts(["alpha", "beta"], ids=["a", "b"])
+        assert reader.count() == 2
+        writer.delete(["a"])
+        writer.add_texts(["gamma"], ids=["c"])
+        assert [doc.id for doc in reader.get_by_ids(["a", "b", "c"])] == ["b", "c"]
+        assert reader.similarity_search("gamma", k=1)[0].id == "c"
+
+        # Embedding caches on one directory never hand out the same row twice
+        first_cache = EmbeddingCache(os.path.join(work_dir, "embeddings"), max_entries=8)
+        second_cache = EmbeddingCache(os.path.join(work_dir, "embeddings"), max_entries=8)
+        first_cache.put_many(["seed"], np.zeros((1, 4)))
+        first_cache.put_many(["text-A"], np.full((1, 4), 1.0))
+        second_cache.put_many(["text-B"], np.full((1, 4), 2.0))
+        assert first_cache.get_many(["text-A"])["text-A"].tolist() == [1.0] * 4
+        assert first_cache.get_many(["text-B"])["text-B"].tolist() == [2.0] * 4
+        fresh = EmbeddingCache(os.path.join(work_dir, "embeddings"), max_entries=8)
+        assert sorted(fresh.get_many(["seed", "text-A", "text-B"])) == ["seed", "text-A", "text-B"]
+
+
+if __name__ == "__main__":
+    test_api_ingest_ask_and_delete()
+    test_turns_from_two_workers_are_both_kept()
+    test_expired_sessions_stop_their_uploads()
+    test_workers_share_indexes()
+    print("API tests passed")
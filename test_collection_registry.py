@@ -0,0 +1,58 @@
+import os
+import time
+import tempfile
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from collection_registry import CollectionRegistry, TOUCH_WRITE_INTERVAL, collection_name_for, file_content_hash
+from document_processor import DocumentProcessor
+
+MANUAL = b"The pump runs at four bar. The valve is checked monthly. " * 40
+REPORT = b"Revenue grew in the northern region after the price change. " * 40
+
+
+def backdate(registry, name, seconds):
+    with registry._transaction():
+        registry._entries[name]['last_used'] -= seconds
+        registry._write()
+
+
+def test_reuse_touch_and_garbage_collection():
+    with tempfile.TemporaryDirectory() as work_dir:
+        processor = DocumentProcessor(chunk_size=200, chunk_overlap=20, persist_dir=work_dir,
+                                      embeddings=DeterministicFakeEmbedding(size=16), vector_backend="numpy")
+        registry = processor.collections
+
+        # The same bytes are indexed once; other chunk settings get their own collection
+        _, first = processor.process_document(MANUAL, file_name="manual.txt")
+        _, second = processor.process_document(MANUAL, file_name="copy.txt")
+        assert not first['reused'] and second['reused'] and first['storage'] == second['storage']
+        content_hash = file_content_hash(MANUAL)
+        assert first['storage'] == collection_name_for(content_hash, 200, 20)
+        assert collection_name_for(content_hash, 300, 20) != first['storage']
+        _, report = processor.process_document(REPORT, file_name="report.txt")
+
+        # Touches within TOUCH_WRITE_INTERVAL stay in memory; older ones are written for other processes
+        manual = first['storage']
+        stamp = registry._file_stamp()
+        registry.touch(manual)
+        assert registry._file_stamp() == stamp
+        backdate(registry, manual, TOUCH_WRITE_INTERVAL + 1)
+        registry.touch(manual)
+        assert time.time() - CollectionRegistry(work_dir, backend="numpy").get(manual)['last_used'] < 5
+
+        # Only the collection unused for longer than the TTL is removed, with its vectors and lexical index
+        backdate(registry, report['storage'], registry.ttl_seconds + 1)
+        assert registry.expired() == [report['storage']]
+        with registry.build_lock(report['storage']):
+            assert registry.collect_garbage() == []
+        assert registry.collect_garbage() == [report['storage']]
+        assert registry.get(report['storage']) is None and registry.get(manual) is not None
+        assert not os.path.exists(registry.lexical_path(report['storage']))
+        _, again = processor.process_document(REPORT, file_name="report.txt")
+        assert not again['reused'] and again['chunks'] == report['chunks']
+        _, manual_again = processor.process_document(MANUAL, file_name="manual.txt")
+        assert manual_again['reused']
+
+
+if __name__ == "__main__":
+    test_reuse_touch_and_garbage_collection()
+    print("Collection registry tests passed")
@@ -0,0 +1,71 @@
+import numpy as np
+from langchain_core.documents import Document
+from context_packer import ContextPacker, merge_neighbours
+
+PAGE = " ".join(f"word{i}" for i in range(200))
+
+
+def count_words(text):
+    return len(text.split())
+
+
+def chunk(start, end, page=1, file_name="manual.pdf"):
+    return Document(page_content=PAGE[start:end], metadata={'file_name': file_name, 'page': page, 'start_index': start},
+                    id=f"{file_name}-{page}-{start}")
+
+
+def unit(*values):
+    vector = np.asarray(values, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def test_overlapping_neighbours_are_merged_once():
+    docs = [chunk(100, 300), chunk(0, 150), chunk(280, 400), chunk(600, 700), chunk(100, 300, page=2)]
+    merged, members = merge_neighbours(docs)
+    assert members == [[1, 0, 2], [3], [4]]
+    # The overlap text appears once and the merged chunk is the exact page slice
+    assert merged[0].page_content == PAGE[0:400] and merged[0].metadata['merged_chunks'] == 3
+    assert merged[1] is docs[3] and merged[2] is docs[4]
+
+
+def test_near_duplicates_are_dropped_keeping_the_better_ranked_copy():
+    docs = [chunk(0, 50), chunk(600, 650), chunk(1000, 1050)]
+    vectors = [unit(1, 0, 0), unit(1, 0.01, 0), unit(0, 1, 0)]
+    packer = ContextPacker(token_budget=1000, dedup_threshold=0.95, count_tokens=count_words)
+    assert [doc.id for doc in packer.pack(docs, vectors, unit(1, 1, 0))] == [docs[0].id, docs[2].id]
+    packer.dedup_threshold = 1.01
+    assert len(packer.pack(docs, vectors, unit(1, 1, 0))) == 3
+
+
+def test_mmr_prefers_diverse_chunks_after_the_best_one():
+    docs = [chunk(0, 50), chunk(600, 650), chunk(1000, 1050)]
+    # Second chunk nearly repeats the first; the third is less relevant but new
+    vectors = [unit(1, 0.2, 0), unit(1, 0.4, 0), unit(0.3, 0, 1)]
+    query = unit(1, 0.2, 0.3)
+    relevance_only = ContextPacker(token_budget=1000, dedup_threshold=1.01, mmr_lambda=1.0, count_tokens=count_words)
+    assert [doc.id for doc in relevance_only.pack(docs, vectors, query)] == [docs[0].id, docs[1].id, docs[2].id]
+    diverse = ContextPacker(token_budget=1000, dedup_threshold=1.01, mmr_lambda=0.5, count_tokens=count_words)
+    assert [doc.id for doc in diverse.pack(docs, vectors, query)] == [docs[0].id, docs[2].id, docs[1].id]
+
+
+def test_token_budget_is_never_exceeded():
+    rng = np.random.default_rng(0)
+    docs = [chunk(start, start + int(rng.integers(20, 400)), page=start) for start in range(0, 1200, 60)]
+    vectors = rng.standard_normal((len(docs), 8))
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    for budget in (5, 30, 60, 100, 250):
+        packer = ContextPacker(token_budget=budget, count_tokens=count_words)
+        packed = packer.pack(docs, vectors, vectors[3])
+        assert packed and sum(count_words(doc.page_content) for doc in packed) <= budget
+    # Nothing fits: the most relevant chunk is cut to the budget rather than sent whole
+    packed = ContextPacker(token_budget=5, count_tokens=count_words).pack([chunk(0, 400)], [unit(1, 0)], unit(1, 0))
+    assert count_words(packed[0].page_content) <= 5 and packed[0].metadata['truncated']
+    assert PAGE.startswith(packed[0].page_content)
+
+
+if __name__ == "__main__":
+    test_overlapping_neighbours_are_merged_once()
+    test_near_duplicates_are_dropped_keeping_the_better_ranked_copy()
+    test_mmr_prefers_diverse_chunks_after_the_best_one()
+    test_token_budget_is_never_exceeded()
+    print("Context packer tests passed")
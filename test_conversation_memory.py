@@ -0,0 +1,48 @@
+import sys
+from conversation_memory import ConversationMemory
+
+
+def count_words(text):
+    return len(text.split())
+
+
+def test_budget_and_memory_cap():
+    folded_batches = []
+
+    def summarizer(summary, messages):
+        folded_batches.append(len(messages))
+        return (summary + "\n" if summary else "") + " ".join(" ".join(m['content'].split()[:5]) for m in messages)
+
+    memory = ConversationMemory(max_messages=8, token_budget=600, summary_token_budget=100,
+                                count_tokens=count_words, summarizer=summarizer)
+    long_answer = "word " * 1000
+    for turn in range(500):
+        memory.append("User", f"Question {turn} about the document?")
+        memory.append("Assistant", f"Answer {turn}. " + long_answer)
+
+        assert memory.token_count() <= 600
+        assert len(memory.messages) <= 8
+        assert memory.summary_tokens <= 100
+
+    # Only evicted messages are summarized, never the whole history again
+    assert sum(folded_batches) + len(memory.messages) == 1000
+    size = sum(sys.getsizeof(m['content']) for m in memory.messages) + sys.getsizeof(memory.summary)
+    print(f"Folds: {len(folded_batches)}, retained messages: {len(memory.messages)}, "
+          f"tokens: {memory.token_count()}, retained bytes: {size}")
+    assert size < 8 * memory.max_message_chars * 2
+    assert memory.format().startswith("Summary of earlier conversation:")
+
+
+def test_short_conversation_kept_verbatim():
+    memory = ConversationMemory(count_tokens=count_words)
+    assert memory.format() == "No previous interaction."
+    memory.append("User", "What are the key skills?")
+    memory.append("Assistant", "Python and SQL.")
+    assert memory.summary == ""
+    assert memory.format() == "User: What are the key skills?\nAssistant: Python and SQL."
+
+
+if __name__ == "__main__":
+    test_budget_and_memory_cap()
+    test_short_conversation_kept_verbatim()
+    print("Conversation memory tests passed.")
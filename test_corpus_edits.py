@@ -0,0 +1,50 @@
+import tempfile
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from document_processor import DocumentProcessor
+
+PUMP = b"The pump ZX-4471 runs at four bar during normal operation. " * 30
+VALVE = b"The valve QV-9 is checked monthly by the maintenance crew. " * 30
+VALVE_V2 = b"The valve QV-9 is now checked weekly after the incident report. " * 30
+
+
+def corpus_chunks(processor, corpus_id):
+    return list(processor.open_corpus(corpus_id).get_chunks())
+
+
+def test_remove_and_reindex_touch_only_that_file():
+    with tempfile.TemporaryDirectory() as work_dir:
+        processor = DocumentProcessor(chunk_size=200, chunk_overlap=20, persist_dir=work_dir,
+                                      embeddings=DeterministicFakeEmbedding(size=32), vector_backend="numpy")
+        corpus_id = "a" * 32
+        processor.add_file(corpus_id, PUMP, file_name="pump.txt")
+        info = processor.add_file(corpus_id, VALVE, file_name="valve.txt")
+        lexical_index = processor.get_lexical_index(f"corpus_{corpus_id}")
+        assert info['chunks'] == len(corpus_chunks(processor, corpus_id)) == lexical_index.num_docs
+        assert lexical_index.search("QV-9")
+
+        # Removed: gone from the vector store and the lexical index, the other file untouched
+        info = processor.remove_file(corpus_id, "valve.txt")
+        vectorstore = processor.open_corpus(corpus_id)
+        assert list(info['files']) == ["pump.txt"]
+        assert {meta['file_name'] for _, _, meta in corpus_chunks(processor, corpus_id)} == {"pump.txt"}
+        assert all(doc.metadata['file_name'] == "pump.txt"
+                   for doc in vectorstore.similarity_search(VALVE.decode()[:60], k=20))
+        assert lexical_index.search("QV-9") == [] and lexical_index.search("ZX-4471")
+        assert lexical_index.num_docs == info['chunks'] == vectorstore.count()
+
+        # Changed contents replace the file's chunks instead of adding to them
+        processor.add_file(corpus_id, VALVE, file_name="valve.txt")
+        info = processor.reindex_file(corpus_id, VALVE_V2, file_name="valve.txt")
+        chunks = corpus_chunks(processor, corpus_id)
+        ids = [chunk_id for chunk_id, _, _ in chunks]
+        assert len(ids) == len(set(ids)) == info['chunks'] == lexical_index.num_docs
+        assert not any("monthly" in text for _, text, _ in chunks)
+        assert {doc_id for doc_id, _ in lexical_index.search("weekly", k=50)} == \
+            {chunk_id for chunk_id, _, meta in chunks if meta['file_name'] == "valve.txt"}
+        # Unchanged contents are a no-op
+        assert processor.reindex_file(corpus_id, VALVE_V2, file_name="valve.txt") == info
+
+
+if __name__ == "__main__":
+    test_remove_and_reindex_touch_only_that_file()
+    print("Corpus edit tests passed")
@@ -0,0 +1,78 @@
+import time
+import tempfile
+import numpy as np
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from embedding_cache import CachedEmbeddings, EmbeddingCache
+
+
+class CountingEmbedding(DeterministicFakeEmbedding):
+    calls: list = []
+
+    def embed_documents(self, texts):
+        self.calls.append(list(texts))
+        return super().embed_documents(texts)
+
+
+def vector(value, dim=4):
+    return np.full((1, dim), value, dtype=np.float32)
+
+
+def test_full_cache_reuses_least_recently_used_rows():
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache = EmbeddingCache(cache_dir, max_entries=4)
+        for i, key in enumerate("abcd"):
+            cache.put_many([key], vector(i))
+            time.sleep(0.01)
+        cache.get_many(["a"])
+        slot_b = cache._lookup(["b"])["b"]
+
+        # "b" is now the least recently used row: "e" takes it over
+        cache.put_many(["e"], vector(9))
+        assert cache._lookup(["e"]) == {"e": slot_b}
+        found = cache.get_many(list("abcde"))
+        assert sorted(found) == ["a", "c", "d", "e"]
+        assert [found[key][0] for key in "acde"] == [0, 2, 3, 9]
+        stats = cache.get_stats()
+        assert stats['entries'] == 4 and stats['evictions'] == 1
+
+        # A reopened cache serves the same vectors
+        reopened = EmbeddingCache(cache_dir, max_entries=4)
+        assert all(np.array_equal(reopened.get_many([key])[key], found[key]) for key in "acde")
+
+
+def test_other_processes_never_read_stale_rows():
+    with tempfile.TemporaryDirectory() as cache_dir:
+        first, second = EmbeddingCache(cache_dir, max_entries=8), EmbeddingCache(cache_dir, max_entries=8)
+        first.put_many(["a", "b"], np.vstack([vector(1), vector(2)]))
+        assert second.get_many(["a"])["a"].tolist() == [1.0] * 4
+
+        # Cleared elsewhere: the old rows are gone, and new keys start again from the first row
+        second.clear()
+        assert first.get_many(["a", "b"]) == {}
+        first.put_many(["c"], vector(3))
+        assert first._lookup(["c"]) == {"c": 0} and second.get_many(["c"])["c"].tolist() == [3.0] * 4
+
+        # Recreated with another width (a new generation): readers reopen the matrix
+        second.put_many(["wide"], vector(5, dim=6))
+        assert first.get_many(["c"]) == {}
+        assert first.get_many(["wide"])["wide"].tolist() == [5.0] * 6
+
+
+def test_cached_embeddings_only_encode_misses():
+    with tempfile.TemporaryDirectory() as cache_dir:
+        base = CountingEmbedding(size=8)
+        embeddings = CachedEmbeddings(base, EmbeddingCache(cache_dir, max_entries=16), model_name="fake")
+        first = embeddings.embed_documents(["pump", "valve", "pump"])
+        second = embeddings.embed_documents(["valve", "pump", "gauge"])
+        # Each distinct text is encoded once; hits return the very same vectors
+        assert base.calls == [["pump", "valve"], ["gauge"]]
+        assert first[0] == first[2] == second[1] and first[1] == second[0]
+        assert np.allclose(second[2], base.embed_documents(["gauge"])[0], atol=1e-6)
+        assert embeddings.cache.get_stats()['hits'] == 2
+
+
+if __name__ == "__main__":
+    test_full_cache_reuses_least_recently_used_rows()
+    test_other_processes_never_read_stale_rows()
+    test_cached_embeddings_only_encode_misses()
+    print("Embedding cache tests passed")
@@ -33,8 +33,9 @@ def test_chatbot_engine(file_path, question):
 
     print(f"\n--- 3. Asking Question: '{question}' ---")
     try:
-        answer, sources = engine.get_response(question)
+        answer, sources, timings = engine.get_response(question, return_timings=True)
         print(f"\nAI Response:\n{answer}")
+        print(f"\nStage timings (ms): {timings}")
         print(f"\nSources used: {len(sources)}")
         for i, source in enumerate(sources):
             print(f"Source {i+1} (first 100 chars): {source[:100]}...")
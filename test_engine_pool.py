@@ -0,0 +1,95 @@
+import os
+
+# Offline test: never reach out to the Hugging Face Hub
+os.environ.setdefault("HF_HUB_OFFLINE", "1")
+
+import gc
+import uuid
+import tempfile
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from chatbot_engine import ChatbotEngine
+from conversation_memory import ConversationMemory, _approximate_token_count
+from document_processor import DocumentProcessor
+from embedding_registry import resident_memory_mb
+from engine_pool import EnginePool
+from fake_llm import FakeStreamingChatModel
+
+ANSWER = "The pump runs at four bar and the valve is checked monthly."
+
+
+def make_pool(work_dir, **options):
+    processor = DocumentProcessor(chunk_size=200, chunk_overlap=20, persist_dir=os.path.join(work_dir, "db"),
+                                  embeddings=DeterministicFakeEmbedding(size=64), vector_backend="numpy")
+    llm = FakeStreamingChatModel(response=ANSWER)
+    corpora = [f"{i:032x}" for i in range(3)]
+    for corpus_id in corpora:
+        processor.add_file(corpus_id, b"The pump runs at four bar. The valve is checked monthly. " * 30,
+                           file_name="manual.txt")
+
+    def build_engine(corpus_id):
+        return ChatbotEngine(processor.open_corpus(corpus_id), llm=llm,
+                             memory=ConversationMemory(count_tokens=_approximate_token_count),
+                             lexical_index=processor.get_lexical_index(f"corpus_{corpus_id}"))
+
+    return EnginePool(build_engine, release=processor.release_corpus, **options), corpora
+
+
+def simulate_sessions(pool, corpora, count):
+    for i in range(count):
+        engine = pool.session(uuid.uuid4().hex, corpora[i % len(corpora)])
+        engine.get_response("What pressure does the pump run at?")
+        engine.get_response("How often is the valve checked?")
+
+
+def test_sessions_share_engine_and_keep_own_memory():
+    with tempfile.TemporaryDirectory() as work_dir:
+        pool, corpora = make_pool(work_dir)
+        first, second = pool.session("a" * 32, corpora[0]), pool.session("b" * 32, corpora[0])
+        assert first is not second
+        assert first.vectorstore is second.vectorstore and first.lexical_index is second.lexical_index
+        first.set_file_filter(["manual.txt"])
+        first.get_response("What pressure?")
+        assert len(first.history) == 2 and second.history == [] and second.file_filter == []
+        assert pool.session("a" * 32, corpora[0]) is first
+        assert pool.stats()['engines'] == 1
+
+
+def test_idle_and_over_budget_sessions_are_evicted():
+    with tempfile.TemporaryDirectory() as work_dir:
+        pool, corpora = make_pool(work_dir, max_sessions=50, ttl_seconds=60, max_idle_engines=0)
+        old = pool.session("a" * 32, corpora[0])
+        old.get_response("What pressure?")
+        assert "a" * 32 in pool.collect(now=pool._sessions["a" * 32][2] + 61)
+        assert pool.stats()['engines'] == 0
+
+        simulate_sessions(pool, corpora, 120)
+        assert pool.stats()['sessions'] == 50 and pool.stats()['engines'] == len(corpora)
+
+        pool.memory_budget_bytes = 200 * 1024
+        pool.collect()
+        assert pool.stats()['session_memory_mb'] <= 0.2
+
+
+def test_memory_stays_flat_over_hundreds_of_sessions():
+    if resident_memory_mb() is None:
+        print("Skipping RSS check: resident memory is not available on this platform")
+        return
+    with tempfile.TemporaryDirectory() as work_dir:
+        pool, corpora = make_pool(work_dir, max_sessions=100)
+        # Warm up: fill the pool to its limit so later sessions only replace evicted ones
+        simulate_sessions(pool, corpora, 300)
+        gc.collect()
+        baseline = resident_memory_mb()
+        simulate_sessions(pool, corpora, 600)
+        gc.collect()
+        growth = resident_memory_mb() - baseline
+        stats = pool.stats()
+        assert stats['sessions'] == 100 and stats['engines'] == len(corpora)
+        assert growth < 1, f"RSS grew by {growth:.1f} MB over 600 sessions"
+
+
+if __name__ == "__main__":
+    test_sessions_share_engine_and_keep_own_memory()
+    test_idle_and_over_budget_sessions_are_evicted()
+    test_memory_stays_flat_over_hundreds_of_sessions()
+    print("Engine pool tests passed")
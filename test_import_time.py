@@ -0,0 +1,14 @@
+from benchmarks.bench_import_time import MODULES, import_profile
+
+
+def test_modules_import_without_heavy_dependencies():
+    # torch, chromadb, the HF clients and the document loaders load on first use, not at import
+    for module in MODULES:
+        profile = import_profile(module)
+        print(f"{module}: {profile['import_ms']} ms")
+        assert profile['heavy_imports'] == [], f"{module} imports {profile['heavy_imports']} at module level"
+
+
+if __name__ == "__main__":
+    test_modules_import_without_heavy_dependencies()
+    print("Import time test passed")
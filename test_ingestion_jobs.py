@@ -0,0 +1,60 @@
+import os
+import time
+import tempfile
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from document_processor import DocumentProcessor
+from ingestion_jobs import IngestionQueue, DONE, CANCELLED, FAILED
+
+
+class SlowEmbeddings(DeterministicFakeEmbedding):
+    def embed_documents(self, texts):
+        time.sleep(0.5)
+        return super().embed_documents(texts)
+
+
+def wait_for(job, timeout=30):
+    deadline = time.time() + timeout
+    while job.active and time.time() < deadline:
+        time.sleep(0.05)
+    return job.status
+
+
+def test_queue_dedup_cancel_and_failure():
+    with tempfile.TemporaryDirectory() as work_dir:
+        processor = DocumentProcessor(chunk_size=200, chunk_overlap=20, persist_dir=os.path.join(work_dir, "db"),
+                                      embeddings=SlowEmbeddings(size=64), vector_backend="numpy")
+        queue = IngestionQueue(max_workers=2)
+        paths = []
+        for i in range(2):
+            path = os.path.join(work_dir, f"notes_{i}.txt")
+            with open(path, "w") as f:
+                f.write(f"Document {i}. " + "Some sentence about the project. " * 50)
+            paths.append(path)
+
+        # The same upload submitted twice while running is indexed once
+        first = queue.submit(processor, "chat", paths[0])
+        assert queue.submit(processor, "chat", paths[0]) is first
+        assert wait_for(first) == DONE
+        assert first.doc_info['files']['notes_0.txt']['chunks'] == first.chunks_done > 0
+
+        # A cancelled job leaves nothing behind in the corpus
+        second = queue.submit(processor, "chat", paths[1])
+        while second.status != "running":
+            time.sleep(0.01)
+        assert queue.cancel(second.job_id)
+        assert wait_for(second) == CANCELLED
+        info = processor.get_corpus_info("chat")
+        assert list(info['files']) == ["notes_0.txt"]
+        assert processor.open_corpus("chat").count() == info['chunks']
+
+        broken = os.path.join(work_dir, "broken.xyz")
+        with open(broken, "w") as f:
+            f.write("unsupported")
+        assert wait_for(queue.submit(processor, "chat", broken)) == FAILED
+        print([job.to_dict()['status'] for job in queue.jobs_for("chat")])
+        queue.shutdown()
+
+
+if __name__ == "__main__":
+    test_queue_dedup_cancel_and_failure()
+    print("Ingestion job tests passed")
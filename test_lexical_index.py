@@ -0,0 +1,72 @@
+import tempfile
+from lexical_index import LexicalIndex, SegmentBuilder, reciprocal_rank_fusion
+
+
+def build(chunks):
+    builder = SegmentBuilder()
+    for doc_id, text, file_name in chunks:
+        builder.add(doc_id, text, file_name)
+    return builder
+
+
+def test_exact_terms_filters_and_removal():
+    with tempfile.TemporaryDirectory() as work_dir:
+        index = LexicalIndex(work_dir)
+        index.add_segment(build([
+            ("a-0", "Pump ERR_4471 triggers an emergency shutdown.", "manual.pdf"),
+            ("a-1", "Check valve pressure every morning.", "manual.pdf"),
+        ]))
+        index.add_segment(build([
+            ("b-0", "Revenue grew after ERR_4471 was fixed in billing.", "report.pdf"),
+            ("b-1", "Northern region pricing changed.", "report.pdf"),
+        ]))
+
+        # Error codes match exactly, and their parts are searchable too
+        assert {doc_id for doc_id, _ in index.search("ERR_4471")} == {"a-0", "b-0"}
+        assert index.search("4471", file_names=["report.pdf"])[0][0] == "b-0"
+
+        index.remove(["a-0"])
+        assert [doc_id for doc_id, _ in index.search("ERR_4471")] == ["b-0"]
+
+        # Tombstones and segments survive a reload
+        reloaded = LexicalIndex(work_dir)
+        assert reloaded.num_docs == 3
+        assert [doc_id for doc_id, _ in reloaded.search("shutdown ERR_4471")] == ["b-0"]
+        print(f"Segments: {len(reloaded.segments)}, documents: {reloaded.num_docs}")
+
+
+def test_tombstoned_documents_do_not_skew_scores():
+    chunks = [(f"d-{i}", f"pump valve {'pressure ' * (i % 3)}note {i}", "manual.pdf") for i in range(20)]
+    with tempfile.TemporaryDirectory() as work_dir, tempfile.TemporaryDirectory() as fresh_dir:
+        index = LexicalIndex(work_dir)
+        index.add_segment(build(chunks))
+        # Under a quarter of the documents, so they stay as tombstones until a compaction
+        index.remove([f"d-{i}" for i in range(4)])
+        assert index.segments[0].num_docs == 20 and index.num_docs == 16
+        fresh = LexicalIndex(fresh_dir)
+        fresh.add_segment(build(chunks[4:]))
+        for query in ("pressure", "valve note 7", "pump"):
+            assert dict(index.search(query, k=20)) == dict(fresh.search(query, k=20))
+
+
+def test_repeated_terms_saturate_instead_of_wrapping():
+    with tempfile.TemporaryDirectory() as work_dir:
+        index = LexicalIndex(work_dir)
+        # 65536 occurrences would wrap to a tf of 0 in the uint16 postings
+        index.add_segment(build([("log", "pump " * 65536, "log.txt"), ("note", "pump valve", "note.txt")]))
+        assert [doc_id for doc_id, _ in index.search("pump")] == ["log", "note"]
+        assert index.search("pump", k=0) == [] and index.search("pump", k=-1) == []
+
+
+def test_reciprocal_rank_fusion():
+    fused = reciprocal_rank_fusion([["v1", "v2", "shared"], ["shared", "l1"]])
+    assert fused[0] == "shared"
+    assert set(fused) == {"v1", "v2", "shared", "l1"}
+
+
+if __name__ == "__main__":
+    test_exact_terms_filters_and_removal()
+    test_tombstoned_documents_do_not_skew_scores()
+    test_repeated_terms_saturate_instead_of_wrapping()
+    test_reciprocal_rank_fusion()
+    print("Lexical index tests passed")
@@ -0,0 +1,84 @@
+import time
+import threading
+import pytest
+from llm_client import LLMClient, LLMError, LLMTimeout, get_llm_limiter, get_llm_stats
+from llm_stub_server import start_stub_server
+
+
+def make_client(server, **kwargs):
+    return LLMClient(base_url=server.base_url, model="stub", **kwargs)
+
+
+def test_hedge_retry_and_deadline():
+    # The 1st request stalls: a hedge launched after 0.3s answers instead
+    server = start_stub_server(ttft=0.05, token_delay=0.001, stall_every=2, stall_seconds=5)
+    try:
+        hedges = get_llm_stats()['hedge_wins']
+        start = time.perf_counter()
+        answer = make_client(server, hedge_after=0.3, deadline=3).invoke("What is the pump pressure?").content
+        assert answer.startswith("Based on the uploaded documents")
+        assert time.perf_counter() - start < 2
+        assert get_llm_stats()['hedge_wins'] == hedges + 1
+
+        # Streaming yields the answer token by token
+        server.stall_every = 0
+        assert len(list(make_client(server, hedge_after=None).stream("hi"))) > 1
+
+        # A 503 is retried with backoff
+        retries = get_llm_stats()['retries']
+        server.fail_every = server.requests + 1
+        assert make_client(server, hedge_after=None, deadline=5).invoke("hi").content
+        assert get_llm_stats()['retries'] == retries + 1
+
+        # Stalled without hedging: the deadline cuts the request short
+        server.fail_every, server.stall_every = 0, 1
+        start = time.perf_counter()
+        with pytest.raises(LLMTimeout):
+            make_client(server, hedge_after=None, deadline=0.5).invoke("hi")
+        assert time.perf_counter() - start < 1.5
+    finally:
+        server.shutdown()
+
+
+def test_malformed_stream_events_are_llm_errors():
+    server = start_stub_server(ttft=0.01, token_delay=0.001, garble_every=2)
+    try:
+        # The 2nd answer is garbled: it is retried like any other failed attempt
+        assert make_client(server, hedge_after=None).invoke("hi").content
+        retries = get_llm_stats()['retries']
+        assert make_client(server, hedge_after=None, deadline=5).invoke("hi").content
+        assert get_llm_stats()['retries'] == retries + 1 and server.requests == 3
+
+        # Garbled every time: the last attempt's failure still reaches the caller as an LLMError
+        server.garble_every = 1
+        with pytest.raises(LLMError, match="Malformed stream event"):
+            make_client(server, hedge_after=None, deadline=5).invoke("hi")
+    finally:
+        server.shutdown()
+
+
+def test_concurrency_limit_queues_requests():
+    server = start_stub_server(ttft=0.2, token_delay=0.001)
+    limiter = get_llm_limiter()
+    previous = limiter.limit
+    limiter.resize(2)
+    try:
+        answers = []
+        threads = [threading.Thread(target=lambda: answers.append(make_client(server, hedge_after=None).invoke("hi")))
+                   for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(answers) == 6
+        assert server.max_in_flight == 2
+    finally:
+        limiter.resize(previous)
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    test_hedge_retry_and_deadline()
+    test_malformed_stream_events_are_llm_errors()
+    test_concurrency_limit_queues_requests()
+    print("LLM client tests passed")
@@ -0,0 +1,61 @@
+import os
+import tempfile
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from chatbot_engine import ChatbotEngine
+from conversation_memory import ConversationMemory, _approximate_token_count
+from document_processor import DocumentProcessor
+from fake_llm import FakeStreamingChatModel
+from metrics import Metrics, get_metrics
+
+
+def test_histogram_snapshot_and_prometheus():
+    metrics = Metrics(enabled=True)
+    for ms in range(1, 101):
+        metrics.observe("search", ms / 1000)
+    metrics.increment("questions", 3)
+    stage = metrics.snapshot()['stages']['search']
+    assert stage['count'] == 100
+    assert 40 <= stage['p50_ms'] <= 60 and 90 <= stage['p99_ms'] <= 100
+    text = metrics.render_prometheus()
+    assert 'docuchat_stage_seconds_bucket{stage="search",le="+Inf"} 100' in text
+    assert "docuchat_questions_total 3" in text
+
+    disabled = Metrics()
+    with disabled.time("search"):
+        pass
+    disabled.increment("questions")
+    assert disabled.snapshot()['stages'] == {} and disabled.snapshot()['counters'] == {}
+
+
+def test_ingest_and_answer_stages_are_recorded():
+    metrics = get_metrics()
+    enabled = metrics.enabled
+    metrics.enabled = True
+    metrics.reset()
+    try:
+        with tempfile.TemporaryDirectory() as work_dir:
+            path = os.path.join(work_dir, "notes.txt")
+            with open(path, "w") as f:
+                f.write("The pump runs at four bar. " * 200)
+            processor = DocumentProcessor(chunk_size=200, chunk_overlap=20, persist_dir=os.path.join(work_dir, "db"),
+                                          embeddings=DeterministicFakeEmbedding(size=64), vector_backend="numpy")
+            vectorstore, _ = processor.process_document(path)
+            engine = ChatbotEngine(vectorstore, llm=FakeStreamingChatModel(response="Four bar."),
+                                   memory=ConversationMemory(count_tokens=_approximate_token_count))
+            assert "".join(engine.stream_response("What pressure does the pump run at?"))
+
+        snapshot = metrics.snapshot()
+        for stage in ("load", "split", "embed", "store", "ingest_total", "llm_first_token", "answer_total"):
+            assert snapshot['stages'][stage]['count'] >= 1, stage
+        assert snapshot['counters']['chunks'] > 0
+        assert snapshot['counters']['questions'] == 1
+        print(metrics.render_prometheus())
+    finally:
+        metrics.reset()
+        metrics.enabled = enabled
+
+
+if __name__ == "__main__":
+    test_histogram_snapshot_and_prometheus()
+    test_ingest_and_answer_stages_are_recorded()
+    print("Metrics tests passed")
@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+
+TEXTS = [
+    "What is the maximum operating pressure of the pump?",
+    "Inspect every valve for leaks before restarting the system.",
+    "The warranty does not cover damage caused by improper installation.",
+    "Chapter 3 describes the quarterly maintenance schedule in detail, including filter replacement, "
+    "lubrication points and the torque values for each flange bolt on the primary circuit.",
+    "short",
+]
+
+
+def load_onnx(variant):
+    from onnx_embeddings import OnnxEmbeddings
+    try:
+        return OnnxEmbeddings("all-MiniLM-L6-v2", variant=variant)
+    except Exception as e:
+        pytest.skip(f"{variant} model files unavailable: {e}")
+
+
+@pytest.mark.parametrize("variant, min_cosine", [("onnx", 0.999), ("onnx-int8", 0.97)])
+def test_onnx_embeddings_match_torch(variant, min_cosine):
+    pytest.importorskip("onnxruntime")
+    pytest.importorskip("sentence_transformers")
+    from langchain_huggingface import HuggingFaceEmbeddings
+
+    onnx_model = load_onnx(variant)
+    torch_model = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2", model_kwargs={'device': 'cpu'},
+                                        encode_kwargs={'normalize_embeddings': True})
+
+    expected = np.asarray(torch_model.embed_documents(TEXTS))
+    actual = np.asarray(onnx_model.embed_documents(TEXTS))
+    # Both sides are L2-normalized, so the row-wise dot product is the cosine similarity
+    cosines = (expected * actual).sum(axis=1)
+    print(f"{variant}: min cosine {cosines.min():.5f}")
+    assert actual.shape == expected.shape
+    assert cosines.min() >= min_cosine
+    assert np.allclose(onnx_model.embed_query(TEXTS[0]), actual[0], atol=1e-5)
+
+
+if __name__ == "__main__":
+    for variant, min_cosine in [("onnx", 0.999), ("onnx-int8", 0.97)]:
+        test_onnx_embeddings_match_torch(variant, min_cosine)
+    print("ONNX parity test passed")
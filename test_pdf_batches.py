@@ -0,0 +1,66 @@
+import io
+import os
+import tempfile
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from document_processor import DocumentProcessor
+from collection_registry import file_content_hash
+from benchmarks.synthetic_docs import make_document
+
+PAGES = 12
+
+
+def make_processor(work_dir, name, **kwargs):
+    return DocumentProcessor(chunk_size=400, chunk_overlap=40, persist_dir=os.path.join(work_dir, name),
+                             embeddings=DeterministicFakeEmbedding(size=32), vector_backend="numpy", **kwargs)
+
+
+def ingest(processor, source, file_name=None):
+    progress = []
+    _, doc_info = processor.process_document(source, file_name=file_name,
+                                             progress_callback=lambda *update: progress.append(update))
+    return doc_info, progress
+
+
+def test_pooled_batches_match_single_process():
+    with tempfile.TemporaryDirectory() as work_dir:
+        path = make_document(work_dir, "pdf", PAGES)
+        expected, _ = ingest(make_processor(work_dir, "single", pdf_workers=1, batch_pages=PAGES,
+                                            use_text_cache=False), path)
+        assert expected['pages'] == PAGES and expected['chunks'] > PAGES
+
+        with open(path, "rb") as f:
+            data = f.read()
+        # A path, and in-memory uploads that reach the workers through shared memory
+        for name, source in (("path", path), ("bytesio", io.BytesIO(data)), ("memoryview", memoryview(data))):
+            processor = make_processor(work_dir, name, pdf_workers=2, batch_pages=3, use_text_cache=False)
+            doc_info, progress = ingest(processor, source, None if name == "path" else "manual.pdf")
+            assert (doc_info['pages'], doc_info['chunks']) == (expected['pages'], expected['chunks']), name
+            assert len(progress) == PAGES // 3
+            assert all(total == PAGES for _, total, _ in progress)
+            assert all(a[0] < b[0] and a[2] <= b[2] for a, b in zip(progress, progress[1:]))
+            assert progress[-1] == (PAGES, PAGES, expected['chunks'])
+
+
+def test_failed_ingestion_releases_the_text_cache_lock():
+    with tempfile.TemporaryDirectory() as work_dir:
+        path = make_document(work_dir, "pdf", PAGES)
+        processor = make_processor(work_dir, "db", pdf_workers=2, batch_pages=3)
+
+        def cancel(pages_done, total_pages, chunks_done):
+            raise RuntimeError("cancelled")
+
+        try:
+            processor.process_document(path, progress_callback=cancel)
+        except Exception as e:
+            # Holding the error keeps the failed call's frames alive, as a job that records it would
+            error = e
+        assert "cancelled" in str(error)
+        writer = processor.text_cache.writer(file_content_hash(path), PAGES)
+        assert writer is not None, "the batch generator still holds the text cache entry"
+        writer.close()
+
+
+if __name__ == "__main__":
+    test_pooled_batches_match_single_process()
+    test_failed_ingestion_releases_the_text_cache_lock()
+    print("PDF batch tests passed")
@@ -1,6 +1,7 @@
 import os
 import sys
 from document_processor import DocumentProcessor
+from embedding_registry import get_registry_stats
 
 def test_document_processor(file_path):
     if not os.path.exists(file_path):
@@ -9,8 +10,10 @@ def test_document_processor(file_path):
 
     print(f"--- Processing Document: {file_path} ---")
     
-    # Initialize processor
+    # Initialize processor (two processors must share a single embedding model)
     processor = DocumentProcessor()
+    second_processor = DocumentProcessor()
+    assert processor.embeddings is second_processor.embeddings, "Embedding model was loaded twice"
     
     try:
         # Load the document
@@ -45,6 +48,15 @@ def test_document_processor(file_path):
             print(f"Embedding dimensions: {len(embedding)}")
             print(f"Embedding preview (first 5 values): {embedding[:5]}")
 
+        # Confirm only one copy of the model is resident
+        registry_stats = get_registry_stats()
+        print("\n--- Embedding Registry ---")
+        print(f"Models loaded: {registry_stats['models_loaded']}")
+        print(f"Process RSS (MB): {registry_stats['rss_mb']}")
+        for model_stats in registry_stats['models']:
+            print(f"{model_stats['model_name']}: loaded in {model_stats['load_seconds']}s, "
+                  f"RSS delta {model_stats['rss_delta_mb']} MB, requests {model_stats['requests']}")
+
     except Exception as e:
         print(f"An error occurred: {e}")
 
@@ -0,0 +1,70 @@
+import time
+import threading
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from query_batcher import MicroBatcher, QueryBatcher
+from vector_backends import NumpyVectorStore
+
+
+def test_concurrent_queries_are_batched_and_routed_back():
+    embeddings = DeterministicFakeEmbedding(size=64)
+    store = NumpyVectorStore.from_texts([f"chunk number {i}" for i in range(500)], embeddings,
+                                        metadatas=[{'file_name': f"file_{i % 2}.txt"} for i in range(500)])
+    batcher = QueryBatcher(max_batch_size=16, max_wait_ms=50)
+    questions = [f"question {i}" for i in range(32)]
+    filters = [{'file_name': "file_1.txt"} if i % 3 == 0 else None for i in range(32)]
+    results = {}
+    barrier = threading.Barrier(len(questions))
+
+    def ask(i):
+        barrier.wait()
+        vector = batcher.embed_query(embeddings, questions[i])
+        results[i] = (vector, batcher.search(store, vector, 5, filters[i]))
+
+    threads = [threading.Thread(target=ask, args=(i,)) for i in range(len(questions))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    for i, question in enumerate(questions):
+        vector, docs = results[i]
+        # Each caller gets exactly what an unbatched call would have returned
+        assert vector == embeddings.embed_query(question)
+        search_kwargs = {'filter': filters[i]} if filters[i] else {}
+        assert [doc.id for doc in docs] == [doc.id for doc in store.similarity_search_by_vector(vector, k=5,
+                                                                                               **search_kwargs)]
+    stats = batcher.stats()
+    assert stats['embed_queries'] == stats['search_queries'] == len(questions)
+    assert stats['embed_batches'] < len(questions) and stats['search_batches'] < len(questions)
+
+
+def test_failed_batches_fail_their_callers_and_the_worker_keeps_going():
+    class Interrupted(BaseException):
+        pass
+
+    def batch_fn(key, items):
+        if key == "short":
+            return items[:-1]
+        if key == "interrupt":
+            raise Interrupted()
+        if key == "slow":
+            time.sleep(0.3)
+        return [item * 2 for item in items]
+
+    batcher = MicroBatcher(batch_fn, max_wait_ms=1, timeout=0.1)
+    for key, error in (("short", RuntimeError), ("interrupt", Interrupted), ("slow", TimeoutError)):
+        try:
+            batcher(key, 1)
+        except error:
+            pass
+        else:
+            raise AssertionError(f"{key}: expected {error.__name__}")
+    # Runs once the slow batch is done
+    batcher.timeout = 5
+    assert batcher("fine", 21) == 42
+
+
+if __name__ == "__main__":
+    test_concurrent_queries_are_batched_and_routed_back()
+    test_failed_batches_fail_their_callers_and_the_worker_keeps_going()
+    print("Query batcher test passed")
@@ -0,0 +1,62 @@
+import os
+
+# Offline test: never reach out to the Hugging Face Hub
+os.environ.setdefault("HF_HUB_OFFLINE", "1")
+
+import time
+import asyncio
+from langchain_core.vectorstores import InMemoryVectorStore
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from chatbot_engine import ChatbotEngine
+from fake_llm import FakeStreamingChatModel
+
+ANSWER = " ".join(f"token{i}" for i in range(50))
+
+
+def build_engine(token_delay=0.01):
+    vectorstore = InMemoryVectorStore(DeterministicFakeEmbedding(size=64))
+    vectorstore.add_texts([
+        "Python and machine learning are listed under skills.",
+        "The candidate worked as a data engineer for five years.",
+        "Education: BSc in Computer Science."
+    ])
+    llm = FakeStreamingChatModel(response=ANSWER, token_delay=token_delay)
+    return ChatbotEngine(vectorstore, top_k=2, llm=llm)
+
+
+def test_stream_response():
+    engine = build_engine()
+    start = time.perf_counter()
+    first_token_at = None
+    tokens = []
+    for token in engine.stream_response("What are the key skills?"):
+        if first_token_at is None:
+            first_token_at = time.perf_counter() - start
+        tokens.append(token)
+    total = time.perf_counter() - start
+
+    print(f"Time to first token: {first_token_at * 1000:.1f} ms, total: {total * 1000:.1f} ms")
+    print(f"Stage timings (ms): {engine.last_timings}")
+    assert "".join(tokens).strip() == ANSWER
+    assert len(tokens) == 50
+    assert first_token_at < total / 5
+    assert len(engine.last_sources) == 2
+    assert engine.history[-1] == {"role": "Assistant", "content": ANSWER}
+
+
+def test_astream_response():
+    engine = build_engine(token_delay=0.0)
+
+    async def collect():
+        return [token async for token in engine.astream_response("What are the key skills?")]
+
+    tokens = asyncio.run(collect())
+    assert "".join(tokens).strip() == ANSWER
+    assert len(engine.last_sources) == 2
+    assert len(engine.history) == 2
+
+
+if __name__ == "__main__":
+    test_stream_response()
+    test_astream_response()
+    print("Streaming tests passed.")
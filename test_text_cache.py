@@ -0,0 +1,59 @@
+import os
+import tempfile
+from langchain_core.embeddings import DeterministicFakeEmbedding
+import document_processor
+from document_processor import DocumentProcessor
+from collection_registry import file_content_hash
+from benchmarks.synthetic_docs import make_document
+
+
+def make_processor(work_dir, **kwargs):
+    return DocumentProcessor(persist_dir=os.path.join(work_dir, "db"), embeddings=DeterministicFakeEmbedding(size=64),
+                             vector_backend="numpy", pdf_workers=1, **kwargs)
+
+
+def test_rechunk_and_resume_without_reparsing():
+    extract = document_processor.extract_pdf_pages
+    extracted = []
+
+    def counting_extract(source, start, end):
+        extracted.append(start)
+        return extract(source, start, end)
+
+    document_processor.extract_pdf_pages = counting_extract
+    try:
+        with tempfile.TemporaryDirectory() as work_dir:
+            path = make_document(work_dir, "pdf", 12)
+            content_hash = file_content_hash(path)
+
+            # Interrupted after two batches: the pages parsed so far stay cached
+            batches = make_processor(work_dir, batch_pages=4).iter_document_batches(path)
+            next(batches)
+            next(batches)
+            batches.close()
+            processor = make_processor(work_dir, chunk_size=300, chunk_overlap=30, batch_pages=4)
+            assert processor.text_cache.get(content_hash).pages == 8
+
+            # Re-ingesting parses only the remaining pages
+            extracted.clear()
+            _, doc_info = processor.process_document(path)
+            assert extracted == [8] and doc_info['pages'] == 12
+            def page_texts(processor):
+                return [doc.page_content for documents, _ in processor.iter_document_batches(path) for doc in documents]
+            assert page_texts(processor) == page_texts(make_processor(work_dir, use_text_cache=False))
+
+            # Other chunk settings: served from the cache, nothing is parsed
+            extracted.clear()
+            _, doc_info = make_processor(work_dir, chunk_size=600, chunk_overlap=60).process_document(path)
+            assert extracted == [] and doc_info['pages'] == 12
+            chunks = processor.rechunk(content_hash, "manual.pdf", chunk_size=600, chunk_overlap=60)
+            assert len(chunks) == doc_info['chunks']
+            assert chunks[0].metadata['page_label'] == "1"
+            print(processor.text_cache.get_stats())
+    finally:
+        document_processor.extract_pdf_pages = extract
+
+
+if __name__ == "__main__":
+    test_rechunk_and_resume_without_reparsing()
+    print("Text cache tests passed")
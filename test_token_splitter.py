@@ -0,0 +1,87 @@
+import os
+import string
+import tempfile
+from tokenizers import Tokenizer, models, normalizers, pre_tokenizers
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from document_processor import DocumentProcessor, processor_from_env
+from token_splitter import ApproximateTokenizer, ModelTokenizer, TokenTextSplitter, DEFAULT_CHUNK_TOKENS
+from benchmarks.bench_embedding_cache import WORDS
+
+
+def make_tokenizer():
+    """Small BERT-style WordPiece tokenizer: known words are one token, others split into letters"""
+    vocab = ["[UNK]"] + WORDS + list(string.ascii_lowercase + string.digits + string.punctuation)
+    vocab += [f"##{c}" for c in string.ascii_lowercase + string.digits]
+    tokenizer = Tokenizer(models.WordPiece({piece: i for i, piece in enumerate(vocab)}, unk_token="[UNK]"))
+    tokenizer.normalizer = normalizers.BertNormalizer(lowercase=True)
+    tokenizer.pre_tokenizer = pre_tokenizers.BertPreTokenizer()
+    return tokenizer
+
+
+def test_chunks_fit_the_token_limit_and_map_back_to_pages():
+    tokenizer = make_tokenizer()
+    splitter = TokenTextSplitter(chunk_tokens=64, overlap_tokens=8, tokenizer=ModelTokenizer(tokenizer))
+    pages = [Document(page_content=f"Page {page}. " + " ".join(WORDS[(page + i) % len(WORDS)] for i in range(300))
+                      + ".\n\nAppendix: Supercalifragilistic measurements 12345 follow. " * 3,
+                      metadata={'page': page}) for page in range(3)]
+    chunks = splitter.split_documents(pages)
+
+    for chunk in chunks:
+        assert len(tokenizer.encode(chunk.page_content, add_special_tokens=False).ids) <= 64
+        page = pages[chunk.metadata['page']].page_content
+        assert page[chunk.metadata['start_index']:chunk.metadata['end_index']] == chunk.page_content
+    # Consecutive chunks of a page overlap and together cover it
+    first_page = [chunk for chunk in chunks if chunk.metadata['page'] == 0]
+    assert all(b.metadata['start_index'] < a.metadata['end_index'] for a, b in zip(first_page, first_page[1:]))
+    assert first_page[-1].metadata['end_index'] == len(pages[0].page_content.rstrip())
+
+    # The processor uses it with sizes in tokens
+    with tempfile.TemporaryDirectory() as work_dir:
+        path = os.path.join(work_dir, "notes.txt")
+        with open(path, "w") as f:
+            f.write(pages[0].page_content * 20)
+        processor = DocumentProcessor(chunk_size=64, chunk_overlap=8, splitter="tokens",
+                                      persist_dir=os.path.join(work_dir, "db"),
+                                      embeddings=DeterministicFakeEmbedding(size=16), vector_backend="numpy")
+        processor.text_splitter = splitter
+        vectorstore, doc_info = processor.process_document(path)
+        assert doc_info['chunks'] == vectorstore.count() > 20
+        print(f"{len(chunks)} chunks from 3 pages; {doc_info['chunks']} chunks indexed")
+
+
+def test_approximate_tokenizer_does_not_undercount():
+    tokenizer = ApproximateTokenizer()
+    # BERT gives every CJK character its own token and splits long numbers into short pieces
+    assert len(tokenizer.token_spans(["東京都の水道局は毎月点検する"])[0]) == 14
+    assert len(tokenizer.token_spans(["20240117 1234567"])[0]) >= 6
+    splitter = TokenTextSplitter(chunk_tokens=64, overlap_tokens=8, tokenizer=tokenizer)
+    chunks = splitter.split_offsets(["水道局は毎月点検する。" * 40])[0]
+    assert all(end - start <= 64 for start, end in chunks) and len(chunks) < 10
+
+
+def test_processor_defaults_follow_the_splitter():
+    with tempfile.TemporaryDirectory() as work_dir:
+        options = dict(persist_dir=work_dir, embeddings=DeterministicFakeEmbedding(size=16), vector_backend="numpy")
+        tokens = DocumentProcessor(splitter="tokens", **options)
+        assert tokens.chunk_size == tokens.text_splitter.chunk_tokens == DEFAULT_CHUNK_TOKENS
+        characters = DocumentProcessor(splitter="characters", **options)
+        assert (characters.chunk_size, characters.chunk_overlap) == (1000, 100)
+        # Without DOCUCHAT_CHUNK_* overrides the env helper keeps the same defaults
+        if "DOCUCHAT_CHUNK_SIZE" not in os.environ and "DOCUCHAT_CHUNK_OVERLAP" not in os.environ:
+            for splitter, processor in (("tokens", tokens), ("characters", characters)):
+                from_env = processor_from_env(splitter=splitter, **options)
+                assert (from_env.chunk_size, from_env.chunk_overlap) == (processor.chunk_size, processor.chunk_overlap)
+        try:
+            DocumentProcessor(chunk_size=1000, splitter="tokens", **options)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError("a token chunk_size beyond the model's sequence length was accepted")
+
+
+if __name__ == "__main__":
+    test_chunks_fit_the_token_limit_and_map_back_to_pages()
+    test_approximate_tokenizer_does_not_undercount()
+    test_processor_defaults_follow_the_splitter()
+    print("Token splitter tests passed")
@@ -0,0 +1,92 @@
+import os
+import tempfile
+import threading
+import numpy as np
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from vector_backends import NumpyVectorStore
+
+
+def test_numpy_store_matches_brute_force_and_persists():
+    embeddings = DeterministicFakeEmbedding(size=64)
+    texts = [f"chunk number {i}" for i in range(300)]
+    metadatas = [{'file_name': f"file_{i % 3}.txt"} for i in range(300)]
+    ids = [f"id-{i}" for i in range(300)]
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        store = NumpyVectorStore(embeddings, work_dir)
+        store.add_texts(texts[:100], metadatas[:100], ids[:100])
+        store.add_texts(texts[100:], metadatas[100:], ids[100:])
+
+        query = embeddings.embed_query("chunk number 42")
+        matrix = np.asarray(embeddings.embed_documents(texts), dtype=np.float32)
+        expected = [ids[i] for i in np.argsort(-(matrix @ np.asarray(query, dtype=np.float32)))[:5]]
+        assert [doc.id for doc in store.similarity_search_by_vector(query, k=5)] == expected
+
+        filtered = store.similarity_search_by_vector(query, k=5, filter={"file_name": {"$in": ["file_1.txt"]}})
+        assert all(doc.metadata['file_name'] == "file_1.txt" for doc in filtered)
+
+        store.delete(ids[:150])
+        reopened = NumpyVectorStore(embeddings, work_dir)
+        assert reopened.count() == 150
+        assert isinstance(reopened._matrix, np.memmap)
+        assert reopened.get_by_ids(["id-0", "id-200"])[0].page_content == "chunk number 200"
+        print(f"Rows after delete and reload: {reopened.count()}")
+
+
+def test_search_during_delete_returns_matching_chunks():
+    """A file removed on the ingestion thread while chats search must not shift rows under them"""
+    embeddings = DeterministicFakeEmbedding(size=64)
+    texts = [f"chunk number {i}" for i in range(20000)]
+    vectors = embeddings.embed_documents(texts[:100]) * 200
+    ids = [f"id-{i}" for i in range(20000)]
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        store = NumpyVectorStore(embeddings, work_dir)
+        store.add_vectors(texts, vectors, ids=ids)
+        query = embeddings.embed_query("chunk number 7")
+        stop = threading.Event()
+
+        def churn():
+            while not stop.is_set():
+                store.delete(ids[:1000])
+                store.add_vectors(texts[:1000], vectors[:1000], ids=ids[:1000])
+
+        thread = threading.Thread(target=churn)
+        thread.start()
+        try:
+            for _ in range(200):
+                for doc in store.similarity_search_by_vector(query, k=10):
+                    assert doc.page_content == f"chunk number {doc.id[3:]}"
+        finally:
+            stop.set()
+            thread.join()
+
+
+def test_interrupted_delete_keeps_the_collection():
+    embeddings = DeterministicFakeEmbedding(size=16)
+    with tempfile.TemporaryDirectory() as work_dir:
+        store = NumpyVectorStore(embeddings, work_dir)
+        store.add_texts(["alpha", "beta", "gamma"], ids=["a", "b", "c"])
+
+        def crash():
+            raise OSError("disk full")
+
+        # Dies after writing the kept rows, before switching meta.json over to them
+        store._write_meta = crash
+        try:
+            store.delete(["a"])
+        except OSError:
+            pass
+        reopened = NumpyVectorStore(embeddings, work_dir)
+        assert [doc.page_content for doc in reopened.get_by_ids(["a", "b", "c"])] == ["alpha", "beta", "gamma"]
+
+        reopened.delete(["a"])
+        assert [doc.id for doc in NumpyVectorStore(embeddings, work_dir).get_by_ids(["a", "b", "c"])] == ["b", "c"]
+        assert sorted(os.listdir(work_dir)) == ["chunks.1.jsonl", "meta.json", "vectors.1.bin"]
+
+
+if __name__ == "__main__":
+    test_numpy_store_matches_brute_force_and_persists()
+    test_search_during_delete_returns_matching_chunks()
+    test_interrupted_delete_keeps_the_collection()
+    print("Vector backend tests passed")
@@ -0,0 +1,251 @@
+"""
+On-disk cache of extracted page text, keyed by file content hash.
+
+Each document is stored as two files:
+- <hash>.txt: the UTF-8 text of every page, concatenated
+- <hash>.json: byte offsets of the page boundaries, page labels, the page count of the
+  source and whether extraction finished
+
+Pages are appended as they are extracted, so an ingestion that crashes part-way leaves a
+partial entry and extraction resumes after the last cached page. Re-chunking with new
+chunk settings reads pages from the cache instead of re-parsing the PDF or DOCX.
+"""
+import os
+import json
+import logging
+import threading
+from typing import Iterator, List, Optional, Tuple
+from file_lock import FileLock
+
+DEFAULT_MAX_MB = float(os.getenv("DOCUCHAT_TEXT_CACHE_MAX_MB", "2048"))
+FORMAT_VERSION = 1
+
+# (page_label, text) pairs, as returned by pdf_extraction.extract_pdf_pages
+Pages = List[Tuple[Optional[str], str]]
+
+
+class TextCacheEntry:
+    """Read access to one cached document"""
+
+    def __init__(self, cache: "TextCache", content_hash: str, index: dict):
+        self.cache = cache
+        self.content_hash = content_hash
+        self.offsets: List[int] = index['offsets']
+        self.labels: List[Optional[str]] = index['labels']
+        self.total_pages: int = index['total_pages']
+        self.complete: bool = index['complete']
+
+    @property
+    def pages(self) -> int:
+        """Pages cached so far (total_pages once complete)"""
+        return len(self.offsets) - 1
+
+    def read_pages(self, start: int, end: int) -> Pages:
+        """(label, text) for cached pages [start, end), read with one seek"""
+        end = min(end, self.pages)
+        if start >= end:
+            return []
+        with open(self.cache.text_path(self.content_hash), "rb") as f:
+            f.seek(self.offsets[start])
+            data = f.read(self.offsets[end] - self.offsets[start])
+        base = self.offsets[start]
+        return [(self.labels[page], data[self.offsets[page] - base:self.offsets[page + 1] - base].decode("utf-8"))
+                for page in range(start, end)]
+
+    def iter_pages(self, batch_pages: int) -> Iterator[Tuple[int, Pages]]:
+        """Yield (first_page, pages) in batches of batch_pages"""
+        for start in range(0, self.pages, batch_pages):
+            yield start, self.read_pages(start, start + batch_pages)
+
+
+class TextCacheWriter:
+    """Appends extracted pages to an entry; the index is rewritten after every batch"""
+
+    def __init__(self, cache: "TextCache", content_hash: str, total_pages: int,
+                 entry: Optional[TextCacheEntry] = None, lock: Optional[FileLock] = None):
+        self.cache = cache
+        self.lock = lock
+        self.content_hash = content_hash
+        self.total_pages = total_pages
+        self.offsets = list(entry.offsets) if entry else [0]
+        self.labels = list(entry.labels) if entry else []
+        # Resuming: drop anything written after the last indexed page
+        self._file = open(cache.text_path(content_hash), "r+b" if entry else "wb")
+        self._file.truncate(self.offsets[-1])
+        self._file.seek(self.offsets[-1])
+
+    def append(self, pages: Pages):
+        for label, text in pages:
+            self._file.write(text.encode("utf-8"))
+            self.offsets.append(self._file.tell())
+            self.labels.append(label)
+        self._file.flush()
+        self._write_index(complete=False)
+
+    def finish(self, total_pages: Optional[int] = None):
+        """Mark the entry complete (total_pages for sources whose page count is only known at the end)"""
+        if total_pages is not None:
+            self.total_pages = total_pages
+        self._write_index(complete=True)
+        self.close()
+        self.cache._prune()
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+        if self.lock is not None:
+            self.lock.release()
+            self.lock = None
+        self.cache._release(self.content_hash)
+
+    def _write_index(self, complete: bool):
+        index_path = self.cache.index_path(self.content_hash)
+        tmp_path = f"{index_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({'format': FORMAT_VERSION, 'total_pages': self.total_pages, 'complete': complete,
+                       'offsets': self.offsets, 'labels': self.labels}, f, separators=(",", ":"))
+        os.replace(tmp_path, index_path)
+
+
+class TextCache:
+    """Directory of cached documents, bounded to max_mb by evicting the least recently used"""
+
+    def __init__(self, cache_dir: str, max_mb: float = DEFAULT_MAX_MB):
+        self.cache_dir = cache_dir
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.hits = 0
+        self.misses = 0
+        self._writing = set()
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def text_path(self, content_hash: str) -> str:
+        return os.path.join(self.cache_dir, f"{content_hash}.txt")
+
+    def index_path(self, content_hash: str) -> str:
+        return os.path.join(self.cache_dir, f"{content_hash}.json")
+
+    def lock_path(self, content_hash: str) -> str:
+        return os.path.join(self.cache_dir, f"{content_hash}.lock")
+
+    def get(self, content_hash: str) -> Optional[TextCacheEntry]:
+        """The cached entry (possibly partial), or None"""
+        try:
+            with open(self.index_path(content_hash)) as f:
+                index = json.load(f)
+            if index.get('format') != FORMAT_VERSION:
+                return None
+            if os.path.getsize(self.text_path(content_hash)) < index['offsets'][-1]:
+                raise ValueError("text file is shorter than its index")
+            os.utime(self.index_path(content_hash))  # recency for eviction
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError) as e:
+            logging.error(f"Discarding unreadable text cache entry {content_hash}: {str(e)}")
+            self.delete(content_hash)
+            return None
+        return TextCacheEntry(self, content_hash, index)
+
+    def lookup(self, content_hash: str) -> Optional[TextCacheEntry]:
+        """Like get(), counting a hit only for a complete entry"""
+        entry = self.get(content_hash)
+        with self._lock:
+            if entry is not None and entry.complete:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return entry
+
+    def writer(self, content_hash: str, total_pages: int,
+               entry: Optional[TextCacheEntry] = None) -> Optional[TextCacheWriter]:
+        """
+        A writer that creates the entry (or extends a partial one), or None if another
+        ingestion (in this or another process) is already writing it.
+        """
+        with self._lock:
+            if content_hash in self._writing:
+                return None
+            self._writing.add(content_hash)
+        lock = FileLock(self.lock_path(content_hash))
+        try:
+            if not lock.acquire(blocking=False):
+                self._release(content_hash)
+                return None
+        except OSError as e:
+            logging.error(f"Could not lock text cache entry {content_hash}: {str(e)}")
+            self._release(content_hash)
+            return None
+        try:
+            return TextCacheWriter(self, content_hash, total_pages, entry, lock)
+        except OSError as e:
+            logging.error(f"Could not write text cache entry {content_hash}: {str(e)}")
+            lock.release()
+            self._release(content_hash)
+            return None
+
+    def _release(self, content_hash: str):
+        with self._lock:
+            self._writing.discard(content_hash)
+
+    def delete(self, content_hash: str):
+        for path in (self.index_path(content_hash), self.text_path(content_hash)):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def _prune(self):
+        """Evict least recently used entries until the cache fits in max_bytes"""
+        entries = []
+        total = 0
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".json"):
+                continue
+            content_hash = name[:-len(".json")]
+            try:
+                size = os.path.getsize(self.text_path(content_hash)) + os.path.getsize(self.index_path(content_hash))
+                entries.append((os.path.getmtime(self.index_path(content_hash)), content_hash, size))
+            except OSError:
+                continue
+            total += size
+        for _, content_hash, size in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            with self._lock:
+                if content_hash in self._writing:
+                    continue
+            # Entries another process is writing are skipped too
+            lock = FileLock(self.lock_path(content_hash))
+            if not lock.acquire(blocking=False):
+                continue
+            try:
+                self.delete(content_hash)
+                os.remove(self.lock_path(content_hash))
+            except FileNotFoundError:
+                pass
+            finally:
+                lock.release()
+            total -= size
+
+    def get_stats(self) -> dict:
+        entries = [name for name in os.listdir(self.cache_dir) if name.endswith(".json")]
+        return {
+            'entries': len(entries),
+            'size_mb': round(sum(os.path.getsize(os.path.join(self.cache_dir, name))
+                                 for name in os.listdir(self.cache_dir)) / (1024 * 1024), 2),
+            'hits': self.hits,
+            'misses': self.misses,
+        }
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_text_cache(cache_dir: str) -> TextCache:
+    """Process-wide cache per directory, shared by every processor"""
+    cache_dir = os.path.abspath(cache_dir)
+    with _caches_lock:
+        if cache_dir not in _caches:
+            _caches[cache_dir] = TextCache(cache_dir)
+        return _caches[cache_dir]
@@ -0,0 +1,188 @@
+"""
+Token-aware text splitter that works on character offsets.
+
+Chunks are sized in the embedding model's own tokens, so no chunk is longer than the model's
+input limit (MiniLM truncates at 256 tokens, silently dropping the rest of a longer chunk).
+Pages are tokenized with batched encode_batch calls of the Rust tokenizer and token offsets are
+kept as NumPy arrays; chunk boundaries are chosen from them with binary searches, preferring
+paragraph, then sentence or line ends, and each chunk is a single slice of its page. Chunks keep the page metadata plus
+start_index/end_index character offsets for citations and the context packer.
+"""
+import logging
+import threading
+from typing import Dict, List, Sequence, Tuple
+import numpy as np
+from langchain_core.documents import Document
+from embedding_registry import DEFAULT_MODEL_NAME
+from onnx_embeddings import MAX_SEQ_LENGTH
+
+# [CLS] and [SEP] take two of the model's positions; longer chunks would be truncated when embedded
+MAX_CHUNK_TOKENS = MAX_SEQ_LENGTH - 2
+DEFAULT_CHUNK_TOKENS = MAX_CHUNK_TOKENS
+DEFAULT_OVERLAP_TOKENS = 32
+# Texts tokenized per encode_batch call; bounds the token offsets held at once
+TOKENIZE_BATCH = 64
+# Word pieces assumed per this many characters of a letter or digit run when no tokenizer is
+# available (rare words split into short pieces, long numbers into two or three digits each)
+APPROXIMATE_LETTER_CHARS = 4
+APPROXIMATE_DIGIT_CHARS = 2
+
+SENTENCE_ENDS = (". ", "! ", "? ")
+# Longest word, in pieces, that the overlap start is moved back to the beginning of
+MAX_WORD_PIECES = 10
+
+# Character classes for ApproximateTokenizer: space, ASCII letter, digit, punctuation, and any
+# other (non-ASCII) character, which BERT tokenizers split into at least one token each
+_SPACE, _LETTER, _DIGIT, _PUNCT, _OTHER = 0, 1, 2, 3, 4
+_ASCII_CLASS = np.full(128, _PUNCT, dtype=np.uint8)
+_ASCII_CLASS[[9, 10, 11, 12, 13, 32]] = _SPACE
+_ASCII_CLASS[[ord(c) for c in "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ_"]] = _LETTER
+_ASCII_CLASS[[ord(c) for c in "0123456789"]] = _DIGIT
+
+_tokenizers: Dict[str, object] = {}
+_tokenizers_lock = threading.Lock()
+
+
+class ApproximateTokenizer:
+    """
+    Stand-in when the model's tokenizer.json cannot be loaded (e.g. offline). Sizes err on the
+    large side, so chunks stay within the model's limit: punctuation marks and non-ASCII
+    characters (CJK, accented or non-Latin letters) are one token each, letter runs one per
+    APPROXIMATE_LETTER_CHARS characters and digit runs one per APPROXIMATE_DIGIT_CHARS.
+    Vectorized over the characters of each text.
+    """
+
+    name = "approximate"
+
+    def token_spans(self, texts: Sequence[str]) -> List[np.ndarray]:
+        return [self._spans(text) for text in texts]
+
+    def _spans(self, text: str) -> np.ndarray:
+        codes = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32)
+        if not len(codes):
+            return np.zeros((0, 2), dtype=np.int64)
+        classes = np.where(codes < 128, _ASCII_CLASS[np.minimum(codes, 127)],
+                           np.where((codes == 0xA0) | (codes == 0x3000), _SPACE, _OTHER))
+        # Letter and digit runs continue a token; every other non-space character stands alone
+        in_run = (classes == _LETTER) | (classes == _DIGIT)
+        continues = np.concatenate(([False], in_run[1:] & (classes[1:] == classes[:-1])))
+        index = np.arange(len(codes))
+        run_start = np.maximum.accumulate(np.where(continues, 0, index))
+        piece_chars = np.where(classes == _DIGIT, APPROXIMATE_DIGIT_CHARS, APPROXIMATE_LETTER_CHARS)
+        is_token = classes != _SPACE
+        starts = is_token & (~continues | ((index - run_start) % piece_chars == 0))
+        ends = is_token & ~np.concatenate((continues[1:] & ~starts[1:], [False]))
+        return np.stack((np.flatnonzero(starts), np.flatnonzero(ends) + 1), axis=1)
+
+
+class ModelTokenizer:
+    """A tokenizers.Tokenizer used only for its offsets (no truncation, padding or special tokens)"""
+
+    name = "model"
+
+    def __init__(self, tokenizer):
+        self.tokenizer = tokenizer
+        self.tokenizer.no_truncation()
+        self.tokenizer.no_padding()
+
+    def token_spans(self, texts: Sequence[str]) -> List[np.ndarray]:
+        return [np.array(encoding.offsets, dtype=np.int64).reshape(-1, 2)
+                for encoding in self.tokenizer.encode_batch(list(texts), add_special_tokens=False)]
+
+
+def get_chunk_tokenizer(model_name: str = DEFAULT_MODEL_NAME):
+    """The embedding model's tokenizer (loaded once per process), or ApproximateTokenizer if it cannot be loaded"""
+    with _tokenizers_lock:
+        if model_name not in _tokenizers:
+            try:
+                from huggingface_hub import hf_hub_download
+                from tokenizers import Tokenizer
+                repo_id = model_name if "/" in model_name else f"sentence-transformers/{model_name}"
+                _tokenizers[model_name] = ModelTokenizer(Tokenizer.from_file(hf_hub_download(repo_id, "tokenizer.json")))
+            except Exception as e:
+                logging.warning(f"Could not load the {model_name} tokenizer, approximating chunk sizes: {e}")
+                _tokenizers[model_name] = ApproximateTokenizer()
+        return _tokenizers[model_name]
+
+
+class TokenTextSplitter:
+    """
+    Splits documents into chunks of at most chunk_tokens model tokens, consecutive chunks
+    sharing about overlap_tokens tokens. Drop-in for RecursiveCharacterTextSplitter.split_documents.
+    """
+
+    def __init__(self, chunk_tokens: int = DEFAULT_CHUNK_TOKENS, overlap_tokens: int = DEFAULT_OVERLAP_TOKENS,
+                 tokenizer=None, model_name: str = DEFAULT_MODEL_NAME):
+        if overlap_tokens >= chunk_tokens:
+            raise ValueError(f"overlap_tokens ({overlap_tokens}) must be smaller than chunk_tokens ({chunk_tokens})")
+        self.chunk_tokens = chunk_tokens
+        self.overlap_tokens = overlap_tokens
+        self.model_name = model_name
+        self._tokenizer = tokenizer
+
+    @property
+    def tokenizer(self):
+        if self._tokenizer is None:
+            self._tokenizer = get_chunk_tokenizer(self.model_name)
+        return self._tokenizer
+
+    @property
+    def tokenizer_name(self) -> str:
+        """"model" or "approximate"; chunk boundaries differ between the two"""
+        return getattr(self.tokenizer, "name", "custom")
+
+    def split_offsets(self, texts: Sequence[str]) -> List[List[Tuple[int, int]]]:
+        """(start, end) character offsets of the chunks of each text; no text is copied"""
+        bounds = []
+        for first in range(0, len(texts), TOKENIZE_BATCH):
+            batch = texts[first:first + TOKENIZE_BATCH]
+            bounds.extend(self._chunk_bounds(text, spans)
+                          for text, spans in zip(batch, self.tokenizer.token_spans(batch)))
+        return bounds
+
+    def split_documents(self, documents: Sequence[Document]) -> List[Document]:
+        chunks = []
+        bounds = self.split_offsets([doc.page_content for doc in documents])
+        for doc, spans in zip(documents, bounds):
+            for start, end in spans:
+                chunks.append(Document(page_content=doc.page_content[start:end],
+                                       metadata={**doc.metadata, 'start_index': start, 'end_index': end}))
+        return chunks
+
+    def _chunk_bounds(self, text: str, spans: np.ndarray) -> List[Tuple[int, int]]:
+        count = len(spans)
+        if count <= self.chunk_tokens:
+            return [(int(spans[0, 0]), int(spans[-1, 1]))] if count else []
+        starts, ends = spans[:, 0], spans[:, 1]
+        bounds = []
+        first = 0
+        while True:
+            last = min(first + self.chunk_tokens, count)  # exclusive
+            if last < count:
+                last = self._break_after(text, ends, first, last)
+            bounds.append((int(starts[first]), int(ends[last - 1])))
+            if last >= count:
+                return bounds
+            previous, first = first, max(last - self.overlap_tokens, first + 1)
+            # Start the overlap at a word boundary rather than inside a word's pieces; a longer
+            # run of adjacent tokens (CJK text) is not one word, so it is cut where it is
+            word_start, floor = first, max(previous + 1, first - MAX_WORD_PIECES)
+            while word_start > floor and starts[word_start] == ends[word_start - 1]:
+                word_start -= 1
+            if starts[word_start] != ends[word_start - 1]:
+                first = word_start
+
+    def _break_after(self, text: str, ends: np.ndarray, first: int, last: int) -> int:
+        """
+        Exclusive token end for a chunk of tokens [first, last): after the latest paragraph
+        break in the window's second half, else the latest line or sentence end there, else last.
+        """
+        low, high = int(ends[first + (last - first) // 2]), int(ends[last - 1])
+        position = text.rfind("\n\n", low, high + 1)
+        if position <= low:
+            position = max(text.rfind("\n", low, high + 1),
+                           *(text.rfind(mark, low, high + 1) + 1 for mark in SENTENCE_ENDS))
+        if position <= low:
+            return last
+        # Tokens ending at or before the break position
+        return int(np.searchsorted(ends, position, side="right"))
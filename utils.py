@@ -1,18 +1,35 @@
+import re
+import uuid
 import streamlit as st
 
 def initialize_session_state():
     """Initialize Streamlit session state variables"""
+    # Full transcript shown on the page; the chat engine (see engine_pool.py) keeps only the
+    # recent turns plus a summary for prompting
     if 'messages' not in st.session_state:
         st.session_state.messages = []
     
-    if 'chatbot_engine' not in st.session_state:
-        st.session_state.chatbot_engine = None
+    if 'chat_active' not in st.session_state:
+        st.session_state.chat_active = False
     
     if 'current_file' not in st.session_state:
         st.session_state.current_file = None
     
     if 'doc_info' not in st.session_state:
         st.session_state.doc_info = None
+    
+    # Every chat gets its own corpus collection; a refreshed page reopens the one in its URL
+    if 'corpus_id' not in st.session_state:
+        chat_id = st.query_params.get("chat", "")
+        st.session_state.corpus_id = chat_id if re.fullmatch(r"[0-9a-f]{32}", chat_id) else uuid.uuid4().hex
+    
+    # Bumped to reset the upload widgets once their files are queued
+    if 'uploader_key' not in st.session_state:
+        st.session_state.uploader_key = 0
+    
+    # Finished ingestion jobs already reported in the chat
+    if 'announced_jobs' not in st.session_state:
+        st.session_state.announced_jobs = set()
 
 def display_chat_history():
     """Display chat messages from history"""
@@ -0,0 +1,406 @@
+import os
+import json
+import uuid
+import shutil
+import logging
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+DEFAULT_BACKEND = os.getenv("DOCUCHAT_VECTOR_BACKEND", "chroma")
+# Rows scored per dot product, bounding the float32 scratch memory of a search
+SEARCH_BLOCK_ROWS = 16384
+
+
+def _matches(metadata: dict, filter: Dict[str, Any]) -> bool:
+    """The subset of Chroma's where-filters DocuChat uses: equality and $in"""
+    for field, condition in filter.items():
+        value = metadata.get(field)
+        if isinstance(condition, dict):
+            if "$in" in condition and value not in condition["$in"]:
+                return False
+            if "$eq" in condition and value != condition["$eq"]:
+                return False
+        elif value != condition:
+            return False
+    return True
+
+
+class NumpyVectorStore(VectorStore):
+    """
+    Exact top-k search over a float32 (or float16) matrix of normalized embeddings.
+
+    With a persist_directory the matrix lives in vectors.bin and is opened with np.memmap,
+    so loading is zero-copy; adds append to the file. Texts and metadata are kept in
+    chunks.jsonl next to it. Deletes write the kept rows to a new pair of files
+    (vectors.<generation>.bin, chunks.<generation>.jsonl) and switch to them by rewriting
+    meta.json, so a crash or a concurrent reader never sees a half-written collection.
+    Another process (API worker) may write the same directory: reads first pick up appended
+    rows, or reload after a rewrite.
+    """
+
+    def __init__(self, embedding_function: Embeddings, persist_directory: Optional[str] = None,
+                 dtype: str = "float32"):
+        self._embedding_function = embedding_function
+        self.persist_directory = persist_directory
+        self.dtype = np.dtype(dtype)
+        self._lock = threading.RLock()
+        self._ids: List[str] = []
+        self._texts: List[str] = []
+        self._metadatas: List[dict] = []
+        self._row_of: Dict[str, int] = {}
+        self._matrix = None
+        self._dim = None
+        # Which vectors/chunks files are current (named in meta.json; 0 is the original pair)
+        self._generation = 0
+        # What has been read from disk: meta.json mtime (changes on every rewrite) and chunks.jsonl bytes
+        self._meta_stamp = None
+        self._chunks_read = 0
+        if persist_directory:
+            os.makedirs(persist_directory, exist_ok=True)
+            self._load()
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self._embedding_function
+
+    def _paths(self):
+        suffix = f".{self._generation}" if self._generation else ""
+        return (os.path.join(self.persist_directory, "meta.json"),
+                os.path.join(self.persist_directory, f"vectors{suffix}.bin"),
+                os.path.join(self.persist_directory, f"chunks{suffix}.jsonl"))
+
+    def _load(self):
+        meta_path = os.path.join(self.persist_directory, "meta.json")
+        self._ids, self._texts, self._metadatas, self._row_of = [], [], [], {}
+        self._matrix, self._dim, self._chunks_read = None, None, 0
+        self._meta_stamp = self._stamp(meta_path)
+        if self._meta_stamp is None:
+            return
+        with open(meta_path) as f:
+            meta = json.load(f)
+        self._dim = meta['dim']
+        self.dtype = np.dtype(meta['dtype'])
+        self._generation = meta.get('generation', 0)
+        self._read_chunks(truncate=True)
+
+    def _read_chunks(self, truncate: bool):
+        """
+        Read complete lines appended to chunks.jsonl since the last read. Vectors are written
+        before their chunk lines, so a row whose line is present also has its vector; with
+        truncate (a full load), rows of an interrupted append are dropped.
+        """
+        _, vectors_path, chunks_path = self._paths()
+        try:
+            with open(chunks_path, "rb") as f:
+                f.seek(self._chunks_read)
+                data = f.read()
+            vector_rows = os.path.getsize(vectors_path) // (self._dim * self.dtype.itemsize)
+        except FileNotFoundError:
+            return
+        data = data[:data.rfind(b"\n") + 1]
+        lines = data.splitlines()
+        if not truncate and len(self._ids) + len(lines) > vector_rows:
+            return  # a writer is part-way through an append; read it next time
+        for line in lines:
+            chunk = json.loads(line)
+            self._row_of[chunk['id']] = len(self._ids)
+            self._ids.append(chunk['id'])
+            self._texts.append(chunk['text'])
+            self._metadatas.append(chunk['metadata'])
+        self._chunks_read += len(data)
+        # An interrupted append may leave one side longer; keep the rows present in both
+        rows = min(len(self._ids), vector_rows)
+        for doc_id in self._ids[rows:]:
+            del self._row_of[doc_id]
+        del self._ids[rows:], self._texts[rows:], self._metadatas[rows:]
+        self._map(rows)
+
+    @staticmethod
+    def _stamp(path):
+        try:
+            return os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _refresh(self):
+        """Pick up rows written by other processes (cheap: two stat calls when nothing changed)"""
+        if not self.persist_directory:
+            return
+        with self._lock:
+            meta_path, _, chunks_path = self._paths()
+            if self._stamp(meta_path) != self._meta_stamp:
+                self._load()
+                return
+            if self._dim is None:
+                return
+            try:
+                size = os.path.getsize(chunks_path)
+            except FileNotFoundError:
+                size = 0
+            if size < self._chunks_read:
+                self._load()
+            elif size > self._chunks_read:
+                self._read_chunks(truncate=False)
+
+    def _map(self, rows: int):
+        _, vectors_path, _ = self._paths()
+        self._matrix = np.memmap(vectors_path, dtype=self.dtype, mode="r", shape=(rows, self._dim)) if rows else None
+
+    def count(self) -> int:
+        self._refresh()
+        return len(self._ids)
+
+    def add_texts(self, texts: Iterable[str], metadatas: Optional[List[dict]] = None,
+                  ids: Optional[List[str]] = None, **kwargs: Any) -> List[str]:
+        texts = list(texts)
+        return self.add_vectors(texts, self._embedding_function.embed_documents(texts), metadatas, ids)
+
+    def add_vectors(self, texts: List[str], vectors: Sequence[List[float]], metadatas: Optional[List[dict]] = None,
+                    ids: Optional[List[str]] = None) -> List[str]:
+        """Store texts with embeddings computed by the caller"""
+        metadatas = metadatas or [{} for _ in texts]
+        ids = list(ids) if ids else [uuid.uuid4().hex for _ in texts]
+        vectors = np.asarray(vectors, dtype=self.dtype)
+        with self._lock:
+            self._refresh()
+            # Re-adding an ID replaces it
+            self.delete([doc_id for doc_id in ids if doc_id in self._row_of])
+            self._append(ids, texts, metadatas, vectors)
+        return ids
+
+    def _append(self, ids, texts, metadatas, vectors):
+        if self._dim is None:
+            self._dim = vectors.shape[1]
+            if self.persist_directory:
+                self._write_meta()
+        rows = len(self._ids)
+        if self.persist_directory:
+            _, vectors_path, chunks_path = self._paths()
+            with open(vectors_path, "ab") as f:
+                f.write(np.ascontiguousarray(vectors).tobytes())
+            with open(chunks_path, "a") as f:
+                for doc_id, text, metadata in zip(ids, texts, metadatas):
+                    f.write(json.dumps({'id': doc_id, 'text': text, 'metadata': metadata}) + "\n")
+                self._chunks_read = f.tell()
+        for row, doc_id in enumerate(ids, rows):
+            self._row_of[doc_id] = row
+        self._ids.extend(ids)
+        self._texts.extend(texts)
+        self._metadatas.extend(metadatas)
+        if self.persist_directory:
+            self._map(len(self._ids))
+        else:
+            self._matrix = vectors if self._matrix is None else np.concatenate([self._matrix, vectors])
+
+    def _write_meta(self):
+        """(Re)write meta.json; its new mtime tells other processes to reload"""
+        meta_path, _, _ = self._paths()
+        os.makedirs(self.persist_directory, exist_ok=True)
+        tmp_path = f"{meta_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({'dim': self._dim, 'dtype': self.dtype.name, 'generation': self._generation}, f)
+        os.replace(tmp_path, meta_path)
+        self._meta_stamp = self._stamp(meta_path)
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs: Any) -> None:
+        """Remove rows and compact the matrix"""
+        with self._lock:
+            self._refresh()
+            drop = {self._row_of[doc_id] for doc_id in ids or [] if doc_id in self._row_of}
+            if not drop:
+                return
+            keep = [row for row in range(len(self._ids)) if row not in drop]
+            vectors = np.array(self._matrix[keep]) if keep else np.zeros((0, self._dim), dtype=self.dtype)
+            ids = [self._ids[row] for row in keep]
+            texts = [self._texts[row] for row in keep]
+            metadatas = [self._metadatas[row] for row in keep]
+            self._ids, self._texts, self._metadatas, self._row_of = [], [], [], {}
+            self._matrix = None
+            if not self.persist_directory:
+                self._append(ids, texts, metadatas, vectors)
+                return
+            old_paths = self._paths()[1:]
+            # Kept rows go to a new pair of files; meta.json switches readers over once both are complete
+            self._generation += 1
+            self._chunks_read = 0
+            for path in self._paths()[1:]:
+                if os.path.exists(path):
+                    os.remove(path)  # left by an interrupted delete
+            self._append(ids, texts, metadatas, vectors)
+            self._write_meta()
+            for path in old_paths:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+    def delete_collection(self):
+        with self._lock:
+            self._ids, self._texts, self._metadatas, self._row_of = [], [], [], {}
+            self._matrix = None
+            self._dim = None
+            self._meta_stamp, self._chunks_read = None, 0
+            if self.persist_directory:
+                shutil.rmtree(self.persist_directory, ignore_errors=True)
+
+    def _document(self, row: int) -> Document:
+        return Document(page_content=self._texts[row], metadata=self._metadatas[row], id=self._ids[row])
+
+    def get_by_ids(self, ids: Sequence[str], /) -> List[Document]:
+        with self._lock:
+            self._refresh()
+            return [self._document(self._row_of[doc_id]) for doc_id in ids if doc_id in self._row_of]
+
+    def get_vectors(self, ids: Sequence[str]) -> Optional[List[List[float]]]:
+        """Stored embeddings in the order of ids, or None if any is missing"""
+        with self._lock:
+            self._refresh()
+            if any(doc_id not in self._row_of for doc_id in ids):
+                return None
+            return self._matrix[[self._row_of[doc_id] for doc_id in ids]].astype(np.float32).tolist()
+
+    def get_chunks(self) -> List[Tuple[str, str, dict]]:
+        with self._lock:
+            self._refresh()
+            return list(zip(self._ids, self._texts, self._metadatas))
+
+    def similarity_search_with_score_by_vector(self, embedding: List[float], k: int = 4,
+                                               filter: Optional[Dict[str, Any]] = None,
+                                               **kwargs: Any) -> List[Tuple[Document, float]]:
+        """Exact cosine top-k (embeddings are normalized, so a dot product suffices)"""
+        return self._search_batch([embedding], k, filter)[0]
+
+    def batch_similarity_search_by_vector(self, embeddings: Sequence[List[float]], k: int = 4,
+                                          filter: Optional[Dict[str, Any]] = None) -> List[List[Document]]:
+        """Top-k for several queries in one pass over the matrix"""
+        return [[doc for doc, _ in hits] for hits in self._search_batch(embeddings, k, filter)]
+
+    def _search_batch(self, embeddings: Sequence[List[float]], k: int,
+                      filter: Optional[Dict[str, Any]]) -> List[List[Tuple[Document, float]]]:
+        with self._lock:
+            self._refresh()
+            # Scoring runs outside the lock on this snapshot. Appends only extend these lists past
+            # rows, and deletes and reloads build new lists, so rows below it keep their chunk.
+            matrix, rows = self._matrix, len(self._ids)
+            ids, texts, metadatas = self._ids, self._texts, self._metadatas
+        if matrix is None or not rows or k <= 0:
+            return [[] for _ in embeddings]
+        queries = np.asarray(embeddings, dtype=np.float32).T
+        scores = np.empty((rows, queries.shape[1]), dtype=np.float32)
+        for start in range(0, rows, SEARCH_BLOCK_ROWS):
+            block = matrix[start:start + SEARCH_BLOCK_ROWS]
+            scores[start:start + len(block)] = block.astype(np.float32, copy=False) @ queries
+        if filter:
+            allowed = np.fromiter((_matches(metadata, filter) for metadata in metadatas[:rows]),
+                                  dtype=bool, count=rows)
+            scores[~allowed] = -np.inf
+        k = min(k, rows)
+        results = []
+        for column in scores.T:
+            top = np.argpartition(-column, k - 1)[:k]
+            top = top[np.argsort(-column[top])]
+            results.append([(Document(page_content=texts[row], metadata=metadatas[row], id=ids[row]), float(column[row]))
+                            for row in top if column[row] > -np.inf])
+        return results
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4,
+                                    filter: Optional[Dict[str, Any]] = None, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score_by_vector(embedding, k, filter)]
+
+    def similarity_search_with_score(self, query: str, k: int = 4, filter: Optional[Dict[str, Any]] = None,
+                                     **kwargs: Any) -> List[Tuple[Document, float]]:
+        return self.similarity_search_with_score_by_vector(self.embeddings.embed_query(query), k, filter)
+
+    def similarity_search(self, query: str, k: int = 4, filter: Optional[Dict[str, Any]] = None,
+                          **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, filter)]
+
+    def _select_relevance_score_fn(self):
+        return lambda score: score
+
+    @classmethod
+    def from_texts(cls, texts: List[str], embedding: Embeddings, metadatas: Optional[List[dict]] = None,
+                   ids: Optional[List[str]] = None, **kwargs: Any) -> "NumpyVectorStore":
+        store = cls(embedding, **kwargs)
+        store.add_texts(texts, metadatas, ids)
+        return store
+
+
+class ChromaBackend:
+    """Collections in a persistent Chroma database"""
+
+    name = "chroma"
+
+    def __init__(self, persist_dir: str):
+        self.persist_dir = persist_dir
+
+    def open(self, collection_name: str, embeddings):
+        # chromadb is slow to import, so it is only loaded once a Chroma collection is needed
+        from chroma_store import ChromaStore
+        return ChromaStore(
+            collection_name=collection_name,
+            embedding_function=embeddings,
+            persist_directory=self.persist_dir
+        )
+
+    def release(self, collection_name: str):
+        # Stores are opened per call, nothing is cached here
+        pass
+
+    def delete(self, collection_name: str):
+        from chroma_store import ChromaStore
+        ChromaStore(collection_name=collection_name, persist_directory=self.persist_dir).delete_collection()
+
+
+class NumpyBackend:
+    """Collections as memory-mapped matrices, one directory each"""
+
+    name = "numpy"
+
+    def __init__(self, persist_dir: str, dtype: str = os.getenv("DOCUCHAT_VECTOR_DTYPE", "float32")):
+        self.persist_dir = persist_dir
+        self.dtype = dtype
+        self._stores: Dict[str, NumpyVectorStore] = {}
+        self._lock = threading.Lock()
+
+    def open(self, collection_name: str, embeddings) -> NumpyVectorStore:
+        # One store object per collection, so every session sees the same rows
+        with self._lock:
+            store = self._stores.get(collection_name)
+            if store is None:
+                store = NumpyVectorStore(embeddings, os.path.join(self.persist_dir, "numpy", collection_name),
+                                         dtype=self.dtype)
+                self._stores[collection_name] = store
+            store._embedding_function = embeddings
+            return store
+
+    def release(self, collection_name: str):
+        """Forget the cached store; holders keep theirs and the next open() reloads from disk"""
+        with self._lock:
+            self._stores.pop(collection_name, None)
+
+    def delete(self, collection_name: str):
+        with self._lock:
+            store = self._stores.pop(collection_name, None)
+        if store is not None:
+            store.delete_collection()
+        shutil.rmtree(os.path.join(self.persist_dir, "numpy", collection_name), ignore_errors=True)
+
+
+VECTOR_BACKENDS = {
+    ChromaBackend.name: ChromaBackend,
+    NumpyBackend.name: NumpyBackend,
+}
+
+
+def get_vector_backend(persist_dir: str, name: Optional[str] = None):
+    """Backend by name (default from DOCUCHAT_VECTOR_BACKEND)"""
+    name = name or DEFAULT_BACKEND
+    if name not in VECTOR_BACKENDS:
+        logging.error(f"Unknown vector backend: {name}")
+        raise ValueError(f"Unknown vector backend {name!r}, expected one of {sorted(VECTOR_BACKENDS)}")
+    return VECTOR_BACKENDS[name](persist_dir)